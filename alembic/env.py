@@ -10,7 +10,11 @@ from alembic import context
 from app.core.config import settings
 
 from app.db.base import Base
-from app.models.task import Task
+from app.models.task import TASK_PARTITION_PATTERN, Task
+from app.models.outbox import TaskOutbox
+from app.models.idempotency_key import TaskIdempotencyKey
+from app.models.task_count import TaskCount
+from app.models.task_stats import TaskStatsBucket
 
 config = context.config
 
@@ -22,12 +26,20 @@ target_metadata = Base.metadata
 config.set_main_option("sqlalchemy.url", settings.database_url + "?async_fallback=True")
 
 
+def include_name(name, type_, parent_names) -> bool:
+    # Партиции tasks создаёт app.workers.partitions, в metadata их нет
+    if type_ == "table":
+        return not TASK_PARTITION_PATTERN.match(name)
+    return True
+
+
 def run_migrations_offline() -> None:
     url = config.get_main_option("sqlalchemy.url")
     context.configure(
         url=url,
         target_metadata=target_metadata,
         literal_binds=True,
+        include_name=include_name,
         dialect_opts={"paramstyle": "named"},
     )
 
@@ -36,7 +48,7 @@ def run_migrations_offline() -> None:
 
 
 def do_run_migrations(connection: Connection) -> None:
-    context.configure(connection=connection, target_metadata=target_metadata)
+    context.configure(connection=connection, target_metadata=target_metadata, include_name=include_name)
 
     with context.begin_transaction():
         context.run_migrations()
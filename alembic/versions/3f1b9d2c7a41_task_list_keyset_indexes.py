@@ -0,0 +1,39 @@
+"""task list keyset indexes
+
+Revision ID: 3f1b9d2c7a41
+Revises: 7c95a8aa2955
+Create Date: 2026-01-12 10:24:07.318204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f1b9d2c7a41'
+down_revision: Union[str, Sequence[str], None] = '7c95a8aa2955'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_tasks_created_at_id', 'tasks', ['created_at', 'id'], unique=False)
+    op.create_index('ix_tasks_status_created_at_id', 'tasks', ['status', 'created_at', 'id'], unique=False)
+    op.create_index('ix_tasks_priority_created_at_id', 'tasks', ['priority', 'created_at', 'id'], unique=False)
+    op.create_index(
+        'ix_tasks_status_priority_created_at_id',
+        'tasks',
+        ['status', 'priority', 'created_at', 'id'],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_tasks_status_priority_created_at_id', table_name='tasks')
+    op.drop_index('ix_tasks_priority_created_at_id', table_name='tasks')
+    op.drop_index('ix_tasks_status_created_at_id', table_name='tasks')
+    op.drop_index('ix_tasks_created_at_id', table_name='tasks')
@@ -0,0 +1,50 @@
+"""active partial indexes
+
+Revision ID: 4b2d9f6e8c15
+Revises: e61f3b8d0a47
+Create Date: 2026-02-23 09:38:05.217446
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4b2d9f6e8c15'
+down_revision: Union[str, Sequence[str], None] = 'e61f3b8d0a47'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+ACTIVE = sa.text("status IN ('PENDING', 'IN_PROGRESS')")
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # ix_tasks_id дублирует первичный ключ (id, created_at), ix_tasks_status
+    # почти не отсекает строк и перекрыт составными индексами по status
+    op.drop_index('ix_tasks_id', table_name='tasks')
+    op.drop_index('ix_tasks_status', table_name='tasks')
+    op.create_index(
+        'ix_tasks_active_status_created_at_id',
+        'tasks',
+        ['status', 'created_at', 'id'],
+        unique=False,
+        postgresql_where=ACTIVE,
+    )
+    op.create_index(
+        'ix_tasks_active_status_priority_created_at_id',
+        'tasks',
+        ['status', 'priority', 'created_at', 'id'],
+        unique=False,
+        postgresql_where=ACTIVE,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_tasks_active_status_priority_created_at_id', table_name='tasks')
+    op.drop_index('ix_tasks_active_status_created_at_id', table_name='tasks')
+    op.create_index('ix_tasks_status', 'tasks', ['status'], unique=False)
+    op.create_index('ix_tasks_id', 'tasks', ['id'], unique=False)
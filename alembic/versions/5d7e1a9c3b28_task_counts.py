@@ -0,0 +1,87 @@
+"""task counts
+
+Revision ID: 5d7e1a9c3b28
+Revises: b84e0c6f2d19
+Create Date: 2026-02-02 11:27:40.318254
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5d7e1a9c3b28'
+down_revision: Union[str, Sequence[str], None] = 'b84e0c6f2d19'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('task_counts',
+    sa.Column('status', postgresql.ENUM('NEW', 'PENDING', 'IN_PROGRESS', 'COMPLETED', 'FAILED', 'CANCELLED', name='task_status', create_type=False), nullable=False),
+    sa.Column('priority', postgresql.ENUM('LOW', 'MEDIUM', 'HIGH', name='task_priority', create_type=False), nullable=False),
+    sa.Column('slot', sa.SmallInteger(), nullable=False),
+    sa.Column('n', sa.BigInteger(), nullable=False),
+    sa.PrimaryKeyConstraint('status', 'priority', 'slot')
+    )
+    op.execute("""
+CREATE OR REPLACE FUNCTION task_counts_apply() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'TRUNCATE' THEN
+        UPDATE task_counts SET n = 0 WHERE n <> 0;
+    ELSIF TG_OP = 'INSERT' THEN
+        INSERT INTO task_counts AS c (status, priority, slot, n)
+        SELECT status, priority, mod(pg_backend_pid(), 16), count(*)
+        FROM new_rows GROUP BY status, priority ORDER BY status, priority
+        ON CONFLICT (status, priority, slot) DO UPDATE SET n = c.n + EXCLUDED.n;
+    ELSIF TG_OP = 'DELETE' THEN
+        INSERT INTO task_counts AS c (status, priority, slot, n)
+        SELECT status, priority, mod(pg_backend_pid(), 16), -count(*)
+        FROM old_rows GROUP BY status, priority ORDER BY status, priority
+        ON CONFLICT (status, priority, slot) DO UPDATE SET n = c.n + EXCLUDED.n;
+    ELSE
+        -- UPDATE без смены status/priority даёт нулевую разницу и счётчики не трогает
+        INSERT INTO task_counts AS c (status, priority, slot, n)
+        SELECT status, priority, mod(pg_backend_pid(), 16), sum(delta)
+        FROM (
+            SELECT status, priority, 1 AS delta FROM new_rows
+            UNION ALL
+            SELECT status, priority, -1 AS delta FROM old_rows
+        ) AS d
+        GROUP BY status, priority HAVING sum(delta) <> 0 ORDER BY status, priority
+        ON CONFLICT (status, priority, slot) DO UPDATE SET n = c.n + EXCLUDED.n;
+    END IF;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql
+""")
+    op.execute(
+        "CREATE TRIGGER tasks_counts_insert AFTER INSERT ON tasks REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION task_counts_apply()"
+    )
+    op.execute(
+        "CREATE TRIGGER tasks_counts_update AFTER UPDATE ON tasks REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION task_counts_apply()"
+    )
+    op.execute(
+        "CREATE TRIGGER tasks_counts_delete AFTER DELETE ON tasks REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE FUNCTION task_counts_apply()"
+    )
+    op.execute(
+        "CREATE TRIGGER tasks_counts_truncate AFTER TRUNCATE ON tasks FOR EACH STATEMENT EXECUTE FUNCTION task_counts_apply()"
+    )
+    # Триггеры уже стоят (CREATE TRIGGER блокирует запись в tasks до конца миграции),
+    # поэтому начальные значения согласованы с последующими изменениями
+    op.execute(
+        "INSERT INTO task_counts (status, priority, slot, n) "
+        "SELECT status, priority, 0, count(*) FROM tasks GROUP BY status, priority"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for name in ('insert', 'update', 'delete', 'truncate'):
+        op.execute(f"DROP TRIGGER IF EXISTS tasks_counts_{name} ON tasks")
+    op.execute("DROP FUNCTION IF EXISTS task_counts_apply()")
+    op.drop_table('task_counts')
@@ -0,0 +1,36 @@
+"""task idempotency keys
+
+Revision ID: 70c96f57ffb1
+Revises: 7f5e2c1a9b34
+Create Date: 2026-03-09 10:14:05.218734
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '70c96f57ffb1'
+down_revision: Union[str, Sequence[str], None] = '7f5e2c1a9b34'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('task_idempotency_keys',
+    sa.Column('key', sa.String(length=255), nullable=False),
+    sa.Column('task_id', sa.Integer(), nullable=False),
+    sa.Column('request_hash', sa.String(length=64), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), nullable=False),
+    sa.PrimaryKeyConstraint('key')
+    )
+    op.create_index(op.f('ix_task_idempotency_keys_created_at'), 'task_idempotency_keys', ['created_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_task_idempotency_keys_created_at'), table_name='task_idempotency_keys')
+    op.drop_table('task_idempotency_keys')
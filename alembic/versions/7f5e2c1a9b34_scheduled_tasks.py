@@ -0,0 +1,102 @@
+"""scheduled tasks
+
+Revision ID: 7f5e2c1a9b34
+Revises: 4b2d9f6e8c15
+Create Date: 2026-03-02 13:51:27.660384
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7f5e2c1a9b34'
+down_revision: Union[str, Sequence[str], None] = '4b2d9f6e8c15'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Ожидание в очереди для отложенной задачи считается от run_at, а не от created_at;
+# run_at в прошлом (задача сразу PENDING) ожидание не удлиняет
+STATS_FUNCTION = """
+CREATE OR REPLACE FUNCTION task_stats_apply() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO task_stats_buckets AS b (minute, kind, bin, slot, n)
+    SELECT minute, kind, bin, mod(pg_backend_pid(), 16), count(*)
+    FROM (
+        SELECT date_trunc('minute', nr.started_at) AS minute, 'wait' AS kind,
+               floor(ln(greatest(extract(epoch FROM nr.started_at - greatest(nr.run_at, nr.created_at)) * 1000, 0) + 1)
+                     / ln(1.1))::smallint AS bin
+        FROM new_rows nr JOIN old_rows o ON o.id = nr.id
+        WHERE o.started_at IS NULL AND nr.started_at IS NOT NULL
+        UNION ALL
+        SELECT date_trunc('minute', nr.completed_at), nr.status::text,
+               floor(ln(greatest(extract(epoch FROM nr.completed_at - nr.started_at) * 1000, 0) + 1)
+                     / ln(1.1))::smallint
+        FROM new_rows nr JOIN old_rows o ON o.id = nr.id
+        WHERE nr.status IN ('COMPLETED', 'FAILED') AND o.status <> nr.status
+          AND nr.started_at IS NOT NULL AND nr.completed_at IS NOT NULL
+    ) AS e
+    GROUP BY minute, kind, bin ORDER BY minute, kind, bin
+    ON CONFLICT (minute, kind, bin, slot) DO UPDATE SET n = b.n + EXCLUDED.n;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql
+"""
+
+PREVIOUS_STATS_FUNCTION = """
+CREATE OR REPLACE FUNCTION task_stats_apply() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO task_stats_buckets AS b (minute, kind, bin, slot, n)
+    SELECT minute, kind, bin, mod(pg_backend_pid(), 16), count(*)
+    FROM (
+        SELECT date_trunc('minute', nr.started_at) AS minute, 'wait' AS kind,
+               floor(ln(greatest(extract(epoch FROM nr.started_at - nr.created_at) * 1000, 0) + 1)
+                     / ln(1.1))::smallint AS bin
+        FROM new_rows nr JOIN old_rows o ON o.id = nr.id
+        WHERE o.started_at IS NULL AND nr.started_at IS NOT NULL
+        UNION ALL
+        SELECT date_trunc('minute', nr.completed_at), nr.status::text,
+               floor(ln(greatest(extract(epoch FROM nr.completed_at - nr.started_at) * 1000, 0) + 1)
+                     / ln(1.1))::smallint
+        FROM new_rows nr JOIN old_rows o ON o.id = nr.id
+        WHERE nr.status IN ('COMPLETED', 'FAILED') AND o.status <> nr.status
+          AND nr.started_at IS NOT NULL AND nr.completed_at IS NOT NULL
+    ) AS e
+    GROUP BY minute, kind, bin ORDER BY minute, kind, bin
+    ON CONFLICT (minute, kind, bin, slot) DO UPDATE SET n = b.n + EXCLUDED.n;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql
+"""
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Новое значение enum нельзя использовать в транзакции, где оно добавлено
+    with op.get_context().autocommit_block():
+        op.execute("ALTER TYPE task_status ADD VALUE IF NOT EXISTS 'SCHEDULED' AFTER 'NEW'")
+    op.add_column('tasks', sa.Column('run_at', sa.DateTime(timezone=True), nullable=True))
+    op.create_index(
+        'ix_tasks_scheduled_run_at_id',
+        'tasks',
+        ['run_at', 'id'],
+        unique=False,
+        postgresql_where=sa.text("status = 'SCHEDULED'"),
+    )
+    op.execute(STATS_FUNCTION)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Значение SCHEDULED остаётся в enum (PostgreSQL не удаляет значения);
+    # ещё не запущенные задачи ставятся в очередь сразу
+    op.execute(
+        "WITH released AS (UPDATE tasks SET status = 'PENDING' WHERE status = 'SCHEDULED' "
+        "RETURNING id, priority) "
+        "INSERT INTO task_outbox (task_id, priority, created_at) SELECT id, priority, now() FROM released"
+    )
+    op.execute(PREVIOUS_STATS_FUNCTION)
+    op.drop_index('ix_tasks_scheduled_run_at_id', table_name='tasks')
+    op.drop_column('tasks', 'run_at')
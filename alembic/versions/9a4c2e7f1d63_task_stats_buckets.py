@@ -0,0 +1,65 @@
+"""task stats buckets
+
+Revision ID: 9a4c2e7f1d63
+Revises: 5d7e1a9c3b28
+Create Date: 2026-02-09 16:45:12.907531
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9a4c2e7f1d63'
+down_revision: Union[str, Sequence[str], None] = '5d7e1a9c3b28'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('task_stats_buckets',
+    sa.Column('minute', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('kind', sa.String(length=16), nullable=False),
+    sa.Column('bin', sa.SmallInteger(), nullable=False),
+    sa.Column('slot', sa.SmallInteger(), nullable=False),
+    sa.Column('n', sa.BigInteger(), nullable=False),
+    sa.PrimaryKeyConstraint('minute', 'kind', 'bin', 'slot')
+    )
+    op.execute("""
+CREATE OR REPLACE FUNCTION task_stats_apply() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO task_stats_buckets AS b (minute, kind, bin, slot, n)
+    SELECT minute, kind, bin, mod(pg_backend_pid(), 16), count(*)
+    FROM (
+        SELECT date_trunc('minute', nr.started_at) AS minute, 'wait' AS kind,
+               floor(ln(greatest(extract(epoch FROM nr.started_at - nr.created_at) * 1000, 0) + 1)
+                     / ln(1.1))::smallint AS bin
+        FROM new_rows nr JOIN old_rows o ON o.id = nr.id
+        WHERE o.started_at IS NULL AND nr.started_at IS NOT NULL
+        UNION ALL
+        SELECT date_trunc('minute', nr.completed_at), nr.status::text,
+               floor(ln(greatest(extract(epoch FROM nr.completed_at - nr.started_at) * 1000, 0) + 1)
+                     / ln(1.1))::smallint
+        FROM new_rows nr JOIN old_rows o ON o.id = nr.id
+        WHERE nr.status IN ('COMPLETED', 'FAILED') AND o.status <> nr.status
+          AND nr.started_at IS NOT NULL AND nr.completed_at IS NOT NULL
+    ) AS e
+    GROUP BY minute, kind, bin ORDER BY minute, kind, bin
+    ON CONFLICT (minute, kind, bin, slot) DO UPDATE SET n = b.n + EXCLUDED.n;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql
+""")
+    op.execute(
+        "CREATE TRIGGER tasks_stats_update AFTER UPDATE ON tasks REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION task_stats_apply()"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP TRIGGER IF EXISTS tasks_stats_update ON tasks")
+    op.execute("DROP FUNCTION IF EXISTS task_stats_apply()")
+    op.drop_table('task_stats_buckets')
@@ -0,0 +1,35 @@
+"""task outbox
+
+Revision ID: b84e0c6f2d19
+Revises: 3f1b9d2c7a41
+Create Date: 2026-01-19 14:02:51.640118
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b84e0c6f2d19'
+down_revision: Union[str, Sequence[str], None] = '3f1b9d2c7a41'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('task_outbox',
+    sa.Column('id', sa.BigInteger(), nullable=False),
+    sa.Column('task_id', sa.Integer(), nullable=False),
+    sa.Column('priority', postgresql.ENUM('LOW', 'MEDIUM', 'HIGH', name='task_priority', create_type=False), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('task_outbox')
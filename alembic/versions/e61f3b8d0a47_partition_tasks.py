@@ -0,0 +1,116 @@
+"""partition tasks by created_at
+
+Revision ID: e61f3b8d0a47
+Revises: 9a4c2e7f1d63
+Create Date: 2026-02-16 10:12:33.584190
+
+"""
+from datetime import datetime, timezone
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e61f3b8d0a47'
+down_revision: Union[str, Sequence[str], None] = '9a4c2e7f1d63'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+COLUMNS = "id, title, description, priority, status, created_at, started_at, completed_at, result, error"
+
+INDEXES = [
+    ('ix_tasks_id', ['id']),
+    ('ix_tasks_status', ['status']),
+    ('ix_tasks_created_at_id', ['created_at', 'id']),
+    ('ix_tasks_status_created_at_id', ['status', 'created_at', 'id']),
+    ('ix_tasks_priority_created_at_id', ['priority', 'created_at', 'id']),
+    ('ix_tasks_status_priority_created_at_id', ['status', 'priority', 'created_at', 'id']),
+]
+
+TRIGGERS = [
+    "CREATE TRIGGER tasks_counts_insert AFTER INSERT ON tasks REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION task_counts_apply()",
+    "CREATE TRIGGER tasks_counts_update AFTER UPDATE ON tasks REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION task_counts_apply()",
+    "CREATE TRIGGER tasks_counts_delete AFTER DELETE ON tasks REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE FUNCTION task_counts_apply()",
+    "CREATE TRIGGER tasks_counts_truncate AFTER TRUNCATE ON tasks FOR EACH STATEMENT EXECUTE FUNCTION task_counts_apply()",
+    "CREATE TRIGGER tasks_stats_update AFTER UPDATE ON tasks REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION task_stats_apply()",
+]
+
+# Партиции на столько месяцев вперёд, дальше их создаёт app.workers.partitions
+MONTHS_AHEAD = 3
+
+
+def _columns(primary_key: list[str]) -> list:
+    return [
+        sa.Column('id', sa.Integer(), server_default=sa.text("nextval('tasks_id_seq'::regclass)"), nullable=False),
+        sa.Column('title', sa.String(length=255), nullable=False),
+        sa.Column('description', sa.Text(), nullable=True),
+        sa.Column('priority', postgresql.ENUM('LOW', 'MEDIUM', 'HIGH', name='task_priority', create_type=False), nullable=False),
+        sa.Column('status', postgresql.ENUM('NEW', 'PENDING', 'IN_PROGRESS', 'COMPLETED', 'FAILED', 'CANCELLED', name='task_status', create_type=False), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('started_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('completed_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('result', sa.Text(), nullable=True),
+        sa.Column('error', sa.Text(), nullable=True),
+        sa.PrimaryKeyConstraint(*primary_key),
+    ]
+
+
+def _add_months(month: datetime, months: int) -> datetime:
+    index = month.year * 12 + month.month - 1 + months
+    return month.replace(year=index // 12, month=index % 12 + 1)
+
+
+def _replace_tasks(primary_key: list[str], **table_kw) -> None:
+    """Старая tasks -> tasks_old без триггеров, индексов и PK; новая tasks с той же последовательностью id"""
+    for trigger in ('tasks_counts_insert', 'tasks_counts_update', 'tasks_counts_delete',
+                    'tasks_counts_truncate', 'tasks_stats_update'):
+        op.execute(f"DROP TRIGGER IF EXISTS {trigger} ON tasks")
+    for name, _ in INDEXES:
+        op.drop_index(name, table_name='tasks')
+    op.drop_constraint('tasks_pkey', 'tasks', type_='primary')
+    op.rename_table('tasks', 'tasks_old')
+
+    op.create_table('tasks', *_columns(primary_key), **table_kw)
+    op.execute("ALTER SEQUENCE tasks_id_seq OWNED BY tasks.id")
+    op.execute("ALTER TABLE tasks_old ALTER COLUMN id DROP DEFAULT")
+
+
+def _finish_tasks() -> None:
+    """Копирование строк до триггеров (task_counts уже их учитывает), индексы и триггеры"""
+    op.execute(f"INSERT INTO tasks ({COLUMNS}) SELECT {COLUMNS} FROM tasks_old")
+    op.drop_table('tasks_old')
+    for name, columns in INDEXES:
+        op.create_index(name, 'tasks', columns, unique=False)
+    for trigger in TRIGGERS:
+        op.execute(trigger)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    _replace_tasks(['id', 'created_at'], postgresql_partition_by='RANGE (created_at)')
+    op.execute("CREATE TABLE tasks_default PARTITION OF tasks DEFAULT")
+
+    # Помесячные партиции от самой старой задачи до MONTHS_AHEAD вперёд
+    now = datetime.now(timezone.utc)
+    oldest = op.get_bind().execute(sa.text("SELECT min(created_at) FROM tasks_old")).scalar() or now
+    month = oldest.astimezone(timezone.utc).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    last = _add_months(now.replace(day=1, hour=0, minute=0, second=0, microsecond=0), MONTHS_AHEAD)
+    while month <= last:
+        end = _add_months(month, 1)
+        op.execute(
+            f"CREATE TABLE tasks_p{month:%Y%m} PARTITION OF tasks "
+            f"FOR VALUES FROM ('{month.isoformat()}') TO ('{end.isoformat()}')"
+        )
+        month = end
+
+    _finish_tasks()
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Отключённые архивом партиции в обычную таблицу не возвращаются
+    _replace_tasks(['id'])
+    _finish_tasks()
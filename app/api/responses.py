@@ -0,0 +1,46 @@
+import enum
+from datetime import datetime
+from typing import Any
+
+import msgpack
+import orjson
+from fastapi import Request
+from fastapi.responses import Response
+
+MSGPACK_MEDIA_TYPES = ("application/msgpack", "application/x-msgpack")
+
+
+class FastJSONResponse(Response):
+    """JSON через orjson: datetime, Enum и dict строк БД кодируются без jsonable_encoder"""
+
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        # OPT_UTC_Z: UTC как "Z", тот же формат, что у pydantic
+        return orjson.dumps(content, option=orjson.OPT_UTC_Z)
+
+
+def _msgpack_default(value: Any) -> Any:
+    if isinstance(value, datetime):
+        text = value.isoformat()
+        return text[:-6] + "Z" if text.endswith("+00:00") else text
+    if isinstance(value, enum.Enum):
+        return value.value
+    raise TypeError(f"Cannot serialize {type(value).__name__} to MessagePack")
+
+
+class MsgPackResponse(Response):
+    """MessagePack (Accept: application/msgpack); даты — ISO-строки, как в JSON"""
+
+    media_type = "application/msgpack"
+
+    def render(self, content: Any) -> bytes:
+        return msgpack.packb(content, default=_msgpack_default)
+
+
+def negotiated_response(request: Request, content: Any, status_code: int = 200) -> Response:
+    """Ответ в формате из заголовка Accept: MessagePack или JSON (по умолчанию)"""
+    accept = request.headers.get("accept", "")
+    if any(media_type in accept for media_type in MSGPACK_MEDIA_TYPES):
+        return MsgPackResponse(content, status_code=status_code)
+    return FastJSONResponse(content, status_code=status_code)
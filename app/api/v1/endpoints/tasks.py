@@ -1,57 +1,186 @@
+import asyncio
+import json
+import re
 from typing import Optional
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Body, Depends, Header, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.core.deps import get_db, get_task_service
+from app.api.responses import negotiated_response
+from app.core.config import settings
+from app.core.deps import get_db, get_event_hub, get_task_service
+from app.core.pagination import decode_cursor, encode_cursor
 from app.schemas.task import (
     TaskCreate,
     TaskResponse,
     TaskStatusResponse,
     TaskListResponse,
+    TaskStatsResponse,
     TaskStatus,
     TaskPriority,
 )
-from app.services.task_service import TaskService
+from app.services.task_events import TERMINAL_STATUSES, TaskEventHub
+from app.services.task_service import IdempotencyKeyReused, TaskService
 
 router = APIRouter()
 
+_WAIT_PATTERN = re.compile(r"^(\d+(?:\.\d+)?)(ms|s)?$")
+
+
+def _parse_wait(wait: str) -> float:
+    """'30s', '500ms' или '30' (секунды) -> секунды, не больше long_poll_max_wait"""
+    match = _WAIT_PATTERN.match(wait.strip())
+    if not match:
+        raise HTTPException(status_code=400, detail="Invalid wait, expected e.g. '30s' or '500ms'")
+    value = float(match.group(1))
+    if match.group(2) == "ms":
+        value /= 1000
+    return min(value, settings.long_poll_max_wait)
+
+
+_TASK_FIELDS = tuple(TaskResponse.model_fields)
+_FIELDS_DESCRIPTION = f"Только указанные поля через запятую ({', '.join(_TASK_FIELDS)}); id — всегда"
+
+
+def _parse_fields(fields: Optional[str]) -> Optional[list[str]]:
+    """'status,priority' -> ['id', 'status', 'priority']; 400 на неизвестные поля"""
+    if not fields:
+        return None
+    names = [name.strip() for name in fields.split(",") if name.strip()]
+    unknown = [name for name in names if name not in _TASK_FIELDS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    return ["id", *dict.fromkeys(name for name in names if name != "id")]
+
+
+def _status_payload(task) -> dict:
+    return TaskStatusResponse.model_validate(task).model_dump(mode="json")
+
+
+def _apply_event(payload: dict, event: dict):
+    payload["status"] = event["status"]
+    for field in ("started_at", "completed_at"):
+        if event.get(field):
+            payload[field] = event[field]
+
 
 @router.post("", response_model=TaskResponse, status_code=201)
 async def create_task(
         task_in: TaskCreate,
+        response: Response,
+        idempotency_key: Optional[str] = Header(
+            None, min_length=1, max_length=255,
+            description="Повтор запроса с тем же ключом вернёт исходную задачу, не создавая новую",
+        ),
         db: AsyncSession = Depends(get_db),
         task_service: TaskService = Depends(get_task_service),
 ):
-    task = await task_service.create_task(db, task_in)
+    if idempotency_key is None:
+        return await task_service.create_task(db, task_in)
+
+    try:
+        task, replayed = await task_service.create_task_idempotent(db, task_in, idempotency_key)
+    except IdempotencyKeyReused:
+        raise HTTPException(status_code=422, detail="Idempotency-Key was already used with a different request body")
+    except LookupError:
+        raise HTTPException(status_code=409, detail="Idempotency-Key refers to a task that no longer exists")
+    if replayed:
+        response.headers["Idempotent-Replayed"] = "true"
     return task
 
 
-@router.get("", response_model=TaskListResponse)
+@router.post(":batch", response_model=list[TaskResponse], status_code=201)
+async def create_tasks_batch(
+        tasks_in: list[TaskCreate] = Body(..., min_length=1, max_length=settings.task_batch_max_size),
+        db: AsyncSession = Depends(get_db),
+        task_service: TaskService = Depends(get_task_service),
+):
+    tasks = await task_service.create_tasks(db, tasks_in)
+    return tasks
+
+
+@router.get(
+    "",
+    response_model=TaskListResponse,
+    responses={200: {"content": {"application/msgpack": {}}}},
+)
 async def list_tasks(
+        request: Request,
         page: int = Query(1, ge=1),
         page_size: int = Query(10, ge=1, le=100),
         status: Optional[TaskStatus] = None,
         priority: Optional[TaskPriority] = None,
+        cursor: Optional[str] = Query(None, description="Курсор next_cursor из предыдущего ответа"),
+        include_total: bool = Query(True, description="Считать ли total (count по фильтру)"),
+        fields: Optional[str] = Query(None, description=_FIELDS_DESCRIPTION),
         db: AsyncSession = Depends(get_db),
         task_service: TaskService = Depends(get_task_service),
 ):
+    selected = _parse_fields(fields)
+    position = None
+    if cursor:
+        try:
+            position = decode_cursor(cursor)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+
     tasks, total = await task_service.list_tasks(
-        db, page=page, page_size=page_size, status=status, priority=priority
-    )
-    return TaskListResponse(
-        items=tasks,
-        total=total,
+        db,
         page=page,
         page_size=page_size,
+        status=status,
+        priority=priority,
+        cursor=position,
+        with_total=include_total,
+        as_rows=True,
+        fields=selected,
     )
 
+    next_cursor = None
+    if len(tasks) == page_size:
+        last = tasks[-1]
+        next_cursor = encode_cursor(last["created_at"], last["id"])
+    if selected:
+        # created_at выбирался ради курсора
+        tasks = [{name: row[name] for name in selected} for row in tasks]
+
+    # Строки БД кодируются напрямую (orjson/msgpack): без TaskResponse на каждую задачу
+    # и повторной валидации response_model; схема ответа та же — TaskListResponse
+    return negotiated_response(request, {
+        "items": tasks,
+        "total": total,
+        "page": page,
+        "page_size": page_size,
+        "next_cursor": next_cursor,
+    })
+
+
+# Объявлен до /{task_id}, иначе "stats" попадёт в task_id
+@router.get("/stats", response_model=TaskStatsResponse)
+async def get_task_stats(
+        window_minutes: int = Query(60, ge=1, le=settings.task_stats_max_window_minutes),
+        db: AsyncSession = Depends(get_db),
+        task_service: TaskService = Depends(get_task_service),
+):
+    return await task_service.get_stats(db, window_minutes)
+
 
 @router.get("/{task_id}", response_model=TaskResponse)
 async def get_task(
         task_id: int,
+        request: Request,
+        fields: Optional[str] = Query(None, description=_FIELDS_DESCRIPTION),
         db: AsyncSession = Depends(get_db),
         task_service: TaskService = Depends(get_task_service),
 ):
+    selected = _parse_fields(fields)
+    if selected:
+        # Урезанный ответ не проходит через response_model TaskResponse
+        row = await task_service.get_task_fields(db, task_id, selected)
+        if not row:
+            raise HTTPException(status_code=404, detail="Task not found")
+        return negotiated_response(request, row)
+
     task = await task_service.get_task(db, task_id)
     if not task:
         raise HTTPException(status_code=404, detail="Task not found")
@@ -61,13 +190,84 @@ async def get_task(
 @router.get("/{task_id}/status", response_model=TaskStatusResponse)
 async def get_task_status(
         task_id: int,
+        wait: Optional[str] = Query(None, description="Long-poll: ждать смены статуса, например 30s"),
         db: AsyncSession = Depends(get_db),
         task_service: TaskService = Depends(get_task_service),
+        event_hub: TaskEventHub = Depends(get_event_hub),
 ):
-    task = await task_service.get_task(db, task_id)
-    if not task:
-        raise HTTPException(status_code=404, detail="Task not found")
-    return task
+    timeout = _parse_wait(wait) if wait else 0
+    if not timeout:
+        task = await task_service.get_task(db, task_id)
+        if not task:
+            raise HTTPException(status_code=404, detail="Task not found")
+        return task
+
+    # Подписка до чтения: переход между чтением и подпиской не потеряется
+    events = event_hub.subscribe(task_id)
+    try:
+        task = await task_service.get_task(db, task_id)
+        if not task:
+            raise HTTPException(status_code=404, detail="Task not found")
+        payload = _status_payload(task)
+        if payload["status"] in TERMINAL_STATUSES:
+            return payload
+        # Соединение возвращается в пул до ожидания, а не держится до timeout
+        await db.close()
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while (remaining := deadline - loop.time()) > 0:
+            try:
+                event = await asyncio.wait_for(events.get(), timeout=remaining)
+            except asyncio.TimeoutError:
+                break
+            if event["status"] != payload["status"]:
+                _apply_event(payload, event)
+                break
+        return payload
+    finally:
+        event_hub.unsubscribe(task_id, events)
+
+
+@router.get("/{task_id}/events")
+async def stream_task_events(
+        task_id: int,
+        db: AsyncSession = Depends(get_db),
+        task_service: TaskService = Depends(get_task_service),
+        event_hub: TaskEventHub = Depends(get_event_hub),
+):
+    """Server-Sent Events: текущий статус и все переходы до финального"""
+    events = event_hub.subscribe(task_id)
+    try:
+        task = await task_service.get_task(db, task_id)
+        if not task:
+            raise HTTPException(status_code=404, detail="Task not found")
+    except BaseException:
+        event_hub.unsubscribe(task_id, events)
+        raise
+    payload = _status_payload(task)
+    # Сессия из зависимости закрылась бы только с концом потока
+    await db.close()
+
+    async def stream():
+        try:
+            yield f"event: status\ndata: {json.dumps(payload)}\n\n"
+            while payload["status"] not in TERMINAL_STATUSES:
+                try:
+                    event = await asyncio.wait_for(events.get(), timeout=settings.sse_heartbeat_interval)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                _apply_event(payload, event)
+                yield f"event: status\ndata: {json.dumps(payload)}\n\n"
+        finally:
+            event_hub.unsubscribe(task_id, events)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 @router.delete("/{task_id}", status_code=204)
@@ -0,0 +1,34 @@
+from typing import Optional
+
+from app.brokers.base import BrokerBackend, BrokerMessage, EventHandler, MessageHandler, OutgoingMessage
+from app.brokers.memory import InMemoryBroker
+from app.brokers.rabbitmq import RabbitMQBackend
+from app.core.config import settings
+
+# Один in-process брокер на процесс: API и worker должны видеть одни и те же очереди
+_memory_broker: Optional[InMemoryBroker] = None
+
+
+def create_broker_backend(name: str = None) -> BrokerBackend:
+    """Бэкенд очереди по настройке broker_backend (rabbitmq | memory)"""
+    global _memory_broker
+    name = name or settings.broker_backend
+    if name == "rabbitmq":
+        return RabbitMQBackend()
+    if name == "memory":
+        if _memory_broker is None:
+            _memory_broker = InMemoryBroker()
+        return _memory_broker
+    raise ValueError(f"Unknown broker backend: {name}")
+
+
+__all__ = [
+    "BrokerBackend",
+    "BrokerMessage",
+    "EventHandler",
+    "InMemoryBroker",
+    "MessageHandler",
+    "OutgoingMessage",
+    "RabbitMQBackend",
+    "create_broker_backend",
+]
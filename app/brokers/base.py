@@ -0,0 +1,73 @@
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Optional, Protocol
+
+
+class BrokerMessage(Protocol):
+    """Полученное сообщение (совместимо с aio_pika.IncomingMessage)"""
+
+    body: bytes
+    headers: dict
+    priority: Optional[int]
+
+    async def ack(self) -> None: ...
+
+    async def nack(self, requeue: bool = True) -> None: ...
+
+    async def reject(self, requeue: bool = False) -> None: ...
+
+
+@dataclass
+class OutgoingMessage:
+    body: bytes
+    priority: int = 0
+    headers: dict = field(default_factory=dict)
+
+
+MessageHandler = Callable[[BrokerMessage], Awaitable[Any]]
+EventHandler = Callable[[dict], None]
+
+
+class BrokerBackend(ABC):
+    """Транспорт очереди задач: публикация, потребление, ack/nack, приоритеты, prefetch
+
+    Плюс fanout-рассылка событий смены статуса всем процессам.
+    """
+
+    @abstractmethod
+    async def connect(self) -> None: ...
+
+    @abstractmethod
+    async def disconnect(self) -> None: ...
+
+    @abstractmethod
+    async def declare_queue(self, name: str, max_priority: int = 10) -> None: ...
+
+    @abstractmethod
+    async def declare_delay_queue(self, name: str, ttl_ms: int, target: str) -> None:
+        """Очередь задержки без потребителей: через ttl_ms сообщение перекладывается в target
+
+        У всех сообщений очереди один TTL, поэтому они истекают в порядке FIFO;
+        разные задержки — разные очереди.
+        """
+
+    @abstractmethod
+    async def publish(self, queue: str, messages: list[OutgoingMessage]) -> None:
+        """Публикация с подтверждением: возвращает управление, когда брокер принял все сообщения"""
+
+    @abstractmethod
+    async def consume(self, queue: str, handler: MessageHandler, prefetch: int) -> Any:
+        """Запуск потребления; возвращает handle для cancel()"""
+
+    @abstractmethod
+    async def cancel(self, consumer: Any) -> None: ...
+
+    @abstractmethod
+    async def set_prefetch(self, prefetch: int) -> None:
+        """Изменение prefetch у активных потребителей"""
+
+    @abstractmethod
+    async def publish_events(self, events: list[bytes]) -> None: ...
+
+    @abstractmethod
+    async def subscribe_events(self, handler: EventHandler) -> None: ...
@@ -0,0 +1,195 @@
+import asyncio
+import itertools
+import json
+import logging
+from typing import Any, Optional
+
+from app.brokers.base import BrokerBackend, EventHandler, MessageHandler, OutgoingMessage
+
+logger = logging.getLogger(__name__)
+
+
+class InMemoryMessage:
+    """Сообщение in-process очереди с семантикой ack/nack/reject как у AMQP"""
+
+    def __init__(self, queue: "InMemoryQueue", message: OutgoingMessage):
+        self._queue = queue
+        self.body = message.body
+        self.headers = dict(message.headers)
+        self.priority = message.priority
+        self._outgoing = message
+        self._settled = False
+        self._consumer: Optional["InMemoryConsumer"] = None
+
+    async def _settle(self):
+        if self._settled:
+            raise RuntimeError("Message already acknowledged")
+        self._settled = True
+        if self._consumer is not None:
+            self._consumer.release()
+
+    async def ack(self):
+        await self._settle()
+
+    async def nack(self, requeue: bool = True):
+        await self._settle()
+        if requeue:
+            self._queue.put(self._outgoing)
+
+    async def reject(self, requeue: bool = False):
+        await self.nack(requeue=requeue)
+
+
+class InMemoryQueue:
+    """asyncio.PriorityQueue: выше priority — раньше, внутри приоритета — FIFO"""
+
+    def __init__(self, name: str, max_priority: int = 10):
+        self.name = name
+        self.max_priority = max_priority
+        self._items: asyncio.PriorityQueue = asyncio.PriorityQueue()
+        self._sequence = itertools.count()
+
+    def qsize(self) -> int:
+        return self._items.qsize()
+
+    def put(self, message: OutgoingMessage):
+        priority = min(message.priority, self.max_priority)
+        self._items.put_nowait((-priority, next(self._sequence), message))
+
+    async def get(self) -> InMemoryMessage:
+        _, _, message = await self._items.get()
+        return InMemoryMessage(self, message)
+
+
+class InMemoryDelayQueue:
+    """Очередь задержки: каждое сообщение через ttl секунд перекладывается в target (TTL + dead-letter)"""
+
+    def __init__(self, name: str, ttl: float, target: InMemoryQueue):
+        self.name = name
+        self.ttl = ttl
+        self.target = target
+        self._waiting = 0
+
+    def qsize(self) -> int:
+        return self._waiting
+
+    def put(self, message: OutgoingMessage):
+        self._waiting += 1
+        asyncio.get_running_loop().call_later(self.ttl, self._expire, message)
+
+    def _expire(self, message: OutgoingMessage):
+        self._waiting -= 1
+        self.target.put(message)
+
+
+class InMemoryConsumer:
+    """Потребитель с prefetch: не больше prefetch неподтверждённых сообщений"""
+
+    def __init__(self, queue: InMemoryQueue, handler: MessageHandler, prefetch: int):
+        self.queue = queue
+        self.handler = handler
+        self.prefetch = prefetch
+        self.unacked = 0
+        self._credit = asyncio.Condition()
+        self._tasks: set[asyncio.Task] = set()
+        self._runner = asyncio.create_task(self._run())
+
+    def release(self):
+        self.unacked -= 1
+        asyncio.get_running_loop().create_task(self._notify())
+
+    async def _notify(self):
+        async with self._credit:
+            self._credit.notify_all()
+
+    async def set_prefetch(self, prefetch: int):
+        self.prefetch = prefetch
+        await self._notify()
+
+    async def _run(self):
+        while True:
+            async with self._credit:
+                await self._credit.wait_for(lambda: self.unacked < self.prefetch)
+            message = await self.queue.get()
+            message._consumer = self
+            self.unacked += 1
+            task = asyncio.create_task(self.handler(message))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def cancel(self):
+        self._runner.cancel()
+        try:
+            await self._runner
+        except asyncio.CancelledError:
+            pass
+
+
+class InMemoryBroker(BrokerBackend):
+    """Брокер внутри процесса: API и worker в одном event loop, без сети и AMQP-фрейминга
+
+    Сообщения не переживают перезапуск процесса — для edge-развёртываний на
+    одном узле и бенчмарков.
+    """
+
+    def __init__(self):
+        self.queues: dict[str, InMemoryQueue | InMemoryDelayQueue] = {}
+        self.consumers: list[InMemoryConsumer] = []
+        self.event_handlers: list[EventHandler] = []
+
+    async def connect(self):
+        pass
+
+    async def disconnect(self):
+        for consumer in list(self.consumers):
+            await self.cancel(consumer)
+
+    def _queue(self, name: str) -> InMemoryQueue:
+        if name not in self.queues:
+            self.queues[name] = InMemoryQueue(name)
+        return self.queues[name]
+
+    async def declare_queue(self, name: str, max_priority: int = 10):
+        if name not in self.queues:
+            self.queues[name] = InMemoryQueue(name, max_priority=max_priority)
+
+    async def declare_delay_queue(self, name: str, ttl_ms: int, target: str):
+        if name not in self.queues:
+            self.queues[name] = InMemoryDelayQueue(name, ttl_ms / 1000, self._queue(target))
+
+    async def publish(self, queue: str, messages: list[OutgoingMessage]):
+        target = self._queue(queue)
+        for message in messages:
+            target.put(message)
+
+    async def consume(self, queue: str, handler: MessageHandler, prefetch: int) -> Any:
+        consumer = InMemoryConsumer(self._queue(queue), handler, prefetch)
+        self.consumers.append(consumer)
+        return consumer
+
+    async def cancel(self, consumer: Any):
+        await consumer.cancel()
+        if consumer in self.consumers:
+            self.consumers.remove(consumer)
+
+    async def set_prefetch(self, prefetch: int):
+        for consumer in self.consumers:
+            await consumer.set_prefetch(prefetch)
+
+    async def publish_events(self, events: list[bytes]):
+        loop = asyncio.get_running_loop()
+        for body in events:
+            event = json.loads(body)
+            for handler in self.event_handlers:
+                # Асинхронная доставка, как у fanout: издатель не ждёт подписчиков
+                loop.call_soon(self._deliver_event, handler, event)
+
+    @staticmethod
+    def _deliver_event(handler: EventHandler, event: dict):
+        try:
+            handler(event)
+        except Exception as e:
+            logger.error(f"Failed to handle status event {event!r}: {e}")
+
+    async def subscribe_events(self, handler: EventHandler):
+        self.event_handlers.append(handler)
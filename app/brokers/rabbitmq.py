@@ -0,0 +1,186 @@
+import asyncio
+import json
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Optional
+from aio_pika import Message, DeliveryMode, ExchangeType, connect_robust
+from aio_pika.abc import (
+    AbstractChannel,
+    AbstractConnection,
+    AbstractExchange,
+    AbstractIncomingMessage,
+    AbstractQueue,
+)
+from aio_pika.pool import Pool
+
+from app.brokers.base import BrokerBackend, EventHandler, MessageHandler, OutgoingMessage
+from app.core.config import settings
+from app.core.metrics import (
+    rabbitmq_channel_pool_in_use,
+    rabbitmq_channel_pool_size,
+    rabbitmq_publish_confirm_seconds,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class RabbitMQBackend(BrokerBackend):
+    """RabbitMQ через aio_pika: пул confirm-каналов для публикаций, отдельный канал потребителя"""
+
+    def __init__(self, pool_size: int = None):
+        self.connection: Optional[AbstractConnection] = None
+        self.channel: Optional[AbstractChannel] = None
+        self.consumer_channel: Optional[AbstractChannel] = None
+        self.channel_pool: Optional[Pool] = None
+        self.pool_size = pool_size or settings.rabbitmq_channel_pool_size
+
+    async def connect(self):
+        logger.info(f"Connecting to RabbitMQ at {settings.rabbitmq_host}:{settings.rabbitmq_port}")
+        self.connection = await connect_robust(
+            settings.rabbitmq_url,
+            timeout=10
+        )
+        self.channel = await self.connection.channel(publisher_confirms=True)
+
+        # Fanout для событий смены статуса (инвалидация кэшей, уведомления)
+        await self.channel.declare_exchange(
+            settings.rabbitmq_events_exchange,
+            ExchangeType.FANOUT,
+            durable=True,
+        )
+
+        # Пул каналов для публикаций: параллельные запросы не делят один канал
+        self.channel_pool = Pool(self._open_channel, max_size=self.pool_size)
+        rabbitmq_channel_pool_size.set(self.pool_size)
+
+    async def disconnect(self):
+        if self.channel_pool:
+            await self.channel_pool.close()
+        if self.channel:
+            await self.channel.close()
+            logger.info("RabbitMQ channel closed")
+        if self.connection:
+            await self.connection.close()
+            logger.info("RabbitMQ connection closed")
+
+    async def declare_queue(self, name: str, max_priority: int = 10):
+        # max_priority=0 — обычная FIFO-очередь без накладных расходов priority queue
+        await self.channel.declare_queue(
+            name,
+            durable=True,
+            arguments={"x-max-priority": max_priority} if max_priority else None,
+        )
+
+    async def declare_delay_queue(self, name: str, ttl_ms: int, target: str):
+        # Истёкшее сообщение уходит через default exchange в target (dead-letter)
+        await self.channel.declare_queue(
+            name,
+            durable=True,
+            arguments={
+                "x-message-ttl": ttl_ms,
+                "x-dead-letter-exchange": "",
+                "x-dead-letter-routing-key": target,
+            },
+        )
+
+    async def _open_channel(self) -> AbstractChannel:
+        return await self.connection.channel(publisher_confirms=True)
+
+    @asynccontextmanager
+    async def _acquire_channel(self) -> AsyncIterator[AbstractChannel]:
+        async with self.channel_pool.acquire() as channel:
+            rabbitmq_channel_pool_in_use.inc()
+            try:
+                yield channel
+            finally:
+                rabbitmq_channel_pool_in_use.dec()
+
+    @staticmethod
+    async def _publish_confirmed(exchange: AbstractExchange, message: Message, routing_key: str):
+        """Публикация с ожиданием publisher confirm и замером его задержки"""
+        started = time.perf_counter()
+        await exchange.publish(
+            message,
+            routing_key=routing_key,
+            timeout=settings.rabbitmq_publish_timeout,
+        )
+        rabbitmq_publish_confirm_seconds.observe(time.perf_counter() - started)
+
+    async def _publish_pipelined(self, messages: list[Message], routing_key: str, exchange_name: str = ""):
+        """Конвейерная публикация: все сообщения отправляются сразу, подтверждения ждутся вместе
+
+        Пачка делится между каналами пула, чтобы не упираться в один канал.
+        """
+        channels = min(self.pool_size, len(messages))
+        chunks = [messages[i::channels] for i in range(channels)]
+
+        async def publish_chunk(chunk: list[Message]):
+            async with self._acquire_channel() as channel:
+                if exchange_name:
+                    exchange = await channel.get_exchange(exchange_name, ensure=False)
+                else:
+                    exchange = channel.default_exchange
+                await asyncio.gather(*(
+                    self._publish_confirmed(exchange, message, routing_key)
+                    for message in chunk
+                ))
+
+        await asyncio.gather(*(publish_chunk(chunk) for chunk in chunks))
+
+    async def publish(self, queue: str, messages: list[OutgoingMessage]):
+        await self._publish_pipelined(
+            [
+                Message(
+                    body=message.body,
+                    delivery_mode=DeliveryMode.PERSISTENT,
+                    priority=message.priority,
+                    headers=message.headers or None,
+                )
+                for message in messages
+            ],
+            routing_key=queue,
+        )
+
+    async def consume(self, queue: str, handler: MessageHandler, prefetch: int) -> Any:
+        if self.consumer_channel is None:
+            self.consumer_channel = await self.connection.channel()
+        # global_: лимит на канал применяется и к уже запущенному потребителю
+        await self.consumer_channel.set_qos(prefetch_count=prefetch, global_=True)
+        amqp_queue = await self.consumer_channel.get_queue(queue, ensure=False)
+        consumer_tag = await amqp_queue.consume(handler)
+        return amqp_queue, consumer_tag
+
+    async def cancel(self, consumer: Any):
+        amqp_queue, consumer_tag = consumer
+        await amqp_queue.cancel(consumer_tag)
+
+    async def set_prefetch(self, prefetch: int):
+        if self.consumer_channel is not None:
+            await self.consumer_channel.set_qos(prefetch_count=prefetch, global_=True)
+
+    async def publish_events(self, events: list[bytes]):
+        await self._publish_pipelined(
+            [Message(body=body, content_type="application/json") for body in events],
+            routing_key="",
+            exchange_name=settings.rabbitmq_events_exchange,
+        )
+
+    async def subscribe_events(self, handler: EventHandler):
+        channel = await self.connection.channel()
+        exchange = await channel.declare_exchange(
+            settings.rabbitmq_events_exchange,
+            ExchangeType.FANOUT,
+            durable=True,
+        )
+        queue: AbstractQueue = await channel.declare_queue(exclusive=True, auto_delete=True)
+        await queue.bind(exchange)
+
+        async def on_message(message: AbstractIncomingMessage):
+            try:
+                handler(json.loads(message.body))
+            except Exception as e:
+                logger.error(f"Failed to handle status event {message.body!r}: {e}")
+
+        await queue.consume(on_message, no_ack=True)
+        logger.info(f"Subscribed to status events on '{settings.rabbitmq_events_exchange}'")
@@ -1,3 +1,6 @@
+from typing import Literal
+
+from pydantic import field_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
@@ -15,6 +18,11 @@ class Settings(BaseSettings):
 
     # Logging
     log_level: str = "INFO"
+    log_json: bool = False
+    log_max_bytes: int = 10 * 1024 * 1024
+    log_backup_count: int = 5
+    # Не больше N записей INFO/DEBUG в секунду с одного места вызова (0 — без ограничения)
+    log_sample_rate: int = 100
 
     # PostgreSQL
     postgres_user: str
@@ -28,22 +36,117 @@ class Settings(BaseSettings):
     db_max_overflow: int = 10
     db_pool_recycle: int = 3600
 
+    # Брокер очереди задач: rabbitmq | memory (API и worker в одном процессе)
+    broker_backend: Literal["rabbitmq", "memory"] = "rabbitmq"
+
     # RabbitMQ
     rabbitmq_host: str = "localhost"
     rabbitmq_port: int = 5672
     rabbitmq_user: str
     rabbitmq_password: str
     rabbitmq_queue: str = "tasks"
+    # Очередь задач: priority — одна очередь с x-max-priority (LOW может голодать под потоком HIGH);
+    # weighted — очередь на приоритет (tasks.high/.medium/.low), worker выбирает из них по весам
+    task_queue_mode: Literal["priority", "weighted"] = "priority"
+    task_queue_weights: dict[str, int] = {"HIGH": 6, "MEDIUM": 3, "LOW": 1}
+    rabbitmq_events_exchange: str = "task_events"
+    rabbitmq_channel_pool_size: int = 8
+    rabbitmq_publish_timeout: float = 10.0
+
+    # Outbox relay
+    outbox_relay_in_api: bool = True
+    outbox_batch_size: int = 500
+    outbox_poll_interval: float = 1.0
+
+    # Выпуск отложенных задач (false — запускать отдельно: python -m app.workers.scheduler)
+    scheduler_in_api: bool = True
+    scheduler_window_size: int = 1000
+    scheduler_batch_size: int = 500
+    scheduler_max_sleep: float = 30.0
+
+    # Task cache (GET /tasks/{id}, /tasks/{id}/status)
+    task_cache_enabled: bool = True
+    task_cache_max_size: int = 10000
+    task_cache_ttl: float = 5.0
+
+    # Idempotency-Key для POST /tasks: LRU недавних ответов и срок хранения ключей в БД
+    # (ключи старше удаляет reconcile_counts)
+    idempotency_cache_size: int = 10000
+    idempotency_key_ttl_hours: int = 24
+
+    # Ожидание смены статуса (SSE и long-poll)
+    sse_heartbeat_interval: float = 15.0
+    long_poll_max_wait: float = 60.0
+
+    # Сверка task_counts с tasks и очистка статистики: python -m app.workers.reconcile_counts (0 — один проход)
+    task_counts_reconcile_interval: float = 0.0
+
+    # GET /tasks/stats: окно до N минут; корзины старше retention удаляет reconcile_counts
+    task_stats_max_window_minutes: int = 1440
+    task_stats_retention_hours: int = 168
+
+    # Партиции tasks: python -m app.workers.partitions (cron раз в день)
+    task_partitions_ahead: int = 3
+    task_archive_retention_days: int = 90
+    # Каталог выгрузки NDJSON.gz; пусто — партиции только отключаются
+    task_archive_dir: str = "archive"
+    task_partition_lock_timeout_ms: int = 5000
+
+    # Batch API
+    task_batch_max_size: int = 1000
 
     # Worker settings
     worker_concurrency: int = 3
+    # Повторы упавших задач: очереди задержки base, 2*base, 4*base ... (не больше max), затем parking
     worker_max_retries: int = 3
+    worker_retry_base_delay_ms: int = 1000
+    worker_retry_max_delay_ms: int = 300000
+    # Пакетный режим: worker_batch_size > 1 включает claim пачкой и write-behind статусов
+    worker_batch_size: int = 1
+    worker_batch_max_wait_ms: int = 20
+    worker_write_buffer_size: int = 100
+    worker_write_flush_interval_ms: int = 50
+    # Id недавно отменённых задач в памяти worker: их сообщения отбрасываются без запроса к БД
+    worker_cancelled_cache_size: int = 100000
+    # Адаптивный режим: AIMD-подстройка concurrency и prefetch в [min, max]
+    worker_adaptive_concurrency: bool = False
+    worker_min_concurrency: int = 1
+    worker_max_concurrency: int = 32
+    worker_adapt_interval: float = 1.0
+    worker_max_loop_lag_ms: int = 100
+    worker_db_pool_high_watermark: float = 0.9
+    worker_latency_tolerance: float = 2.0
+    worker_backoff_ratio: float = 0.7
+    # Supervisor: python -m app.workers.task_worker --processes N
+    worker_processes: int = 1
+    worker_cpu_affinity: bool = False
+    worker_restart_delay: float = 1.0
+    worker_shutdown_timeout: float = 30.0
+    # /metrics worker (под supervisor — сумма по процессам); 0 — не запускать
+    worker_metrics_port: int = 9101
+
+    # API serving: python -m app.server (workers > 1 — multiprocess-метрики)
+    api_host: str = "0.0.0.0"
+    api_port: int = 8000
+    api_workers: int = 1
+    prometheus_multiproc_dir: str = "/tmp/prometheus_multiproc"
 
     # CORS
     cors_origins: list[str] = ["*"]
 
     # Features
     enable_metrics: bool = True
+    # Метрики HTTP-запросов по маршрутам (SQL, публикации) и заголовок Server-Timing
+    request_metrics_enabled: bool = True
+    server_timing_header: bool = False
+    slow_query_threshold_ms: int = 200
+
+    @field_validator("task_queue_weights")
+    @classmethod
+    def check_task_queue_weights(cls, weights: dict[str, int]) -> dict[str, int]:
+        if set(weights) != {"HIGH", "MEDIUM", "LOW"} or any(weight <= 0 for weight in weights.values()):
+            raise ValueError("task_queue_weights must set a positive weight for each of HIGH, MEDIUM and LOW")
+        return weights
 
     @property
     def database_url(self) -> str:
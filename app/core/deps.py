@@ -3,6 +3,7 @@ from fastapi import Request
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.db.session import get_session
+from app.services.task_events import TaskEventHub
 from app.services.task_service import TaskService
 
 
@@ -13,4 +14,19 @@ async def get_db() -> AsyncGenerator[AsyncSession, None]:
 
 async def get_task_service(request: Request) -> TaskService:
     queue_service = request.app.state.queue_service
-    return TaskService(queue_service=queue_service)
+    outbox_relay = getattr(request.app.state, "outbox_relay", None)
+    task_cache = getattr(request.app.state, "task_cache", None)
+    idempotency_cache = getattr(request.app.state, "idempotency_cache", None)
+    return TaskService(
+        queue_service=queue_service,
+        outbox_relay=outbox_relay,
+        task_cache=task_cache,
+        idempotency_cache=idempotency_cache,
+    )
+
+
+async def get_event_hub(request: Request) -> TaskEventHub:
+    event_hub = getattr(request.app.state, "event_hub", None)
+    if event_hub is None:
+        event_hub = request.app.state.event_hub = TaskEventHub()
+    return event_hub
@@ -0,0 +1,126 @@
+import logging
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Optional
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.core.config import settings
+from app.core.metrics import (
+    http_request_db_queries,
+    http_request_db_seconds,
+    http_request_duration_seconds,
+    http_request_publish_seconds,
+)
+
+logger = logging.getLogger(__name__)
+
+UNMATCHED_ROUTE = "<unmatched>"
+
+
+@dataclass
+class RequestTimings:
+    """Время запроса по составляющим: SQL и публикации в брокер"""
+    db_queries: int = 0
+    db_seconds: float = 0.0
+    publish_count: int = 0
+    publish_seconds: float = 0.0
+
+
+# Объект мутируется на месте: greenlet SQLAlchemy разделяет контекст с запросом
+_current_timings: ContextVar[Optional[RequestTimings]] = ContextVar("request_timings", default=None)
+
+
+def current_timings() -> Optional[RequestTimings]:
+    return _current_timings.get()
+
+
+def record_publish(duration: float):
+    timings = _current_timings.get()
+    if timings is not None:
+        timings.publish_count += 1
+        timings.publish_seconds += duration
+
+
+def route_template(scope) -> str:
+    """Шаблон маршрута (/api/v1/tasks/{task_id}) — метка без кардинальности конкретных id"""
+    # Новые версии FastAPI не разворачивают вложенные роутеры: у route только свой
+    # относительный путь, полный шаблон лежит в контексте выбранного маршрута
+    context = scope.get("fastapi", {}).get("effective_route_context")
+    path = getattr(context, "path", None) or getattr(scope.get("route"), "path", None)
+    return path or UNMATCHED_ROUTE
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    duration = time.perf_counter() - conn.info["query_started"].pop()
+    timings = _current_timings.get()
+    if timings is not None:
+        timings.db_queries += 1
+        timings.db_seconds += duration
+    if duration * 1000 >= settings.slow_query_threshold_ms:
+        logger.warning(f"Slow query ({duration * 1000:.0f}ms): {statement}")
+
+
+def instrument_engine(engine: AsyncEngine):
+    """Подсчёт SQL-запросов и их времени для текущего HTTP-запроса"""
+    sync_engine = engine.sync_engine
+    if event.contains(sync_engine, "before_cursor_execute", _before_cursor_execute):
+        return
+    event.listen(sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(sync_engine, "after_cursor_execute", _after_cursor_execute)
+
+
+class RequestMetricsMiddleware:
+    """ASGI middleware: латентность, SQL и публикации по шаблону маршрута
+
+    С server_timing=True добавляет заголовок Server-Timing (app, db, publish).
+    """
+
+    def __init__(self, app, server_timing: bool = False):
+        self.app = app
+        self.server_timing = server_timing
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings = RequestTimings()
+        token = _current_timings.set(timings)
+        started = time.perf_counter()
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start" and self.server_timing:
+                message["headers"] = [
+                    *message.get("headers", []),
+                    (b"server-timing", self.server_timing_value(timings, started).encode()),
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current_timings.reset(token)
+            labels = (scope["method"], route_template(scope))
+            http_request_duration_seconds.labels(*labels).observe(time.perf_counter() - started)
+            http_request_db_queries.labels(*labels).observe(timings.db_queries)
+            http_request_db_seconds.labels(*labels).observe(timings.db_seconds)
+            if timings.publish_count:
+                http_request_publish_seconds.labels(*labels).observe(timings.publish_seconds)
+
+    @staticmethod
+    def server_timing_value(timings: RequestTimings, started: float) -> str:
+        elapsed = (time.perf_counter() - started) * 1000
+        parts = [
+            f"app;dur={elapsed:.1f}",
+            f'db;dur={timings.db_seconds * 1000:.1f};desc="{timings.db_queries} queries"',
+        ]
+        if timings.publish_count:
+            parts.append(f"publish;dur={timings.publish_seconds * 1000:.1f}")
+        return ", ".join(parts)
@@ -1,14 +1,126 @@
+import atexit
+import copy
+import json
 import logging
+import logging.handlers
+import os
+import queue
+import socket
 import sys
+import time
+from datetime import datetime, timezone
 from pathlib import Path
 from typing import Optional
 
+from app.core.config import settings
 
-def setup_logging(log_level: str = "INFO", log_file: Optional[str] = None) -> None:
-    """Настройка логирования для приложения"""
+LOG_FORMAT = "%(asctime)s | %(levelname)-8s | %(name)s:%(funcName)s:%(lineno)d - %(message)s"
+DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
 
-    log_format = "%(asctime)s | %(levelname)-8s | %(name)s:%(funcName)s:%(lineno)d - %(message)s"
-    date_format = "%Y-%m-%d %H:%M:%S"
+# Активный listener: setup_logging() можно вызвать повторно (force)
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+class JsonFormatter(logging.Formatter):
+    """Одна JSON-строка на запись"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "timestamp": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "function": record.funcName,
+            "line": record.lineno,
+            "process": record.process,
+            "message": record.getMessage(),
+        }
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class SamplingFilter(logging.Filter):
+    """Ограничение частоты записей уровня INFO и ниже: не больше rate в секунду с одного места вызова
+
+    Ключ — (logger, строка), поэтому работает и для f-строк. WARNING и выше не отбрасываются.
+    """
+
+    def __init__(self, rate: int):
+        super().__init__()
+        self.rate = rate
+        self._windows: dict[tuple[str, int], list] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if self.rate <= 0 or record.levelno > logging.INFO:
+            return True
+
+        key = (record.name, record.lineno)
+        now = int(time.monotonic())
+        window = self._windows.get(key)
+        if window is None or window[0] != now:
+            suppressed = window[2] if window else 0
+            self._windows[key] = window = [now, 0, 0]
+            if suppressed:
+                record.msg = f"{record.msg} ({suppressed} similar messages suppressed)"
+
+        window[1] += 1
+        if window[1] > self.rate:
+            window[2] += 1
+            return False
+        return True
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler: в потоке event loop только подготовка записи и put_nowait
+
+    В отличие от базового prepare(), traceback сохраняется в exc_text, а не
+    вклеивается в message — JSON-форматтер выводит его отдельным полем.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def process_log_name(log_file: str) -> str:
+    """Имя файла лога, уникальное для процесса: api.log -> api-<host>-<pid>.log
+
+    RotatingFileHandler не согласует ротацию между процессами: uvicorn workers,
+    дочерние процессы supervisor и контейнеры с общим ./logs пишут каждый в свой файл.
+    Имя хоста различает контейнеры, у которых pid совпадают.
+    """
+    path = Path(log_file)
+    return f"{path.stem}-{socket.gethostname()}-{os.getpid()}{path.suffix}"
+
+
+def setup_logging(
+        log_level: str = "INFO",
+        log_file: Optional[str] = None,
+        json_format: bool = None,
+        max_bytes: int = None,
+        backup_count: int = None,
+        sample_rate: int = None,
+) -> None:
+    """Настройка логирования для приложения
+
+    Запись в stdout и файлы выполняет QueueListener в фоновом потоке,
+    поэтому медленный диск не блокирует event loop.
+    """
+    global _listener
+
+    json_format = settings.log_json if json_format is None else json_format
+    max_bytes = settings.log_max_bytes if max_bytes is None else max_bytes
+    backup_count = settings.log_backup_count if backup_count is None else backup_count
+    sample_rate = settings.log_sample_rate if sample_rate is None else sample_rate
+
+    formatter = JsonFormatter() if json_format else logging.Formatter(LOG_FORMAT, DATE_FORMAT)
 
     handlers = [
         logging.StreamHandler(sys.stdout)
@@ -18,21 +130,38 @@ def setup_logging(log_level: str = "INFO", log_file: Optional[str] = None) -> No
         log_dir = Path("logs")
         log_dir.mkdir(exist_ok=True)
 
-        # Основной лог файл
+        # Основной лог файл (ротация по размеру, свой файл у каждого процесса)
         handlers.append(
-            logging.FileHandler(log_dir / log_file, mode='a')
+            logging.handlers.RotatingFileHandler(
+                log_dir / process_log_name(log_file),
+                maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8",
+            )
         )
 
         # Файл для ошибок
-        error_handler = logging.FileHandler(log_dir / "errors.log", mode='a')
+        error_handler = logging.handlers.RotatingFileHandler(
+            log_dir / process_log_name("errors.log"),
+            maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8",
+        )
         error_handler.setLevel(logging.ERROR)
         handlers.append(error_handler)
 
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    if _listener is not None:
+        _listener.stop()
+
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+
+    queue_handler = NonBlockingQueueHandler(log_queue)
+    queue_handler.addFilter(SamplingFilter(sample_rate))
+
     logging.basicConfig(
         level=getattr(logging, log_level.upper()),
-        format=log_format,
-        datefmt=date_format,
-        handlers=handlers,
+        handlers=[queue_handler],
         force=True
     )
 
@@ -43,3 +172,14 @@ def setup_logging(log_level: str = "INFO", log_file: Optional[str] = None) -> No
 
     logger = logging.getLogger(__name__)
     logger.info(f"Logging configured with level: {log_level}")
+
+
+def shutdown_logging() -> None:
+    """Дописать очередь и остановить фоновый поток (при завершении процесса)"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+atexit.register(shutdown_logging)
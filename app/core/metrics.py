@@ -1,7 +1,22 @@
-from prometheus_client import Counter, Histogram, Gauge
+from prometheus_client import (
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    REGISTRY,
+    generate_latest,
+    multiprocess,
+    start_http_server,
+)
+import os
 import time
 from functools import wraps
 
+# Multiprocess-режим prometheus_client (uvicorn --workers N): каждый процесс пишет
+# значения в файлы PROMETHEUS_MULTIPROC_DIR, /metrics агрегирует их.
+# Переменная должна быть задана до импорта этого модуля (см. app/server.py)
+MULTIPROCESS_MODE = "PROMETHEUS_MULTIPROC_DIR" in os.environ
+
 # Метрики для задач
 tasks_created_total = Counter(
     'tasks_created_total',
@@ -34,7 +49,29 @@ task_processing_duration_seconds = Histogram(
 # Активные задачи в данный момент
 active_tasks_gauge = Gauge(
     'active_tasks',
-    'Number of tasks currently being processed'
+    'Number of tasks currently being processed',
+    multiprocess_mode='livesum'
+)
+
+# Текущий лимит задач в работе у worker (адаптивный режим меняет его на лету)
+worker_concurrency_limit = Gauge(
+    'worker_concurrency_limit',
+    'Current limit of tasks processed concurrently by the worker',
+    multiprocess_mode='livesum'
+)
+
+# Отменённые задачи, снятые worker: queued — сообщение отброшено без БД, running — прервано выполнение
+worker_cancelled_tasks_total = Counter(
+    'worker_cancelled_tasks_total',
+    'Cancelled tasks dropped or interrupted by the worker',
+    ['stage']
+)
+
+# Упавшие задачи: retried — отложены в очередь задержки, parked — попытки исчерпаны
+worker_task_retries_total = Counter(
+    'worker_task_retries_total',
+    'Failed task messages by outcome (retried, parked)',
+    ['outcome']
 )
 
 # Метрики RabbitMQ
@@ -48,6 +85,127 @@ rabbitmq_messages_consumed = Counter(
     'Total messages consumed from RabbitMQ'
 )
 
+rabbitmq_channel_pool_size = Gauge(
+    'rabbitmq_channel_pool_size',
+    'Configured size of the publisher channel pool',
+    multiprocess_mode='livesum'
+)
+
+rabbitmq_channel_pool_in_use = Gauge(
+    'rabbitmq_channel_pool_in_use',
+    'Publisher channels currently acquired from the pool',
+    multiprocess_mode='livesum'
+)
+
+rabbitmq_publish_confirm_seconds = Histogram(
+    'rabbitmq_publish_confirm_seconds',
+    'Time from publish to broker confirm',
+    buckets=[0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5]
+)
+
+rabbitmq_publish_errors_total = Counter(
+    'rabbitmq_publish_errors_total',
+    'Failed publish attempts (including confirm timeouts and nacks)'
+)
+
+# Ожидание сообщения от публикации до начала обработки worker'ом
+task_queue_wait_seconds = Histogram(
+    'task_queue_wait_seconds',
+    'Time from publish to processing start by task priority',
+    ['priority'],
+    buckets=[0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300]
+)
+
+# Кэш задач
+task_cache_requests_total = Counter(
+    'task_cache_requests_total',
+    'Task cache lookups by result (hit, miss, coalesced)',
+    ['result']
+)
+
+# Повторы POST /tasks с тем же Idempotency-Key
+idempotent_replays_total = Counter(
+    'idempotent_replays_total',
+    'Task creation replays answered from the original response by source (cache, db)',
+    ['source']
+)
+
+# Счётчики task_counts, исправленные сверкой с tasks (ненулевое значение — дрейф)
+task_counts_corrections_total = Counter(
+    'task_counts_corrections_total',
+    'task_counts (status, priority) pairs corrected by reconciliation'
+)
+
+# Отложенные задачи
+scheduled_tasks_released_total = Counter(
+    'scheduled_tasks_released_total',
+    'Scheduled tasks moved to PENDING after run_at'
+)
+
+scheduled_task_release_lag_seconds = Histogram(
+    'scheduled_task_release_lag_seconds',
+    'Delay between run_at and release of a scheduled task',
+    buckets=[0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60]
+)
+
+
+# Метрики HTTP-запросов по шаблону маршрута (app/core/instrumentation.py)
+http_request_duration_seconds = Histogram(
+    'http_request_duration_seconds',
+    'HTTP request latency by route template',
+    ['method', 'route'],
+    buckets=[0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10]
+)
+
+http_request_db_queries = Histogram(
+    'http_request_db_queries',
+    'SQL statements executed per HTTP request',
+    ['method', 'route'],
+    buckets=[0, 1, 2, 3, 5, 10, 20, 50, 100]
+)
+
+http_request_db_seconds = Histogram(
+    'http_request_db_seconds',
+    'Time spent in SQL statements per HTTP request',
+    ['method', 'route'],
+    buckets=[0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5]
+)
+
+http_request_publish_seconds = Histogram(
+    'http_request_publish_seconds',
+    'Time spent publishing to the broker per HTTP request',
+    ['method', 'route'],
+    buckets=[0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5]
+)
+
+
+def render_metrics() -> bytes:
+    """Метрики в формате Prometheus; в multiprocess-режиме — сумма по всем процессам"""
+    if not MULTIPROCESS_MODE:
+        return generate_latest()
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return generate_latest(registry)
+
+
+def start_metrics_server(port: int, multiproc_dir: str = None):
+    """/metrics процесса без API (worker) на отдельном порту; возвращает HTTP-сервер
+
+    multiproc_dir (supervisor) — сумма по файлам метрик дочерних процессов.
+    """
+    registry = REGISTRY
+    if multiproc_dir or MULTIPROCESS_MODE:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry, path=multiproc_dir)
+    server, _ = start_http_server(port, registry=registry)
+    return server
+
+
+def mark_process_dead(pid: int = None, multiproc_dir: str = None):
+    """Удаление live-gauge файлов завершившегося процесса (вызывается при shutdown)"""
+    if multiproc_dir or MULTIPROCESS_MODE:
+        multiprocess.mark_process_dead(pid or os.getpid(), multiproc_dir)
+
 
 def track_task_processing():
     """Отслеживание времени обработки задачи"""
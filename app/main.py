@@ -1,15 +1,24 @@
 from contextlib import asynccontextmanager
+import asyncio
 import logging
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import Response
-from prometheus_client import generate_latest, CONTENT_TYPE_LATEST
+from prometheus_client import CONTENT_TYPE_LATEST
 
 from app.core.config import settings
+from app.core.instrumentation import RequestMetricsMiddleware, instrument_engine
 from app.core.logging_config import setup_logging
+from app.core.metrics import mark_process_dead, render_metrics
 from app.api.v1.router import api_router
+from app.db.session import engine
+from app.services.outbox_relay import OutboxRelay
 from app.services.queue_service import QueueService
+from app.services.task_cache import TaskCache
+from app.services.task_events import TaskEventHub
+from app.services.task_scheduler import TaskScheduler, listen_dsn
+from app.workers.task_worker import TaskWorker
 
 # Настройка логирования
 setup_logging(log_level=settings.log_level, log_file="api.log")
@@ -18,18 +27,64 @@ logger = logging.getLogger(__name__)
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # Запуск
+    # Запуск (в режиме --workers N — в каждом процессе: своё подключение к брокеру)
     logger.info("Starting application...")
     queue_service = QueueService()
     await queue_service.connect()
     app.state.queue_service = queue_service
+
+    task_cache = None
+    if settings.task_cache_enabled:
+        task_cache = TaskCache(max_size=settings.task_cache_max_size, ttl=settings.task_cache_ttl)
+    app.state.task_cache = task_cache
+    # LRU ответов на повторы POST /tasks; не инвалидируется — повтор получает исходный ответ
+    app.state.idempotency_cache = TaskCache(
+        max_size=settings.idempotency_cache_size,
+        ttl=settings.idempotency_key_ttl_hours * 3600,
+    )
+    event_hub = TaskEventHub()
+    app.state.event_hub = event_hub
+
+    def on_status_event(event: dict):
+        # Сначала инвалидация: проснувшиеся клиенты не должны прочитать старое значение
+        if task_cache is not None:
+            task_cache.invalidate(event["task_id"])
+        event_hub.publish(event)
+
+    await queue_service.subscribe_status_events(on_status_event)
+
+    outbox_relay = None
+    if settings.outbox_relay_in_api:
+        outbox_relay = OutboxRelay(queue_service)
+        outbox_relay.start()
+    app.state.outbox_relay = outbox_relay
+
+    scheduler = None
+    if settings.scheduler_in_api:
+        scheduler = TaskScheduler(outbox_relay=outbox_relay, queue_service=queue_service, dsn=listen_dsn())
+        scheduler.start()
+    app.state.scheduler = scheduler
+
+    # In-process брокер: worker работает в том же event loop, что и API
+    worker = worker_runner = None
+    if settings.broker_backend == "memory":
+        worker = TaskWorker(queue_service=queue_service)
+        worker_runner = asyncio.create_task(worker.start())
     logger.info("Application started successfully")
 
     yield
 
     # Завершение / Выключение
     logger.info("Shutting down application...")
+    if worker:
+        worker.shutdown_event.set()
+        await worker_runner
+    if scheduler:
+        await scheduler.stop()
+    if outbox_relay:
+        await outbox_relay.stop()
     await queue_service.disconnect()
+    mark_process_dead()
     logger.info("Application shut down successfully")
 
 
@@ -43,7 +98,9 @@ app = FastAPI(
     * **Создание задач** через REST API
     * **Асинхронная обработка** в фоновом режиме
     * **Приоритеты**: LOW, MEDIUM, HIGH
-    * **Статусы**: NEW → PENDING → IN_PROGRESS → COMPLETED/FAILED/CANCELLED
+    * **Идемпотентное создание**: заголовок `Idempotency-Key`
+    * **Отложенный запуск**: `run_at` — задача ждёт в статусе SCHEDULED
+    * **Статусы**: NEW → (SCHEDULED →) PENDING → IN_PROGRESS → COMPLETED/FAILED/CANCELLED
 
     ### Архитектура:
     - FastAPI для REST API
@@ -74,6 +131,10 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+if settings.request_metrics_enabled:
+    instrument_engine(engine)
+    app.add_middleware(RequestMetricsMiddleware, server_timing=settings.server_timing_header)
+
 app.include_router(api_router, prefix=settings.api_v1_prefix)
 
 
@@ -92,4 +153,4 @@ async def metrics():
     """Prometheus metrics endpoint"""
     if not settings.enable_metrics:
         return {"error": "Metrics disabled"}
-    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+    return Response(render_metrics(), media_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,26 @@
+from datetime import datetime
+from sqlalchemy import DateTime, String
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.db.base import Base
+
+
+class TaskIdempotencyKey(Base):
+    """Idempotency-Key запроса создания задачи -> созданная задача
+
+    Отдельная таблица: уникальный индекс на партиционированной tasks
+    обязан включать created_at и не защитил бы от повторов.
+    """
+
+    __tablename__ = "task_idempotency_keys"
+
+    key: Mapped[str] = mapped_column(String(255), primary_key=True)
+    task_id: Mapped[int] = mapped_column(nullable=False)
+    # sha256 тела запроса: тот же ключ с другим телом — ошибка, а не чужая задача в ответе
+    request_hash: Mapped[str] = mapped_column(String(64), nullable=False)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        default=datetime.utcnow,
+        nullable=False,
+        index=True,
+    )
@@ -0,0 +1,24 @@
+from datetime import datetime
+from sqlalchemy import BigInteger, DateTime, Enum as SQLEnum
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.db.base import Base
+from app.models.task import TaskPriorityEnum
+
+
+class TaskOutbox(Base):
+    """Сообщения на публикацию, записанные в одной транзакции с задачей"""
+
+    __tablename__ = "task_outbox"
+
+    id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    task_id: Mapped[int] = mapped_column(nullable=False)
+    priority: Mapped[TaskPriorityEnum] = mapped_column(
+        SQLEnum(TaskPriorityEnum, name="task_priority"),
+        nullable=False,
+    )
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        default=datetime.utcnow,
+        nullable=False,
+    )
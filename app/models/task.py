@@ -1,5 +1,6 @@
+import re
 from datetime import datetime
-from sqlalchemy import String, Text, DateTime, Enum as SQLEnum
+from sqlalchemy import DDL, String, Text, DateTime, Index, Enum as SQLEnum, event, text
 from sqlalchemy.orm import Mapped, mapped_column
 import enum
 
@@ -14,6 +15,7 @@ class TaskPriorityEnum(str, enum.Enum):
 
 class TaskStatusEnum(str, enum.Enum):
     NEW = "NEW"
+    SCHEDULED = "SCHEDULED"
     PENDING = "PENDING"
     IN_PROGRESS = "IN_PROGRESS"
     COMPLETED = "COMPLETED"
@@ -21,10 +23,46 @@ class TaskStatusEnum(str, enum.Enum):
     CANCELLED = "CANCELLED"
 
 
+# Помесячные партиции tasks_pYYYYMM создаёт python -m app.workers.partitions;
+# строки вне созданных диапазонов попадают в tasks_default
+TASK_DEFAULT_PARTITION = "tasks_default"
+TASK_PARTITION_PATTERN = re.compile(r"^tasks_(p\d{6}|default)$")
+
+
 class Task(Base):
+    """Задача; таблица секционирована по created_at (RANGE, помесячно)
+
+    Первичный ключ в БД — (id, created_at), как требует секционирование;
+    для ORM идентичность задачи — id.
+    """
+
     __tablename__ = "tasks"
+    __table_args__ = (
+        # Индексы под ORDER BY created_at DESC, id DESC (offset и keyset пагинация)
+        Index("ix_tasks_created_at_id", "created_at", "id"),
+        Index("ix_tasks_status_created_at_id", "status", "created_at", "id"),
+        Index("ix_tasks_priority_created_at_id", "priority", "created_at", "id"),
+        Index("ix_tasks_status_priority_created_at_id", "status", "priority", "created_at", "id"),
+        # Частичные индексы активных задач: маленькие и горячие, пока финальные
+        # статусы составляют почти всю таблицу
+        Index(
+            "ix_tasks_active_status_created_at_id", "status", "created_at", "id",
+            postgresql_where=text("status IN ('PENDING', 'IN_PROGRESS')"),
+        ),
+        Index(
+            "ix_tasks_active_status_priority_created_at_id", "status", "priority", "created_at", "id",
+            postgresql_where=text("status IN ('PENDING', 'IN_PROGRESS')"),
+        ),
+        # Отложенные задачи: TaskScheduler читает ближайшие по run_at
+        Index(
+            "ix_tasks_scheduled_run_at_id", "run_at", "id",
+            postgresql_where=text("status = 'SCHEDULED'"),
+        ),
+        {"postgresql_partition_by": "RANGE (created_at)"},
+    )
+    __mapper_args__ = {"primary_key": ["id"]}
 
-    id: Mapped[int] = mapped_column(primary_key=True, index=True)
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
     title: Mapped[str] = mapped_column(String(255), nullable=False)
     description: Mapped[str | None] = mapped_column(Text, nullable=True)
     priority: Mapped[TaskPriorityEnum] = mapped_column(
@@ -36,12 +74,16 @@ class Task(Base):
         SQLEnum(TaskStatusEnum, name="task_status"),
         default=TaskStatusEnum.NEW,
         nullable=False,
-        index=True,
     )
     created_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True),
         default=datetime.utcnow,
-        nullable=False,
+        primary_key=True,
+    )
+    # Время запуска отложенной задачи (status SCHEDULED до наступления run_at)
+    run_at: Mapped[datetime | None] = mapped_column(
+        DateTime(timezone=True),
+        nullable=True,
     )
     started_at: Mapped[datetime | None] = mapped_column(
         DateTime(timezone=True),
@@ -53,3 +95,10 @@ class Task(Base):
     )
     result: Mapped[str | None] = mapped_column(Text, nullable=True)
     error: Mapped[str | None] = mapped_column(Text, nullable=True)
+
+
+event.listen(
+    Task.__table__,
+    "after_create",
+    DDL(f"CREATE TABLE {TASK_DEFAULT_PARTITION} PARTITION OF tasks DEFAULT").execute_if(dialect="postgresql"),
+)
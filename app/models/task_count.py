@@ -0,0 +1,82 @@
+from sqlalchemy import BigInteger, DDL, SmallInteger, Enum as SQLEnum, event
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.db.base import Base
+from app.models.task import Task, TaskPriorityEnum, TaskStatusEnum
+
+# Счётчик одной пары (status, priority) разбит на слоты по соединению: иначе все
+# создания задач ждали бы блокировку одной строки (NEW, MEDIUM) до commit
+TASK_COUNT_SLOTS = 16
+
+
+class TaskCount(Base):
+    """Число задач по (status, priority), поддерживается триггерами на tasks
+
+    Итог для фильтра — сумма n по слотам, без COUNT(*) по tasks.
+    """
+
+    __tablename__ = "task_counts"
+
+    status: Mapped[TaskStatusEnum] = mapped_column(
+        SQLEnum(TaskStatusEnum, name="task_status"),
+        primary_key=True,
+    )
+    priority: Mapped[TaskPriorityEnum] = mapped_column(
+        SQLEnum(TaskPriorityEnum, name="task_priority"),
+        primary_key=True,
+    )
+    slot: Mapped[int] = mapped_column(SmallInteger, primary_key=True, default=0)
+    n: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+
+
+# Statement-level триггеры с transition tables: пакетный INSERT/UPDATE меняет
+# счётчики одним запросом на группу, а не на каждую строку. Строки upsert идут
+# в порядке ключа, чтобы параллельные транзакции не ловили deadlock.
+# Тот же SQL в миграции 5d7e1a9c3b28 — при изменении править оба места.
+TASK_COUNTS_FUNCTION = f"""
+CREATE OR REPLACE FUNCTION task_counts_apply() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'TRUNCATE' THEN
+        UPDATE task_counts SET n = 0 WHERE n <> 0;
+    ELSIF TG_OP = 'INSERT' THEN
+        INSERT INTO task_counts AS c (status, priority, slot, n)
+        SELECT status, priority, mod(pg_backend_pid(), {TASK_COUNT_SLOTS}), count(*)
+        FROM new_rows GROUP BY status, priority ORDER BY status, priority
+        ON CONFLICT (status, priority, slot) DO UPDATE SET n = c.n + EXCLUDED.n;
+    ELSIF TG_OP = 'DELETE' THEN
+        INSERT INTO task_counts AS c (status, priority, slot, n)
+        SELECT status, priority, mod(pg_backend_pid(), {TASK_COUNT_SLOTS}), -count(*)
+        FROM old_rows GROUP BY status, priority ORDER BY status, priority
+        ON CONFLICT (status, priority, slot) DO UPDATE SET n = c.n + EXCLUDED.n;
+    ELSE
+        -- UPDATE без смены status/priority даёт нулевую разницу и счётчики не трогает
+        INSERT INTO task_counts AS c (status, priority, slot, n)
+        SELECT status, priority, mod(pg_backend_pid(), {TASK_COUNT_SLOTS}), sum(delta)
+        FROM (
+            SELECT status, priority, 1 AS delta FROM new_rows
+            UNION ALL
+            SELECT status, priority, -1 AS delta FROM old_rows
+        ) AS d
+        GROUP BY status, priority HAVING sum(delta) <> 0 ORDER BY status, priority
+        ON CONFLICT (status, priority, slot) DO UPDATE SET n = c.n + EXCLUDED.n;
+    END IF;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql
+"""
+
+TASK_COUNTS_TRIGGERS = [
+    "CREATE TRIGGER tasks_counts_insert AFTER INSERT ON tasks "
+    "REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION task_counts_apply()",
+    "CREATE TRIGGER tasks_counts_update AFTER UPDATE ON tasks "
+    "REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION task_counts_apply()",
+    "CREATE TRIGGER tasks_counts_delete AFTER DELETE ON tasks "
+    "REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE FUNCTION task_counts_apply()",
+    "CREATE TRIGGER tasks_counts_truncate AFTER TRUNCATE ON tasks "
+    "FOR EACH STATEMENT EXECUTE FUNCTION task_counts_apply()",
+]
+
+# create_all (тесты, локальный запуск без alembic) тоже ставит триггеры
+event.listen(Task.__table__, "after_create", DDL(TASK_COUNTS_FUNCTION).execute_if(dialect="postgresql"))
+for _trigger in TASK_COUNTS_TRIGGERS:
+    event.listen(Task.__table__, "after_create", DDL(_trigger).execute_if(dialect="postgresql"))
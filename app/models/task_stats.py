@@ -0,0 +1,66 @@
+from datetime import datetime
+from sqlalchemy import BigInteger, DDL, DateTime, SmallInteger, String, event
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.db.base import Base
+from app.models.task import Task
+from app.models.task_count import TASK_COUNT_SLOTS
+
+# Логарифмические корзины гистограмм: bin = floor(log_base(ms + 1)),
+# относительная погрешность перцентилей — не больше ~5%
+STATS_BIN_BASE = 1.1
+
+# kind: ожидание в очереди (started_at - наибольшее из run_at и created_at:
+# run_at в прошлом не удлиняет ожидание) и время обработки
+# (completed_at - started_at) отдельно для COMPLETED и FAILED
+STATS_KIND_WAIT = "wait"
+
+
+class TaskStatsBucket(Base):
+    """Поминутные гистограммы длительностей, пополняются триггером на tasks"""
+
+    __tablename__ = "task_stats_buckets"
+
+    minute: Mapped[datetime] = mapped_column(DateTime(timezone=True), primary_key=True)
+    kind: Mapped[str] = mapped_column(String(16), primary_key=True)
+    bin: Mapped[int] = mapped_column(SmallInteger, primary_key=True)
+    slot: Mapped[int] = mapped_column(SmallInteger, primary_key=True, default=0)
+    n: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+
+
+# Событие учитывается один раз: при первом появлении started_at и при переходе
+# в финальный статус. Слоты — как у task_counts, против блокировки горячей строки.
+# Текущая версия SQL — в миграции 7f5e2c1a9b34 (первая — 9a4c2e7f1d63); изменения — новой миграцией.
+TASK_STATS_FUNCTION = f"""
+CREATE OR REPLACE FUNCTION task_stats_apply() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO task_stats_buckets AS b (minute, kind, bin, slot, n)
+    SELECT minute, kind, bin, mod(pg_backend_pid(), {TASK_COUNT_SLOTS}), count(*)
+    FROM (
+        SELECT date_trunc('minute', nr.started_at) AS minute, '{STATS_KIND_WAIT}' AS kind,
+               floor(ln(greatest(extract(epoch FROM nr.started_at - greatest(nr.run_at, nr.created_at)) * 1000, 0) + 1)
+                     / ln({STATS_BIN_BASE}))::smallint AS bin
+        FROM new_rows nr JOIN old_rows o ON o.id = nr.id
+        WHERE o.started_at IS NULL AND nr.started_at IS NOT NULL
+        UNION ALL
+        SELECT date_trunc('minute', nr.completed_at), nr.status::text,
+               floor(ln(greatest(extract(epoch FROM nr.completed_at - nr.started_at) * 1000, 0) + 1)
+                     / ln({STATS_BIN_BASE}))::smallint
+        FROM new_rows nr JOIN old_rows o ON o.id = nr.id
+        WHERE nr.status IN ('COMPLETED', 'FAILED') AND o.status <> nr.status
+          AND nr.started_at IS NOT NULL AND nr.completed_at IS NOT NULL
+    ) AS e
+    GROUP BY minute, kind, bin ORDER BY minute, kind, bin
+    ON CONFLICT (minute, kind, bin, slot) DO UPDATE SET n = b.n + EXCLUDED.n;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql
+"""
+
+TASK_STATS_TRIGGER = (
+    "CREATE TRIGGER tasks_stats_update AFTER UPDATE ON tasks "
+    "REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION task_stats_apply()"
+)
+
+event.listen(Task.__table__, "after_create", DDL(TASK_STATS_FUNCTION).execute_if(dialect="postgresql"))
+event.listen(Task.__table__, "after_create", DDL(TASK_STATS_TRIGGER).execute_if(dialect="postgresql"))
@@ -0,0 +1,42 @@
+from datetime import datetime
+from typing import Optional
+from sqlalchemy import delete, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.idempotency_key import TaskIdempotencyKey
+from app.models.task import Task
+
+
+class IdempotencyKeyRepository:
+    @staticmethod
+    async def get_task(db: AsyncSession, key: str) -> Optional[tuple[Task, str]]:
+        """Задача, созданная запросом с этим ключом, и хэш тела того запроса"""
+        result = await db.execute(
+            select(Task, TaskIdempotencyKey.request_hash)
+            .join(TaskIdempotencyKey, TaskIdempotencyKey.task_id == Task.id)
+            .where(TaskIdempotencyKey.key == key)
+        )
+        row = result.one_or_none()
+        return (row[0], row[1]) if row is not None else None
+
+    @staticmethod
+    async def add(db: AsyncSession, key: str, task_id: int, request_hash: str) -> bool:
+        """Запись ключа (без commit); False — ключ уже занят другой транзакцией
+
+        Конкурентная вставка того же ключа ждёт на уникальном индексе, пока
+        первая транзакция не завершится.
+        """
+        result = await db.execute(
+            insert(TaskIdempotencyKey)
+            .values(key=key, task_id=task_id, request_hash=request_hash)
+            .on_conflict_do_nothing(index_elements=[TaskIdempotencyKey.key])
+            .returning(TaskIdempotencyKey.key)
+        )
+        return result.scalar() is not None
+
+    @staticmethod
+    async def prune(db: AsyncSession, before: datetime) -> int:
+        """Удаление ключей, записанных раньше before (без commit)"""
+        result = await db.execute(delete(TaskIdempotencyKey).where(TaskIdempotencyKey.created_at < before))
+        return result.rowcount
@@ -0,0 +1,32 @@
+from sqlalchemy import delete, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.outbox import TaskOutbox
+from app.models.task import Task
+
+
+class OutboxRepository:
+    @staticmethod
+    async def add_many(db: AsyncSession, tasks: list[Task]) -> None:
+        """Запись сообщений в outbox (без commit — в транзакции вызывающего)"""
+        if not tasks:
+            return
+        await db.execute(
+            insert(TaskOutbox),
+            [{"task_id": task.id, "priority": task.priority} for task in tasks],
+        )
+
+    @staticmethod
+    async def fetch_batch(db: AsyncSession, limit: int) -> list[TaskOutbox]:
+        """Выборка пачки сообщений с блокировкой (параллельные relay пропускают занятые строки)"""
+        result = await db.execute(
+            select(TaskOutbox)
+            .order_by(TaskOutbox.id)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )
+        return list(result.scalars().all())
+
+    @staticmethod
+    async def delete_many(db: AsyncSession, ids: list[int]) -> None:
+        await db.execute(delete(TaskOutbox).where(TaskOutbox.id.in_(ids)))
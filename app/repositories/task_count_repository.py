@@ -0,0 +1,77 @@
+from typing import Optional
+from sqlalchemy import func, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.task import Task
+from app.models.task_count import TaskCount
+from app.schemas.task import TaskPriority, TaskStatus
+
+
+class TaskCountRepository:
+    @staticmethod
+    async def total(
+            db: AsyncSession,
+            status: Optional[TaskStatus] = None,
+            priority: Optional[TaskPriority] = None,
+    ) -> int:
+        """Число задач по фильтру из task_counts (поиск по первичному ключу вместо COUNT(*))"""
+        query = select(func.coalesce(func.sum(TaskCount.n), 0))
+        if status:
+            query = query.where(TaskCount.status == status)
+        if priority:
+            query = query.where(TaskCount.priority == priority)
+        result = await db.execute(query)
+        return int(result.scalar())
+
+    @staticmethod
+    async def breakdown(db: AsyncSession) -> list[tuple[str, str, int]]:
+        """Число задач по каждой паре (status, priority)"""
+        result = await db.execute(
+            select(TaskCount.status, TaskCount.priority, func.sum(TaskCount.n))
+            .group_by(TaskCount.status, TaskCount.priority)
+        )
+        return [(status.value, priority.value, int(n)) for status, priority, n in result.all()]
+
+    @staticmethod
+    async def drift(db: AsyncSession) -> dict[tuple[str, str], tuple[int, int]]:
+        """Расхождения task_counts с tasks {(status, priority): (было, стало)}
+
+        Должен быть первым запросом транзакции: оба подсчёта читаются из одного
+        снимка REPEATABLE READ, поэтому запись в tasks не блокируется, а триггеры
+        параллельных транзакций не попадают ни в одну из сторон.
+        """
+        await db.execute(text("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ READ ONLY"))
+
+        actual_result = await db.execute(
+            select(Task.status, Task.priority, func.count()).group_by(Task.status, Task.priority)
+        )
+        actual = {(status.value, priority.value): n for status, priority, n in actual_result.all()}
+
+        stored = {
+            (status, priority): n for status, priority, n in await TaskCountRepository.breakdown(db)
+        }
+
+        return {
+            key: (stored.get(key, 0), actual.get(key, 0))
+            for key in actual.keys() | stored.keys()
+            if stored.get(key, 0) != actual.get(key, 0)
+        }
+
+    @staticmethod
+    async def apply_drift(db: AsyncSession, drift: dict[tuple[str, str], tuple[int, int]]) -> None:
+        """Прибавление (стало - было) к слоту 0 (без commit)
+
+        Поправка аддитивна, как и инкременты триггеров, поэтому её можно применять
+        в отдельной транзакции после снимка: изменения после снимка уже учтены в n.
+        """
+        await db.execute(
+            text(
+                "INSERT INTO task_counts AS c (status, priority, slot, n) "
+                "VALUES (CAST(:status AS task_status), CAST(:priority AS task_priority), 0, :delta) "
+                "ON CONFLICT (status, priority, slot) DO UPDATE SET n = c.n + EXCLUDED.n"
+            ),
+            [
+                {"status": status, "priority": priority, "delta": actual - stored}
+                for (status, priority), (stored, actual) in sorted(drift.items())
+            ],
+        )
@@ -0,0 +1,115 @@
+from datetime import datetime
+from typing import AsyncIterator
+from sqlalchemy import column, select, table, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.task import TASK_DEFAULT_PARTITION, TASK_PARTITION_PATTERN, Task, TaskStatusEnum
+
+TERMINAL_STATUSES = (TaskStatusEnum.COMPLETED, TaskStatusEnum.FAILED, TaskStatusEnum.CANCELLED)
+
+
+def _checked(name: str) -> str:
+    """Имя партиции подставляется в DDL, поэтому допускаются только tasks_pYYYYMM и tasks_default"""
+    if not TASK_PARTITION_PATTERN.match(name):
+        raise ValueError(f"Not a tasks partition: {name}")
+    return name
+
+
+def _partition_table(name: str):
+    return table(_checked(name), *(column(c.name, c.type) for c in Task.__table__.columns))
+
+
+class TaskPartitionRepository:
+    @staticmethod
+    async def set_lock_timeout(db: AsyncSession, timeout_ms: int) -> None:
+        """DDL ждёт блокировку не дольше timeout_ms: в очереди за ним встали бы все запросы к tasks"""
+        await db.execute(text(f"SET LOCAL lock_timeout = {int(timeout_ms)}"))
+
+    @staticmethod
+    async def partition_names(db: AsyncSession) -> list[str]:
+        """Имена подключённых партиций tasks"""
+        result = await db.execute(text(
+            "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = 'tasks'::regclass ORDER BY c.relname"
+        ))
+        return list(result.scalars().all())
+
+    @staticmethod
+    async def create_partition(db: AsyncSession, name: str, start: datetime, end: datetime) -> int:
+        """Партиция [start, end) (без commit); возвращает число строк, перенесённых из tasks_default
+
+        Если в tasks_default уже есть строки этого диапазона, CREATE ... PARTITION OF
+        невозможен: default отключается, строки переносятся, default подключается обратно.
+        Перенос идёт мимо tasks, поэтому триггеры счётчиков не срабатывают.
+        """
+        name = _checked(name)
+        bounds = f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+        default = _partition_table(TASK_DEFAULT_PARTITION)
+        in_range = (default.c.created_at >= start) & (default.c.created_at < end)
+
+        result = await db.execute(select(select(default.c.id).where(in_range).exists()))
+        if not result.scalar():
+            await db.execute(text(f"CREATE TABLE {name} PARTITION OF tasks {bounds}"))
+            return 0
+
+        await db.execute(text(f"ALTER TABLE tasks DETACH PARTITION {TASK_DEFAULT_PARTITION}"))
+        await db.execute(text(f"CREATE TABLE {name} PARTITION OF tasks {bounds}"))
+        result = await db.execute(
+            text(
+                f"WITH moved AS (DELETE FROM {TASK_DEFAULT_PARTITION} "
+                f"WHERE created_at >= :start AND created_at < :end RETURNING *) "
+                f"INSERT INTO {name} SELECT * FROM moved"
+            ),
+            {"start": start, "end": end},
+        )
+        await db.execute(text(f"ALTER TABLE tasks ATTACH PARTITION {TASK_DEFAULT_PARTITION} DEFAULT"))
+        return result.rowcount
+
+    @staticmethod
+    async def has_active_rows(db: AsyncSession, name: str) -> bool:
+        """Есть ли в партиции задачи в нефинальных статусах"""
+        partition = _partition_table(name)
+        result = await db.execute(
+            select(select(partition.c.id).where(partition.c.status.not_in(TERMINAL_STATUSES)).exists())
+        )
+        return result.scalar()
+
+    @staticmethod
+    async def iter_rows(db: AsyncSession, name: str, batch_size: int = 5000) -> AsyncIterator[dict]:
+        """Строки партиции пачками по id (keyset)
+
+        Не серверный курсор: его портал живёт до конца транзакции и не дал бы
+        удалить партицию в той же транзакции.
+        """
+        partition = _partition_table(name)
+        last_id = None
+        while True:
+            query = select(partition).order_by(partition.c.id).limit(batch_size)
+            if last_id is not None:
+                query = query.where(partition.c.id > last_id)
+            rows = (await db.execute(query)).mappings().all()
+            for row in rows:
+                yield dict(row)
+            if len(rows) < batch_size:
+                return
+            last_id = rows[-1]["id"]
+
+    @staticmethod
+    async def detach_partition(db: AsyncSession, name: str) -> None:
+        """Отключение партиции (без commit)
+
+        DETACH не вызывает триггеры DELETE, поэтому строки партиции вычитаются
+        из task_counts в той же транзакции.
+        """
+        name = _checked(name)
+        await db.execute(text(
+            f"INSERT INTO task_counts AS c (status, priority, slot, n) "
+            f"SELECT status, priority, 0, -count(*) FROM {name} "
+            f"GROUP BY status, priority ORDER BY status, priority "
+            f"ON CONFLICT (status, priority, slot) DO UPDATE SET n = c.n + EXCLUDED.n"
+        ))
+        await db.execute(text(f"ALTER TABLE tasks DETACH PARTITION {name}"))
+
+    @staticmethod
+    async def drop_table(db: AsyncSession, name: str) -> None:
+        await db.execute(text(f"DROP TABLE {_checked(name)}"))
@@ -1,10 +1,24 @@
+from datetime import datetime
 from typing import Optional
-from sqlalchemy import select, func
+from sqlalchemy import DateTime, Integer, Text, any_, bindparam, cast, column, func, insert, select, tuple_, update, values
+from sqlalchemy.dialects.postgresql import ARRAY
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.models.task import Task
+from app.models.task import Task, TaskStatusEnum
+from app.repositories.task_count_repository import TaskCountRepository
 from app.schemas.task import TaskPriority, TaskStatus
 
+# Статусы, из которых задачу можно отменить (IN_PROGRESS — с прерыванием в worker)
+CANCELLABLE_STATUSES = (
+    TaskStatusEnum.NEW,
+    TaskStatusEnum.SCHEDULED,
+    TaskStatusEnum.PENDING,
+    TaskStatusEnum.IN_PROGRESS,
+)
+
+# LISTEN/NOTIFY канал TaskScheduler: payload — ISO run_at новой отложенной задачи
+TASK_SCHEDULED_CHANNEL = "task_scheduled"
+
 
 class TaskRepository:
     @staticmethod
@@ -14,17 +28,163 @@ class TaskRepository:
         await db.refresh(task)
         return task
 
+    @staticmethod
+    async def add(db: AsyncSession, task: Task) -> Task:
+        """Вставка задачи без commit (id и значения по умолчанию заполняются при flush)"""
+        db.add(task)
+        await db.flush()
+        return task
+
+    @staticmethod
+    async def create_many(db: AsyncSession, rows: list[dict]) -> list[Task]:
+        """Вставка пачки задач одним INSERT ... RETURNING (без commit)"""
+        result = await db.scalars(
+            insert(Task).returning(Task, sort_by_parameter_order=True),
+            rows,
+        )
+        return list(result.all())
+
     @staticmethod
     async def get_by_id(db: AsyncSession, task_id: int) -> Optional[Task]:
         result = await db.execute(select(Task).where(Task.id == task_id))
         return result.scalar_one_or_none()
 
+    @staticmethod
+    async def get_fields(db: AsyncSession, task_id: int, fields: list[str]) -> Optional[dict]:
+        """Задача только с указанными колонками (SELECT без лишних TEXT-полей)"""
+        columns = [Task.__table__.c[name] for name in fields]
+        result = await db.execute(select(*columns).where(Task.id == task_id))
+        row = result.mappings().first()
+        return dict(row) if row is not None else None
+
     @staticmethod
     async def update(db: AsyncSession, task: Task) -> Task:
+        # expire_on_commit=False: атрибуты остаются загруженными, refresh не нужен
         await db.commit()
-        await db.refresh(task)
         return task
 
+    @staticmethod
+    async def claim_pending(db: AsyncSession, task_ids: list[int]) -> list[Task]:
+        """Перевод пачки PENDING задач в IN_PROGRESS одним UPDATE ... RETURNING
+
+        Возвращает только реально захваченные задачи (без commit).
+        """
+        stmt = (
+            update(Task)
+            .where(
+                Task.id == any_(bindparam("ids", task_ids, type_=ARRAY(Integer))),
+                Task.status == TaskStatusEnum.PENDING,
+            )
+            .values(status=TaskStatusEnum.IN_PROGRESS, started_at=datetime.utcnow())
+            .returning(Task)
+        )
+        result = await db.execute(stmt, execution_options={"synchronize_session": False})
+        return list(result.scalars().all())
+
+    @staticmethod
+    async def next_scheduled(db: AsyncSession, limit: int) -> list[tuple[datetime, int]]:
+        """Ближайшие отложенные задачи (run_at, id) по частичному индексу"""
+        result = await db.execute(
+            select(Task.run_at, Task.id)
+            .where(Task.status == TaskStatusEnum.SCHEDULED)
+            .order_by(Task.run_at, Task.id)
+            .limit(limit)
+        )
+        return [(run_at, task_id) for run_at, task_id in result.all()]
+
+    @staticmethod
+    async def release_scheduled(db: AsyncSession, task_ids: list[int], now: datetime) -> list[Task]:
+        """Перевод наступивших SCHEDULED задач в PENDING одним UPDATE ... RETURNING (без commit)
+
+        Отменённые и уже выпущенные другим процессом задачи не возвращаются.
+        """
+        stmt = (
+            update(Task)
+            .where(
+                Task.id == any_(bindparam("ids", task_ids, type_=ARRAY(Integer))),
+                Task.status == TaskStatusEnum.SCHEDULED,
+                Task.run_at <= now,
+            )
+            .values(status=TaskStatusEnum.PENDING)
+            .returning(Task)
+        )
+        result = await db.execute(stmt, execution_options={"synchronize_session": False})
+        return list(result.scalars().all())
+
+    @staticmethod
+    async def notify_scheduled(db: AsyncSession, run_at: datetime) -> None:
+        """NOTIFY для TaskScheduler; доставляется только после commit транзакции"""
+        await db.execute(
+            select(func.pg_notify(TASK_SCHEDULED_CHANNEL, run_at.isoformat()))
+        )
+
+    @staticmethod
+    async def cancel(db: AsyncSession, task_id: int) -> Optional[Task]:
+        """Отмена одним UPDATE ... RETURNING (без commit); None — задачи нет или она уже завершена
+
+        Условие по статусу в том же UPDATE: отмена не затирает результат, записанный worker'ом.
+        """
+        stmt = (
+            update(Task)
+            .where(Task.id == task_id, Task.status.in_(CANCELLABLE_STATUSES))
+            .values(status=TaskStatusEnum.CANCELLED)
+            .returning(Task)
+        )
+        result = await db.execute(
+            stmt, execution_options={"synchronize_session": False, "populate_existing": True}
+        )
+        return result.scalar_one_or_none()
+
+    @staticmethod
+    async def release_for_retry(db: AsyncSession, task_id: int, error: str) -> bool:
+        """IN_PROGRESS -> PENDING перед повторной попыткой, error — текст ошибки (без commit)
+
+        False — задача уже не IN_PROGRESS (например, отменена во время выполнения).
+        """
+        result = await db.execute(
+            update(Task)
+            .where(Task.id == task_id, Task.status == TaskStatusEnum.IN_PROGRESS)
+            .values(status=TaskStatusEnum.PENDING, error=error)
+            .returning(Task.id),
+            execution_options={"synchronize_session": False},
+        )
+        return result.scalar() is not None
+
+    @staticmethod
+    async def update_statuses(db: AsyncSession, updates: list[dict]) -> list[int]:
+        """Пакетная запись финальных статусов одним UPDATE ... FROM (VALUES ...) (без commit)
+
+        Каждый элемент: {"id", "status", "completed_at", "result", "error"}.
+        Пишутся только задачи, всё ещё IN_PROGRESS (отменённые во время выполнения
+        не перезаписываются); возвращает id записанных.
+        """
+        if not updates:
+            return []
+        rows = values(
+            column("id", Integer),
+            column("status", Text),
+            column("completed_at", DateTime(timezone=True)),
+            column("result", Text),
+            column("error", Text),
+            name="v",
+        ).data([
+            (u["id"], TaskStatusEnum(u["status"]).value, u.get("completed_at"), u.get("result"), u.get("error"))
+            for u in updates
+        ])
+        stmt = (
+            update(Task)
+            .where(Task.id == rows.c.id, Task.status == TaskStatusEnum.IN_PROGRESS)
+            .values(
+                status=cast(rows.c.status, Task.status.type),
+                completed_at=rows.c.completed_at,
+                result=rows.c.result,
+                error=rows.c.error,
+            )
+            .returning(Task.id)
+        )
+        result = await db.execute(stmt, execution_options={"synchronize_session": False})
+        return list(result.scalars().all())
+
     @staticmethod
     async def list_with_filters(
             db: AsyncSession,
@@ -32,22 +192,45 @@ class TaskRepository:
             page_size: int,
             status: Optional[TaskStatus] = None,
             priority: Optional[TaskPriority] = None,
-    ) -> tuple[list[Task], int]:
-        query = select(Task)
+            cursor: Optional[tuple[datetime, int]] = None,
+            with_total: bool = True,
+            as_rows: bool = False,
+            fields: Optional[list[str]] = None,
+    ) -> tuple[list, Optional[int]]:
+        """Страница задач; as_rows=True — dict строк без ORM-объектов и identity map
+
+        fields (только с as_rows) — проекция колонок; id и created_at выбираются
+        всегда, они нужны для курсора.
+        """
+        if as_rows:
+            names = Task.__table__.columns.keys()
+            if fields:
+                names = ["id", "created_at", *(name for name in fields if name not in ("id", "created_at"))]
+            query = select(*(Task.__table__.c[name] for name in names))
+        else:
+            query = select(Task)
 
         if status:
             query = query.where(Task.status == status)
         if priority:
             query = query.where(Task.priority == priority)
 
-        count_query = select(func.count()).select_from(query.subquery())
-        total_result = await db.execute(count_query)
-        total = total_result.scalar()
+        total = None
+        if with_total:
+            # Фильтры — только status/priority, итог берётся из task_counts
+            total = await TaskCountRepository.total(db, status, priority)
 
-        query = query.order_by(Task.created_at.desc())
-        query = query.offset((page - 1) * page_size).limit(page_size)
+        query = query.order_by(Task.created_at.desc(), Task.id.desc())
+        if cursor:
+            # Keyset: продолжаем строго после последней выданной записи
+            query = query.where(tuple_(Task.created_at, Task.id) < tuple_(*cursor))
+        else:
+            query = query.offset((page - 1) * page_size)
+        query = query.limit(page_size)
 
         result = await db.execute(query)
+        if as_rows:
+            return [dict(row) for row in result.mappings()], total
         tasks = result.scalars().all()
 
         return list(tasks), total
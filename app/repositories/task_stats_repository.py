@@ -0,0 +1,37 @@
+from datetime import datetime
+from sqlalchemy import delete, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.task_stats import TaskStatsBucket
+
+
+class TaskStatsRepository:
+    @staticmethod
+    async def histograms(db: AsyncSession, since: datetime) -> dict[str, dict[int, int]]:
+        """Гистограммы {kind: {bin: n}} за минуты начиная с since"""
+        result = await db.execute(
+            select(TaskStatsBucket.kind, TaskStatsBucket.bin, func.sum(TaskStatsBucket.n))
+            .where(TaskStatsBucket.minute >= since)
+            .group_by(TaskStatsBucket.kind, TaskStatsBucket.bin)
+        )
+        histograms: dict[str, dict[int, int]] = {}
+        for kind, bin_, n in result.all():
+            histograms.setdefault(kind, {})[bin_] = int(n)
+        return histograms
+
+    @staticmethod
+    async def per_minute(db: AsyncSession, since: datetime, kinds: list[str]) -> list[tuple[datetime, str, int]]:
+        """Число событий kinds по минутам (по возрастанию минуты)"""
+        result = await db.execute(
+            select(TaskStatsBucket.minute, TaskStatsBucket.kind, func.sum(TaskStatsBucket.n))
+            .where(TaskStatsBucket.minute >= since, TaskStatsBucket.kind.in_(kinds))
+            .group_by(TaskStatsBucket.minute, TaskStatsBucket.kind)
+            .order_by(TaskStatsBucket.minute)
+        )
+        return [(minute, kind, int(n)) for minute, kind, n in result.all()]
+
+    @staticmethod
+    async def prune(db: AsyncSession, before: datetime) -> int:
+        """Удаление корзин старше before (без commit); возвращает число строк"""
+        result = await db.execute(delete(TaskStatsBucket).where(TaskStatsBucket.minute < before))
+        return result.rowcount
@@ -12,6 +12,7 @@ class TaskPriority(str, Enum):
 
 class TaskStatus(str, Enum):
     NEW = "NEW"
+    SCHEDULED = "SCHEDULED"
     PENDING = "PENDING"
     IN_PROGRESS = "IN_PROGRESS"
     COMPLETED = "COMPLETED"
@@ -23,6 +24,8 @@ class TaskCreate(BaseModel):
     title: str = Field(..., min_length=1, max_length=255)
     description: Optional[str] = None
     priority: TaskPriority = TaskPriority.MEDIUM
+    # Отложенный запуск; без часового пояса считается UTC
+    run_at: Optional[datetime] = None
 
 
 class TaskUpdate(BaseModel):
@@ -38,6 +41,7 @@ class TaskResponse(BaseModel):
     priority: TaskPriority
     status: TaskStatus
     created_at: datetime
+    run_at: Optional[datetime] = None
     started_at: Optional[datetime]
     completed_at: Optional[datetime]
     result: Optional[str]
@@ -58,6 +62,30 @@ class TaskStatusResponse(BaseModel):
 
 class TaskListResponse(BaseModel):
     items: list[TaskResponse]
-    total: int
+    total: Optional[int]
     page: int
     page_size: int
+    next_cursor: Optional[str] = None
+
+
+class LatencyStats(BaseModel):
+    count: int
+    p50_ms: Optional[float]
+    p95_ms: Optional[float]
+    p99_ms: Optional[float]
+
+
+class ThroughputPoint(BaseModel):
+    minute: datetime
+    completed: int
+    failed: int
+
+
+class TaskStatsResponse(BaseModel):
+    window_minutes: int
+    by_status: dict[TaskStatus, int]
+    by_priority: dict[TaskPriority, int]
+    completions_per_minute: float
+    throughput: list[ThroughputPoint]
+    queue_wait: LatencyStats
+    processing: LatencyStats
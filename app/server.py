@@ -0,0 +1,45 @@
+import argparse
+import os
+import sys
+from pathlib import Path
+
+import uvicorn
+
+from app.core.config import settings
+
+
+def prepare_multiproc_dir(path: str) -> str:
+    """Каталог файлов метрик: создаётся и очищается от файлов прошлого запуска"""
+    directory = Path(path)
+    directory.mkdir(parents=True, exist_ok=True)
+    for stale in directory.glob("*.db"):
+        stale.unlink()
+    return str(directory)
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Task Service API")
+    parser.add_argument("--host", default=settings.api_host)
+    parser.add_argument("--port", type=int, default=settings.api_port)
+    parser.add_argument("--workers", type=int, default=settings.api_workers,
+                        help="Число процессов uvicorn; метрики агрегируются по всем процессам")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    if args.workers > 1 and settings.broker_backend == "memory":
+        sys.exit("BROKER_BACKEND=memory is single-process only, use --workers 1")
+
+    if args.workers > 1 or "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        # Переменная наследуется процессами uvicorn до импорта prometheus_client
+        os.environ["PROMETHEUS_MULTIPROC_DIR"] = prepare_multiproc_dir(
+            os.environ.get("PROMETHEUS_MULTIPROC_DIR", settings.prometheus_multiproc_dir)
+        )
+
+    uvicorn.run("app.main:app", host=args.host, port=args.port, workers=args.workers)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+import asyncio
+import logging
+from typing import Optional
+
+from app.core.config import settings
+from app.db.session import AsyncSessionLocal
+from app.repositories.outbox_repository import OutboxRepository
+from app.services.queue_service import QueueService
+
+logger = logging.getLogger(__name__)
+
+
+class OutboxRelay:
+    """Фоновая пересылка сообщений из task_outbox в RabbitMQ пачками"""
+
+    def __init__(
+            self,
+            queue_service: QueueService,
+            session_factory=AsyncSessionLocal,
+            batch_size: int = None,
+            poll_interval: float = None,
+    ):
+        self.queue_service = queue_service
+        self.session_factory = session_factory
+        self.batch_size = batch_size or settings.outbox_batch_size
+        self.poll_interval = poll_interval or settings.outbox_poll_interval
+        self.repository = OutboxRepository()
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+        self._runner: Optional[asyncio.Task] = None
+
+    def notify(self):
+        """Разбудить relay после коммита новых сообщений (без ожидания poll_interval)"""
+        self._wakeup.set()
+
+    async def relay_once(self) -> int:
+        """Публикация одной пачки; возвращает число отправленных сообщений"""
+        async with self.session_factory() as db:
+            entries = await self.repository.fetch_batch(db, self.batch_size)
+            if not entries:
+                await db.rollback()
+                return 0
+
+            await self.queue_service.publish_tasks(
+                [(entry.task_id, entry.priority.value) for entry in entries]
+            )
+            await self.repository.delete_many(db, [entry.id for entry in entries])
+            await db.commit()
+
+        logger.debug(f"Relayed {len(entries)} outbox messages")
+        return len(entries)
+
+    async def run(self):
+        logger.info(f"Outbox relay started (batch_size={self.batch_size}, poll_interval={self.poll_interval}s)")
+        while not self._stopping:
+            self._wakeup.clear()
+            try:
+                sent = await self.relay_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Outbox relay iteration failed: {e}")
+                sent = 0
+
+            # Полная пачка — в outbox, скорее всего, есть ещё сообщения
+            if sent >= self.batch_size:
+                continue
+
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+        logger.info("Outbox relay stopped")
+
+    def start(self):
+        self._runner = asyncio.create_task(self.run())
+
+    async def stop(self):
+        self._stopping = True
+        self._wakeup.set()
+        if self._runner:
+            await self._runner
@@ -1,77 +1,225 @@
+import asyncio
 import json
 import logging
-from typing import Optional
-from aio_pika import Message, DeliveryMode, connect_robust
-from aio_pika.abc import AbstractChannel, AbstractConnection
+import time
+from typing import Any, Callable, Optional
 
+from app.brokers import BrokerBackend, BrokerMessage, MessageHandler, OutgoingMessage, create_broker_backend
 from app.core.config import settings
-from app.core.metrics import rabbitmq_messages_published
+from app.core.instrumentation import record_publish
+from app.core.metrics import rabbitmq_messages_published, rabbitmq_publish_errors_total
 
 logger = logging.getLogger(__name__)
 
+PRIORITY_MAP = {"LOW": 1, "MEDIUM": 5, "HIGH": 10}
+PRIORITY_NAMES = {value: name for name, value in PRIORITY_MAP.items()}
+
+# Номер повторной попытки в заголовках сообщения (нет заголовка — первая доставка)
+RETRY_COUNT_HEADER = "x-retry-count"
+# Текст последней ошибки у сообщений в parking-очереди
+LAST_ERROR_HEADER = "x-last-error"
+# Время (мс epoch), с которого сообщение ждёт в очереди задач: для повтора — после задержки
+ENQUEUED_AT_HEADER = "x-enqueued-at"
+
+
+def retry_count(message: BrokerMessage) -> int:
+    headers = getattr(message, "headers", None) or {}
+    try:
+        return int(headers.get(RETRY_COUNT_HEADER, 0))
+    except (TypeError, ValueError):
+        return 0
+
+
+def message_priority(message: BrokerMessage) -> str:
+    """Имя приоритета по числовому priority сообщения (его ставит и режим weighted)"""
+    return PRIORITY_NAMES.get(getattr(message, "priority", None), "MEDIUM")
+
+
+def queue_wait_seconds(message: BrokerMessage) -> Optional[float]:
+    headers = getattr(message, "headers", None) or {}
+    try:
+        enqueued_at = int(headers[ENQUEUED_AT_HEADER])
+    except (KeyError, TypeError, ValueError):
+        return None
+    return max(time.time() - enqueued_at / 1000, 0.0)
+
+
+def retry_delays_ms() -> list[int]:
+    """Задержки повторов: base, 2*base, 4*base ... (не больше max), по одной на попытку"""
+    return [
+        min(settings.worker_retry_base_delay_ms * 2 ** attempt, settings.worker_retry_max_delay_ms)
+        for attempt in range(settings.worker_max_retries)
+    ]
+
 
 class QueueService:
-    def __init__(self):
-        self.connection: Optional[AbstractConnection] = None
-        self.channel: Optional[AbstractChannel] = None
+    """Очередь задач поверх подключаемого бэкенда брокера (settings.broker_backend)"""
+
+    def __init__(self, backend: Optional[BrokerBackend] = None):
+        self.backend = backend or create_broker_backend()
         self.queue_name = settings.rabbitmq_queue
+        self.parking_queue_name = f"{self.queue_name}.parking"
+        self.weighted = settings.task_queue_mode == "weighted"
+        self.connected = False
+
+    @property
+    def task_queues(self) -> list[str]:
+        """Очереди, которые потребляет worker: одна общая или по одной на приоритет"""
+        if not self.weighted:
+            return [self.queue_name]
+        return [self.queue_for(priority) for priority in PRIORITY_MAP]
+
+    def queue_for(self, priority: str) -> str:
+        if not self.weighted:
+            return self.queue_name
+        return f"{self.queue_name}.{priority.lower()}"
+
+    @staticmethod
+    def retry_queue_name(delay_ms: int, target: str) -> str:
+        # Задержка в имени: TTL существующей очереди изменить нельзя, новая задержка — новая очередь.
+        # Dead-letter ведёт в одну очередь, поэтому ярусы задержки свои у каждой очереди задач
+        return f"{target}.retry.{delay_ms}"
 
     async def connect(self):
-        """Подключение к RabbitMQ"""
+        """Подключение к брокеру"""
         try:
-            logger.info(f"Connecting to RabbitMQ at {settings.rabbitmq_host}:{settings.rabbitmq_port}")
-            self.connection = await connect_robust(
-                settings.rabbitmq_url,
-                timeout=10
-            )
-            self.channel = await self.connection.channel()
-
-            # Декларируем очередь с приоритетами
-            await self.channel.declare_queue(
-                self.queue_name,
-                durable=True,
-                arguments={"x-max-priority": 10}
+            await self.backend.connect()
+            # Одна очередь с приоритетами или FIFO-очереди по приоритетам (weighted)
+            for queue in self.task_queues:
+                await self.backend.declare_queue(queue, max_priority=0 if self.weighted else 10)
+                # Очереди задержки повторов (TTL + dead-letter обратно в очередь задач)
+                for delay_ms in set(retry_delays_ms()):
+                    await self.backend.declare_delay_queue(self.retry_queue_name(delay_ms, queue), delay_ms, queue)
+            await self.backend.declare_queue(self.parking_queue_name, max_priority=10)
+            self.connected = True
+            logger.info(
+                f"Connected to {settings.broker_backend} broker, queues {', '.join(self.task_queues)} declared"
             )
-
-            logger.info(f"Connected to RabbitMQ, queue '{self.queue_name}' declared")
         except Exception as e:
-            logger.error(f"Failed to connect to RabbitMQ: {e}")
+            logger.error(f"Failed to connect to broker: {e}")
             raise
 
     async def disconnect(self):
-        """Отключение от RabbitMQ"""
+        """Отключение от брокера"""
         try:
-            if self.channel:
-                await self.channel.close()
-                logger.info("RabbitMQ channel closed")
-            if self.connection:
-                await self.connection.close()
-                logger.info("RabbitMQ connection closed")
+            await self.backend.disconnect()
+            self.connected = False
         except Exception as e:
-            logger.error(f"Error disconnecting from RabbitMQ: {e}")
+            logger.error(f"Error disconnecting from broker: {e}")
 
-    async def publish_task(self, task_id: int, priority: str):
-        """Публикация задачи в очередь"""
-        if not self.channel:
+    async def _ensure_connected(self):
+        if not self.connected:
             await self.connect()
 
-        priority_map = {"LOW": 1, "MEDIUM": 5, "HIGH": 10}
-        priority_value = priority_map.get(priority, 5)
-
-        message_body = json.dumps({"task_id": task_id})
-        message = Message(
-            body=message_body.encode(),
-            delivery_mode=DeliveryMode.PERSISTENT,
-            priority=priority_value,
+    @staticmethod
+    def _build_message(task_id: int, priority: str) -> OutgoingMessage:
+        # Тело фиксированного вида — без json.dumps на каждую публикацию
+        return OutgoingMessage(
+            body=b'{"task_id": %d}' % task_id,
+            priority=PRIORITY_MAP.get(priority, 5),
+            headers={ENQUEUED_AT_HEADER: int(time.time() * 1000)},
         )
 
+    async def _publish(self, messages: list[OutgoingMessage], queue: str = None):
+        await self._ensure_connected()
+        started = time.perf_counter()
         try:
-            await self.channel.default_exchange.publish(
-                message,
-                routing_key=self.queue_name,
-            )
-            rabbitmq_messages_published.inc()
-            logger.info(f"Published task {task_id} with priority {priority} (value={priority_value})")
+            await self.backend.publish(queue or self.queue_name, messages)
+        except Exception:
+            rabbitmq_publish_errors_total.inc()
+            raise
+        finally:
+            record_publish(time.perf_counter() - started)
+        rabbitmq_messages_published.inc(len(messages))
+
+    async def publish_task(self, task_id: int, priority: str):
+        """Публикация задачи в очередь"""
+        message = self._build_message(task_id, priority)
+
+        try:
+            await self._publish([message], self.queue_for(priority))
+            logger.debug("Published task %s with priority %s (value=%s)", task_id, priority, message.priority)
         except Exception as e:
             logger.error(f"Failed to publish task {task_id}: {e}")
             raise
+
+    async def publish_tasks(self, tasks: list[tuple[int, str]]):
+        """Пакетная публикация задач (task_id, priority)
+
+        Бэкенд отправляет пачку целиком и ждёт подтверждений вместе,
+        а не по одному сообщению.
+        """
+        if not tasks:
+            return
+
+        by_queue: dict[str, list[OutgoingMessage]] = {}
+        for task_id, priority in tasks:
+            by_queue.setdefault(self.queue_for(priority), []).append(self._build_message(task_id, priority))
+        messages = [message for batch in by_queue.values() for message in batch]
+
+        try:
+            await asyncio.gather(*(self._publish(batch, queue) for queue, batch in by_queue.items()))
+            logger.debug("Published batch of %s tasks", len(messages))
+        except Exception as e:
+            logger.error(f"Failed to publish batch of {len(messages)} tasks: {e}")
+            raise
+
+    async def publish_retry(self, message: BrokerMessage, attempt: int):
+        """Повтор attempt (1..worker_max_retries) через очередь задержки; возврат в очередь задач делает брокер"""
+        delay_ms = retry_delays_ms()[attempt - 1]
+        target = self.queue_for(message_priority(message))
+        await self._publish(
+            [OutgoingMessage(
+                body=message.body,
+                priority=message.priority or 0,
+                headers={
+                    RETRY_COUNT_HEADER: attempt,
+                    ENQUEUED_AT_HEADER: int(time.time() * 1000) + delay_ms,
+                },
+            )],
+            queue=self.retry_queue_name(delay_ms, target),
+        )
+        logger.debug(f"Message {message.body!r} scheduled for retry {attempt} in {delay_ms} ms")
+
+    async def publish_parked(self, message: BrokerMessage, error: str):
+        """Сообщение с исчерпанными попытками — в parking-очередь для разбора вручную"""
+        await self._publish(
+            [OutgoingMessage(
+                body=message.body,
+                priority=message.priority or 0,
+                headers={RETRY_COUNT_HEADER: retry_count(message), LAST_ERROR_HEADER: error[:1000]},
+            )],
+            queue=self.parking_queue_name,
+        )
+
+    async def publish_status_events(self, events: list[dict]):
+        """Рассылка событий смены статуса во все процессы (fanout)"""
+        if not events:
+            return
+
+        await self._ensure_connected()
+        started = time.perf_counter()
+        try:
+            await self.backend.publish_events([json.dumps(event).encode() for event in events])
+        except Exception:
+            rabbitmq_publish_errors_total.inc()
+            raise
+        finally:
+            record_publish(time.perf_counter() - started)
+
+    async def subscribe_status_events(self, callback: Callable[[dict], None]):
+        """Подписка процесса на события смены статуса"""
+        await self._ensure_connected()
+        await self.backend.subscribe_events(callback)
+
+    async def consume(self, handler: MessageHandler, prefetch: int) -> list[Any]:
+        """Потребление очередей задач; возвращает handles для cancel()"""
+        await self._ensure_connected()
+        return [await self.backend.consume(queue, handler, prefetch) for queue in self.task_queues]
+
+    async def cancel(self, consumers: list[Any]):
+        for consumer in consumers:
+            await self.backend.cancel(consumer)
+
+    async def set_prefetch(self, prefetch: int):
+        await self.backend.set_prefetch(prefetch)
@@ -0,0 +1,96 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Hashable, Optional
+
+from app.core.metrics import task_cache_requests_total
+
+
+class TaskCache:
+    """In-process LRU+TTL кэш задач с объединением одновременных промахов
+
+    Одновременные промахи по одному id ждут единственный запрос к БД
+    (single-flight). invalidate() вызывается на каждый переход статуса,
+    TTL страхует от потерянных событий инвалидации.
+    """
+
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self._inflight: dict[Hashable, asyncio.Future] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: Any):
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, key: Hashable):
+        self._entries.pop(key, None)
+        # Результат уже идущей загрузки может быть устаревшим — не кэшируем его
+        self._inflight.pop(key, None)
+
+    def clear(self):
+        self._entries.clear()
+        self._inflight.clear()
+
+    async def get_or_load(self, key: Hashable, loader: Callable[[], Awaitable[Optional[Any]]]) -> Optional[Any]:
+        """Чтение через кэш; None (нет задачи) не кэшируется"""
+        value = self.get(key)
+        if value is not None:
+            task_cache_requests_total.labels(result="hit").inc()
+            return value
+
+        future = self._inflight.get(key)
+        if future is not None:
+            task_cache_requests_total.labels(result="coalesced").inc()
+            try:
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                if not future.cancelled():
+                    raise
+                # Загрузку отменили вместе с её инициатором — читаем сами
+                return await self.get_or_load(key, loader)
+
+        task_cache_requests_total.labels(result="miss").inc()
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            value = await loader()
+        except asyncio.CancelledError:
+            self._finish_inflight(key, future)
+            future.cancel()
+            raise
+        except Exception as e:
+            self._finish_inflight(key, future)
+            future.set_exception(e)
+            # Исключение получают ожидающие; без них — помечаем как полученное
+            future.exception()
+            raise
+
+        if self._finish_inflight(key, future) and value is not None:
+            self.set(key, value)
+        future.set_result(value)
+        return value
+
+    def _finish_inflight(self, key: Hashable, future: asyncio.Future) -> bool:
+        """Снятие отметки о загрузке; False — если ключ инвалидирован во время загрузки"""
+        if self._inflight.get(key) is future:
+            del self._inflight[key]
+            return True
+        return False
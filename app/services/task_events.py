@@ -0,0 +1,58 @@
+import asyncio
+from collections import defaultdict
+from datetime import datetime
+from typing import Optional
+
+from app.models.task import TaskStatusEnum
+
+TERMINAL_STATUSES = {
+    TaskStatusEnum.COMPLETED.value,
+    TaskStatusEnum.FAILED.value,
+    TaskStatusEnum.CANCELLED.value,
+}
+
+
+def build_status_event(
+        task_id: int,
+        status: TaskStatusEnum | str,
+        started_at: Optional[datetime] = None,
+        completed_at: Optional[datetime] = None,
+) -> dict:
+    """Событие перехода статуса задачи (JSON-совместимый dict)"""
+    return {
+        "task_id": task_id,
+        "status": TaskStatusEnum(status).value,
+        "started_at": started_at.isoformat() if started_at else None,
+        "completed_at": completed_at.isoformat() if completed_at else None,
+    }
+
+
+class TaskEventHub:
+    """In-process рассылка событий смены статуса ожидающим клиентам (SSE, long-poll)
+
+    Наполняется событиями из fanout-обмена, поэтому ожидание завершения
+    задачи не создаёт запросов к БД.
+    """
+
+    def __init__(self):
+        self._subscribers: dict[int, set[asyncio.Queue]] = defaultdict(set)
+
+    def subscriber_count(self, task_id: int) -> int:
+        return len(self._subscribers.get(task_id, ()))
+
+    def publish(self, event: dict):
+        for queue in self._subscribers.get(event["task_id"], ()):
+            queue.put_nowait(event)
+
+    def subscribe(self, task_id: int) -> asyncio.Queue:
+        """Подписка на события задачи; обязательно парный вызов unsubscribe()"""
+        queue: asyncio.Queue = asyncio.Queue()
+        self._subscribers[task_id].add(queue)
+        return queue
+
+    def unsubscribe(self, task_id: int, queue: asyncio.Queue):
+        subscribers = self._subscribers.get(task_id)
+        if subscribers is not None:
+            subscribers.discard(queue)
+            if not subscribers:
+                del self._subscribers[task_id]
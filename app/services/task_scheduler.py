@@ -0,0 +1,185 @@
+import asyncio
+import heapq
+import logging
+import time
+from datetime import datetime, timezone
+from typing import Optional
+
+import asyncpg
+from sqlalchemy.engine import make_url
+
+from app.core.config import settings
+from app.core.metrics import scheduled_tasks_released_total, scheduled_task_release_lag_seconds
+from app.db.session import AsyncSessionLocal
+from app.models.task import Task
+from app.repositories.outbox_repository import OutboxRepository
+from app.repositories.task_repository import TASK_SCHEDULED_CHANNEL, TaskRepository
+from app.services.queue_service import QueueService
+from app.services.task_events import build_status_event
+
+logger = logging.getLogger(__name__)
+
+
+def listen_dsn() -> str:
+    """DSN для asyncpg.connect (LISTEN нужен отдельному соединению вне пула SQLAlchemy)"""
+    return make_url(settings.database_url).set(drivername="postgresql").render_as_string(hide_password=False)
+
+
+class TaskScheduler:
+    """Выпуск отложенных задач (SCHEDULED -> PENDING + outbox) по наступлении run_at
+
+    В памяти — куча (run_at, id) ближайших window_size задач из частичного индекса
+    ix_tasks_scheduled_run_at_id; таблица не опрашивается, пока куча не опустеет.
+    Задачу раньше горизонта окна (NOTIFY task_scheduled) окно перечитывается.
+    Раз в max_sleep окно перечитывается в любом случае (потерянный NOTIFY, отмены).
+    Несколько планировщиков безопасны: UPDATE выпускает только SCHEDULED задачи.
+    После commit выпуск рассылается событиями PENDING (кэш задач, SSE и long-poll).
+    """
+
+    def __init__(
+            self,
+            session_factory=AsyncSessionLocal,
+            outbox_relay=None,
+            queue_service: Optional[QueueService] = None,
+            window_size: int = None,
+            batch_size: int = None,
+            max_sleep: float = None,
+            dsn: Optional[str] = None,
+    ):
+        self.session_factory = session_factory
+        self.outbox_relay = outbox_relay
+        self.queue_service = queue_service
+        self.window_size = window_size or settings.scheduler_window_size
+        self.batch_size = batch_size or settings.scheduler_batch_size
+        self.max_sleep = max_sleep or settings.scheduler_max_sleep
+        self.dsn = dsn
+        self.repository = TaskRepository()
+        self.outbox_repository = OutboxRepository()
+
+        self._heap: list[tuple[datetime, int]] = []
+        # run_at последней задачи окна; None — в окно попали все отложенные задачи
+        self._horizon: Optional[datetime] = None
+        self._reload = True
+        self._loaded_at = 0.0
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+        self._runner: Optional[asyncio.Task] = None
+        self._listener: Optional[asyncpg.Connection] = None
+
+    @property
+    def pending(self) -> int:
+        return len(self._heap)
+
+    def notify(self, run_at: Optional[datetime] = None):
+        """Появилась отложенная задача: перечитать окно, если она в него попадает"""
+        if run_at is None or self._horizon is None or run_at <= self._horizon:
+            self._reload = True
+            self._wakeup.set()
+
+    def _on_notification(self, connection, pid, channel, payload):
+        try:
+            run_at = datetime.fromisoformat(payload)
+        except ValueError:
+            run_at = None
+        self.notify(run_at)
+
+    async def load_window(self):
+        async with self.session_factory() as db:
+            rows = await self.repository.next_scheduled(db, self.window_size)
+            await db.rollback()
+        self._heap = rows  # уже упорядочены по (run_at, id)
+        heapq.heapify(self._heap)
+        self._horizon = rows[-1][0] if len(rows) >= self.window_size else None
+        self._reload = False
+        self._loaded_at = time.monotonic()
+
+    async def release_due(self, now: datetime = None) -> int:
+        """Выпуск наступивших задач из кучи пачками; возвращает число выпущенных"""
+        now = now or datetime.now(timezone.utc)
+        released = 0
+        while self._heap and self._heap[0][0] <= now:
+            batch = []
+            while self._heap and self._heap[0][0] <= now and len(batch) < self.batch_size:
+                batch.append(heapq.heappop(self._heap)[1])
+
+            async with self.session_factory() as db:
+                tasks = await self.repository.release_scheduled(db, batch, now)
+                await self.outbox_repository.add_many(db, tasks)
+                await db.commit()
+
+            for task in tasks:
+                scheduled_task_release_lag_seconds.observe(max((now - task.run_at).total_seconds(), 0.0))
+            scheduled_tasks_released_total.inc(len(tasks))
+            released += len(tasks)
+            await self.broadcast_released(tasks)
+
+        if released and self.outbox_relay:
+            self.outbox_relay.notify()
+        # Окно выбрано целиком — за горизонтом могут быть следующие задачи
+        if not self._heap and self._horizon is not None:
+            self._reload = True
+        return released
+
+    async def broadcast_released(self, tasks: list[Task]):
+        """Рассылка перехода SCHEDULED -> PENDING; ошибка рассылки не отменяет выпуск"""
+        if not tasks or self.queue_service is None:
+            return
+        try:
+            await self.queue_service.publish_status_events([
+                build_status_event(task.id, task.status, task.started_at) for task in tasks
+            ])
+        except Exception as e:
+            logger.error(f"Failed to broadcast release of {len(tasks)} scheduled tasks: {e}")
+
+    def _sleep_time(self) -> float:
+        timeout = self.max_sleep - (time.monotonic() - self._loaded_at)
+        if self._heap:
+            due_in = (self._heap[0][0] - datetime.now(timezone.utc)).total_seconds()
+            timeout = min(timeout, due_in)
+        return max(timeout, 0.0)
+
+    async def _ensure_listener(self):
+        if not self.dsn or (self._listener is not None and not self._listener.is_closed()):
+            return
+        try:
+            self._listener = await asyncpg.connect(self.dsn)
+            await self._listener.add_listener(TASK_SCHEDULED_CHANNEL, self._on_notification)
+            # NOTIFY, пришедшие до LISTEN, потеряны — окно перечитывается
+            self._reload = True
+        except Exception as e:
+            self._listener = None
+            logger.warning(f"Task scheduler LISTEN failed, falling back to polling every {self.max_sleep}s: {e}")
+
+    async def run(self):
+        logger.info(f"Task scheduler started (window={self.window_size}, batch_size={self.batch_size})")
+        while not self._stopping:
+            self._wakeup.clear()
+            try:
+                await self._ensure_listener()
+                if self._reload or time.monotonic() - self._loaded_at >= self.max_sleep:
+                    await self.load_window()
+                await self.release_due()
+                if self._reload:
+                    continue
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Task scheduler iteration failed: {e}")
+                self._reload = True
+
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self._sleep_time())
+            except asyncio.TimeoutError:
+                pass
+        logger.info("Task scheduler stopped")
+
+    def start(self):
+        self._runner = asyncio.create_task(self.run())
+
+    async def stop(self):
+        self._stopping = True
+        self._wakeup.set()
+        if self._runner:
+            await self._runner
+        if self._listener is not None and not self._listener.is_closed():
+            await self._listener.close()
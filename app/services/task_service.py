@@ -1,43 +1,185 @@
+import hashlib
+import logging
+from collections import Counter
+from datetime import datetime, timezone
 from typing import Optional
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.models.task import Task, TaskStatusEnum
-from app.schemas.task import TaskCreate, TaskPriority, TaskStatus
+from app.schemas.task import TaskCreate, TaskPriority, TaskResponse, TaskStatus
+from app.repositories.idempotency_repository import IdempotencyKeyRepository
+from app.repositories.outbox_repository import OutboxRepository
 from app.repositories.task_repository import TaskRepository
 from app.services.queue_service import QueueService
-from app.core.metrics import tasks_created_total, tasks_cancelled_total
+from app.services.task_cache import TaskCache
+from app.services.task_events import build_status_event
+from app.services.task_stats import collect_stats
+from app.core.metrics import idempotent_replays_total, tasks_created_total, tasks_cancelled_total
+
+logger = logging.getLogger(__name__)
+
+
+class IdempotencyKeyReused(ValueError):
+    """Idempotency-Key уже использован запросом с другим телом"""
 
 
 class TaskService:
-    def __init__(self, queue_service: QueueService):
+    def __init__(
+            self,
+            queue_service: QueueService,
+            outbox_relay=None,
+            task_cache: Optional[TaskCache] = None,
+            idempotency_cache: Optional[TaskCache] = None,
+    ):
         self.queue_service = queue_service
+        self.outbox_relay = outbox_relay
+        self.task_cache = task_cache
+        self.idempotency_cache = idempotency_cache
         self.repository = TaskRepository()
+        self.outbox_repository = OutboxRepository()
+        self.idempotency_repository = IdempotencyKeyRepository()
 
-    async def create_task(self, db: AsyncSession, task_in: TaskCreate) -> Task:
-        """Создание новой задачи"""
-        task = Task(
-            title=task_in.title,
-            description=task_in.description,
-            priority=task_in.priority,
-            status=TaskStatusEnum.NEW,
+    def _notify_relay(self):
+        if self.outbox_relay:
+            self.outbox_relay.notify()
+
+    async def _broadcast_status(self, task: Task):
+        """Локальная инвалидация кэша и рассылка события другим процессам"""
+        if self.task_cache is not None:
+            self.task_cache.invalidate(task.id)
+        try:
+            await self.queue_service.publish_status_events([
+                build_status_event(task.id, task.status, task.started_at, task.completed_at)
+            ])
+        except Exception as e:
+            logger.error(f"Failed to broadcast status of task {task.id}: {e}")
+
+    @staticmethod
+    def _task_row(task_in: TaskCreate, now: datetime) -> dict:
+        """Поля новой задачи: с run_at в будущем — SCHEDULED, иначе сразу PENDING"""
+        run_at = task_in.run_at
+        if run_at is not None and run_at.tzinfo is None:
+            run_at = run_at.replace(tzinfo=timezone.utc)
+        scheduled = run_at is not None and run_at > now
+        return {
+            "title": task_in.title,
+            "description": task_in.description,
+            "priority": task_in.priority,
+            "status": TaskStatusEnum.SCHEDULED if scheduled else TaskStatusEnum.PENDING,
+            "run_at": run_at,
+            # Явно и с часовым поясом: ответ совпадает с тем, что потом читается из БД
+            "created_at": now,
+        }
+
+    async def _enqueue(self, db: AsyncSession, tasks: list[Task]):
+        """Outbox для готовых задач, NOTIFY планировщику для отложенных (без commit)"""
+        await self.outbox_repository.add_many(
+            db, [task for task in tasks if task.status == TaskStatusEnum.PENDING]
         )
-        task = await self.repository.create(db, task)
+        scheduled = [task.run_at for task in tasks if task.status == TaskStatusEnum.SCHEDULED]
+        if scheduled:
+            await self.repository.notify_scheduled(db, min(scheduled))
 
-        # Обновляем статус на PENDING и публикуем в очередь
-        task.status = TaskStatusEnum.PENDING
-        task = await self.repository.update(db, task)
+    async def create_task(self, db: AsyncSession, task_in: TaskCreate) -> Task:
+        """Создание новой задачи
 
-        # Публикуем в RabbitMQ
-        await self.queue_service.publish_task(task.id, task.priority.value)
+        Задача (сразу в статусе PENDING) и сообщение в outbox пишутся одной
+        транзакцией; публикацию в RabbitMQ выполняет OutboxRelay. Задача с run_at
+        в будущем остаётся SCHEDULED до срока, её выпускает TaskScheduler.
+        """
+        task = Task(**self._task_row(task_in, datetime.now(timezone.utc)))
+        task = await self.repository.add(db, task)
+        await self._enqueue(db, [task])
+        await db.commit()
+        self._notify_relay()
 
         # Метрики
         tasks_created_total.labels(priority=task.priority.value).inc()
 
         return task
 
+    async def create_task_idempotent(
+            self, db: AsyncSession, task_in: TaskCreate, key: str,
+    ) -> tuple[TaskResponse, bool]:
+        """Создание задачи с Idempotency-Key; возвращает (ответ, повтор ли это)
+
+        Повтор получает исходный ответ: из LRU — без обращения к БД и брокеру,
+        иначе по ключу из task_idempotency_keys. Ключ пишется в транзакции
+        задачи, поэтому при гонке одинаковых запросов задача создаётся один раз.
+        Ключ, уже использованный с другим телом запроса, — IdempotencyKeyReused.
+        """
+        request_hash = hashlib.sha256(task_in.model_dump_json().encode()).hexdigest()
+        cached = self.idempotency_cache.get(key) if self.idempotency_cache is not None else None
+        if cached is not None:
+            cached_hash, response = cached
+            self._check_request_hash(key, cached_hash, request_hash)
+            idempotent_replays_total.labels(source="cache").inc()
+            return response, True
+
+        found = await self.idempotency_repository.get_task(db, key)
+        replayed = found is not None
+        if replayed:
+            task, stored_hash = found
+        else:
+            task = Task(**self._task_row(task_in, datetime.now(timezone.utc)))
+            task = await self.repository.add(db, task)
+            stored_hash = request_hash
+            replayed = not await self.idempotency_repository.add(db, key, task.id, request_hash)
+            if replayed:
+                # Параллельный запрос с тем же ключом закоммитил задачу первым
+                await db.rollback()
+                found = await self.idempotency_repository.get_task(db, key)
+                if found is None:
+                    raise LookupError(f"Task for idempotency key {key!r} no longer exists")
+                task, stored_hash = found
+            else:
+                await self._enqueue(db, [task])
+                await db.commit()
+                self._notify_relay()
+                tasks_created_total.labels(priority=task.priority.value).inc()
+
+        response = TaskResponse.model_validate(task)
+        if self.idempotency_cache is not None:
+            self.idempotency_cache.set(key, (stored_hash, response))
+        if replayed:
+            self._check_request_hash(key, stored_hash, request_hash)
+            idempotent_replays_total.labels(source="db").inc()
+        return response, replayed
+
+    @staticmethod
+    def _check_request_hash(key: str, stored_hash: str, request_hash: str):
+        if stored_hash != request_hash:
+            raise IdempotencyKeyReused(f"Idempotency key {key!r} was used with a different request body")
+
+    async def create_tasks(self, db: AsyncSession, tasks_in: list[TaskCreate]) -> list[Task]:
+        """Пакетное создание задач: один INSERT задач и один INSERT в outbox"""
+        now = datetime.now(timezone.utc)
+        rows = [self._task_row(task_in, now) for task_in in tasks_in]
+        tasks = await self.repository.create_many(db, rows)
+        await self._enqueue(db, tasks)
+        await db.commit()
+        self._notify_relay()
+
+        # Метрики
+        for priority, count in Counter(task.priority.value for task in tasks).items():
+            tasks_created_total.labels(priority=priority).inc(count)
+
+        return tasks
+
     async def get_task(self, db: AsyncSession, task_id: int) -> Optional[Task]:
-        """Получение задачи по ID"""
-        return await self.repository.get_by_id(db, task_id)
+        """Получение задачи по ID (через кэш, если он подключён)"""
+        if self.task_cache is None:
+            return await self.repository.get_by_id(db, task_id)
+        return await self.task_cache.get_or_load(
+            task_id, lambda: self.repository.get_by_id(db, task_id)
+        )
+
+    async def get_task_fields(self, db: AsyncSession, task_id: int, fields: list[str]) -> Optional[dict]:
+        """Задача только с полями fields: из кэша, если есть, иначе SELECT нужных колонок"""
+        cached = self.task_cache.get(task_id) if self.task_cache is not None else None
+        if cached is not None:
+            return {name: getattr(cached, name) for name in fields}
+        return await self.repository.get_fields(db, task_id, fields)
 
     async def list_tasks(
             self,
@@ -46,24 +188,33 @@ class TaskService:
             page_size: int = 10,
             status: Optional[TaskStatus] = None,
             priority: Optional[TaskPriority] = None,
-    ) -> tuple[list[Task], int]:
+            cursor: Optional[tuple[datetime, int]] = None,
+            with_total: bool = True,
+            as_rows: bool = False,
+            fields: Optional[list[str]] = None,
+    ) -> tuple[list, Optional[int]]:
         """Получение списка задач с фильтрацией и пагинацией"""
         return await self.repository.list_with_filters(
-            db, page, page_size, status, priority
+            db, page, page_size, status, priority,
+            cursor=cursor, with_total=with_total, as_rows=as_rows, fields=fields,
         )
 
+    async def get_stats(self, db: AsyncSession, window_minutes: int) -> dict:
+        """Счётчики и перцентили из предагрегированных таблиц (без сканирования tasks)"""
+        return await collect_stats(db, window_minutes)
+
     async def cancel_task(self, db: AsyncSession, task_id: int) -> bool:
-        """Отмена задачи"""
-        task = await self.repository.get_by_id(db, task_id)
-        if not task:
-            return False
+        """Отмена задачи в статусах NEW, SCHEDULED, PENDING или IN_PROGRESS
 
-        # Можно отменить только задачи в статусах NEW, PENDING
-        if task.status not in [TaskStatusEnum.NEW, TaskStatusEnum.PENDING]:
+        Событие CANCELLED рассылается всем процессам: worker'ы отбрасывают
+        сообщение задачи без запроса к БД, а выполняющуюся — прерывают.
+        """
+        task = await self.repository.cancel(db, task_id)
+        if not task:
+            await db.rollback()
             return False
-
-        task.status = TaskStatusEnum.CANCELLED
-        await self.repository.update(db, task)
+        await db.commit()
+        await self._broadcast_status(task)
 
         # Метрики
         tasks_cancelled_total.inc()
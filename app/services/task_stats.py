@@ -0,0 +1,80 @@
+import math
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.task_stats import STATS_BIN_BASE, STATS_KIND_WAIT
+from app.models.task import TaskPriorityEnum, TaskStatusEnum
+from app.repositories.task_count_repository import TaskCountRepository
+from app.repositories.task_stats_repository import TaskStatsRepository
+
+PERCENTILES = (50, 95, 99)
+
+_FINAL_KINDS = [TaskStatusEnum.COMPLETED.value, TaskStatusEnum.FAILED.value]
+
+
+def bin_value_ms(bin_: int) -> float:
+    """Представитель корзины: геометрическая середина [base^b - 1, base^(b+1) - 1)"""
+    return max(STATS_BIN_BASE ** (bin_ + 0.5) - 1, 0.0)
+
+
+def latency_summary(histogram: dict[int, int]) -> dict:
+    """count и p50/p95/p99 (мс) по логарифмической гистограмме"""
+    total = sum(histogram.values())
+    summary = {"count": total}
+    for q in PERCENTILES:
+        summary[f"p{q}_ms"] = None
+    if not total:
+        return summary
+
+    bins = sorted(histogram)
+    for q in PERCENTILES:
+        rank = math.ceil(total * q / 100)
+        seen = 0
+        for bin_ in bins:
+            seen += histogram[bin_]
+            if seen >= rank:
+                summary[f"p{q}_ms"] = round(bin_value_ms(bin_), 1)
+                break
+    return summary
+
+
+def _merge(histograms: dict[str, dict[int, int]], kinds: list[str]) -> dict[int, int]:
+    merged: dict[int, int] = {}
+    for kind in kinds:
+        for bin_, n in histograms.get(kind, {}).items():
+            merged[bin_] = merged.get(bin_, 0) + n
+    return merged
+
+
+async def collect_stats(db: AsyncSession, window_minutes: int) -> dict:
+    """Статистика по счётчикам task_counts и поминутным гистограммам за окно
+
+    Окно выровнено по минутам и включает текущую (неполную) минуту.
+    """
+    now = datetime.now(timezone.utc).replace(second=0, microsecond=0)
+    since = now - timedelta(minutes=window_minutes - 1)
+
+    by_status = {status.value: 0 for status in TaskStatusEnum}
+    by_priority = {priority.value: 0 for priority in TaskPriorityEnum}
+    for status, priority, n in await TaskCountRepository.breakdown(db):
+        by_status[status] += n
+        by_priority[priority] += n
+
+    histograms = await TaskStatsRepository.histograms(db, since)
+
+    throughput: dict[datetime, dict] = {}
+    for minute, kind, n in await TaskStatsRepository.per_minute(db, since, _FINAL_KINDS):
+        point = throughput.setdefault(minute, {"minute": minute, "completed": 0, "failed": 0})
+        point["completed" if kind == TaskStatusEnum.COMPLETED.value else "failed"] += n
+    completed = sum(point["completed"] for point in throughput.values())
+
+    return {
+        "window_minutes": window_minutes,
+        "by_status": by_status,
+        "by_priority": by_priority,
+        "completions_per_minute": round(completed / window_minutes, 3),
+        "throughput": list(throughput.values()),
+        "queue_wait": latency_summary(histograms.get(STATS_KIND_WAIT, {})),
+        "processing": latency_summary(_merge(histograms, _FINAL_KINDS)),
+    }
@@ -0,0 +1,34 @@
+import asyncio
+from collections import OrderedDict
+
+
+class TaskCancelled(asyncio.CancelledError):
+    """Выполнение прервано отменой задачи (событие CANCELLED), а не остановкой worker"""
+
+    def __init__(self, task_id: int):
+        super().__init__(f"Task {task_id} was cancelled")
+        self.task_id = task_id
+
+
+class RecentlyCancelled:
+    """Ограниченное множество id недавно отменённых задач, пополняется событиями CANCELLED
+
+    При переполнении вытесняются самые старые id: сообщение такой задачи пройдёт
+    обычный путь через claim в БД. Не Bloom-фильтр — ложное срабатывание
+    молча выбросило бы живую задачу.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._ids: OrderedDict[int, None] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __contains__(self, task_id: int) -> bool:
+        return task_id in self._ids
+
+    def add(self, task_id: int):
+        self._ids[task_id] = None
+        while len(self._ids) > self.max_size:
+            self._ids.popitem(last=False)
@@ -0,0 +1,198 @@
+import asyncio
+import logging
+from collections import deque
+from typing import Awaitable, Callable, Optional
+
+from app.core.config import settings
+from app.core.metrics import worker_concurrency_limit
+
+logger = logging.getLogger(__name__)
+
+
+class AdaptiveLimiter:
+    """Семафор с изменяемым лимитом (замена asyncio.Semaphore в адаптивном режиме)
+
+    Уменьшение лимита не прерывает уже выполняющиеся задачи: новые слоты
+    просто не выдаются, пока in_flight не опустится ниже лимита.
+    """
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.in_flight = 0
+        # Максимум in_flight с последнего сброса: лимит упирался в нагрузку
+        self.peak_in_flight = 0
+        self._waiters: deque[asyncio.Future] = deque()
+
+    def locked(self) -> bool:
+        return self.in_flight >= self.limit
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+    async def acquire(self) -> bool:
+        if not self._waiters and self.in_flight < self.limit:
+            self._grant()
+            return True
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # Слот уже выдан, но задача отменена — возвращаем его
+                self.release()
+            else:
+                self._waiters.remove(waiter)
+            raise
+        return True
+
+    def _grant(self):
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+
+    def reset_peak(self) -> int:
+        peak, self.peak_in_flight = self.peak_in_flight, self.in_flight
+        return peak
+
+    def release(self):
+        self.in_flight -= 1
+        self._wake()
+
+    def set_limit(self, limit: int):
+        self.limit = limit
+        self._wake()
+
+    def _wake(self):
+        while self._waiters and self.in_flight < self.limit:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self._grant()
+                waiter.set_result(True)
+
+    async def __aenter__(self):
+        await self.acquire()
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.release()
+
+
+def db_pool_usage(session_factory) -> float:
+    """Доля занятых соединений пула БД (pool_size + max_overflow)"""
+    bind = session_factory.kw.get("bind")
+    pool = getattr(bind, "pool", None)
+    if pool is None or not hasattr(pool, "checkedout"):
+        return 0.0
+    capacity = settings.db_pool_size + settings.db_max_overflow
+    return pool.checkedout() / capacity if capacity > 0 else 0.0
+
+
+class AIMDController:
+    """AIMD-регулятор числа задач в работе
+
+    Раз в interval оценивает задержку обработки, заполненность пула БД и
+    лаг event loop. При перегрузке лимит умножается на backoff_ratio,
+    иначе, если все слоты заняты, растёт на 1. Лимит держится в [min_limit, max_limit].
+    """
+
+    def __init__(
+            self,
+            limiter: AdaptiveLimiter,
+            min_limit: int = None,
+            max_limit: int = None,
+            interval: float = None,
+            on_change: Optional[Callable[[int], Awaitable[None]]] = None,
+            pool_usage: Optional[Callable[[], float]] = None,
+            max_loop_lag: float = None,
+            pool_high_watermark: float = None,
+            latency_tolerance: float = None,
+            backoff_ratio: float = None,
+    ):
+        self.limiter = limiter
+        self.min_limit = min_limit or settings.worker_min_concurrency
+        self.max_limit = max_limit or settings.worker_max_concurrency
+        self.interval = interval or settings.worker_adapt_interval
+        self.on_change = on_change
+        self.pool_usage = pool_usage
+        self.max_loop_lag = max_loop_lag or settings.worker_max_loop_lag_ms / 1000
+        self.pool_high_watermark = pool_high_watermark or settings.worker_db_pool_high_watermark
+        self.latency_tolerance = latency_tolerance or settings.worker_latency_tolerance
+        self.backoff_ratio = backoff_ratio or settings.worker_backoff_ratio
+        self.latency_baseline: Optional[float] = None
+        self._samples: list[float] = []
+        self._runner: Optional[asyncio.Task] = None
+        worker_concurrency_limit.set(self.limiter.limit)
+
+    def observe(self, duration: float):
+        """Время обработки завершённой задачи, секунды"""
+        self._samples.append(duration)
+
+    def overload_reason(self, loop_lag: float, latency: Optional[float]) -> Optional[str]:
+        if loop_lag > self.max_loop_lag:
+            return f"event loop lag {loop_lag * 1000:.0f}ms"
+        if self.pool_usage is not None:
+            usage = self.pool_usage()
+            if usage >= self.pool_high_watermark:
+                return f"db pool usage {usage:.0%}"
+        if latency is not None and self.latency_baseline is not None:
+            if latency > self.latency_baseline * self.latency_tolerance:
+                return f"latency {latency:.3f}s vs baseline {self.latency_baseline:.3f}s"
+        return None
+
+    def adjust(self, loop_lag: float) -> int:
+        """Новый лимит по наблюдениям за прошедший интервал"""
+        samples, self._samples = self._samples, []
+        latency = sum(samples) / len(samples) if samples else None
+        limit = self.limiter.limit
+        saturated = self.limiter.reset_peak() >= limit
+
+        reason = self.overload_reason(loop_lag, latency)
+        if reason:
+            new_limit = max(self.min_limit, int(limit * self.backoff_ratio))
+            if new_limit != limit:
+                logger.info(f"Concurrency {limit} -> {new_limit}: {reason}")
+        elif saturated or self.limiter.waiting:
+            # Рост только когда лимит действительно упирается в нагрузку
+            new_limit = min(self.max_limit, limit + 1)
+        else:
+            new_limit = limit
+
+        if latency is not None and not reason:
+            # Базовая задержка — минимальная средняя без перегрузки, медленно «забывается»
+            if self.latency_baseline is None or latency < self.latency_baseline:
+                self.latency_baseline = latency
+            else:
+                self.latency_baseline += (latency - self.latency_baseline) * 0.05
+
+        return new_limit
+
+    async def apply(self, limit: int):
+        if limit == self.limiter.limit:
+            return
+        self.limiter.set_limit(limit)
+        worker_concurrency_limit.set(limit)
+        if self.on_change:
+            await self.on_change(limit)
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(self.interval)
+            loop_lag = max(0.0, loop.time() - started - self.interval)
+            try:
+                await self.apply(self.adjust(loop_lag))
+            except Exception as e:
+                logger.error(f"Failed to apply concurrency limit: {e}")
+
+    def start(self):
+        self._runner = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self._runner:
+            self._runner.cancel()
+            try:
+                await self._runner
+            except asyncio.CancelledError:
+                pass
@@ -0,0 +1,31 @@
+import asyncio
+import logging
+import signal
+
+from app.core.config import settings
+from app.core.logging_config import setup_logging
+from app.services.outbox_relay import OutboxRelay
+from app.services.queue_service import QueueService
+
+logger = logging.getLogger(__name__)
+
+
+async def main():
+    """Запуск outbox relay отдельным процессом"""
+    queue_service = QueueService()
+    await queue_service.connect()
+    relay = OutboxRelay(queue_service)
+
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, lambda: asyncio.create_task(relay.stop()))
+
+    try:
+        await relay.run()
+    finally:
+        await queue_service.disconnect()
+
+
+if __name__ == "__main__":
+    setup_logging(log_level=settings.log_level, log_file="outbox_relay.log")
+    asyncio.run(main())
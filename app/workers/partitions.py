@@ -0,0 +1,152 @@
+import argparse
+import asyncio
+import gzip
+import logging
+import os
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Optional
+
+import orjson
+
+from app.core.config import settings
+from app.core.logging_config import setup_logging
+from app.db.session import AsyncSessionLocal
+from app.models.task import TASK_PARTITION_PATTERN
+from app.repositories.task_partition_repository import TaskPartitionRepository
+
+logger = logging.getLogger(__name__)
+
+
+def month_start(moment: datetime) -> datetime:
+    return moment.astimezone(timezone.utc).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def add_months(month: datetime, months: int) -> datetime:
+    index = month.year * 12 + month.month - 1 + months
+    return month.replace(year=index // 12, month=index % 12 + 1)
+
+
+def partition_name(month: datetime) -> str:
+    return f"tasks_p{month:%Y%m}"
+
+
+def partition_month(name: str) -> Optional[datetime]:
+    """Начало месяца помесячной партиции (None для tasks_default)"""
+    match = TASK_PARTITION_PATTERN.match(name)
+    if not match or match.group(1) == "default":
+        return None
+    return datetime.strptime(match.group(1)[1:], "%Y%m").replace(tzinfo=timezone.utc)
+
+
+async def ensure_partitions(
+        session_factory=AsyncSessionLocal,
+        months_ahead: int = None,
+        now: datetime = None,
+) -> list[str]:
+    """Создание партиций с текущего месяца на months_ahead вперёд; возвращает созданные"""
+    months_ahead = settings.task_partitions_ahead if months_ahead is None else months_ahead
+    current = month_start(now or datetime.now(timezone.utc))
+
+    created = []
+    async with session_factory() as db:
+        existing = set(await TaskPartitionRepository.partition_names(db))
+        for offset in range(months_ahead + 1):
+            month = add_months(current, offset)
+            name = partition_name(month)
+            if name in existing:
+                continue
+            await TaskPartitionRepository.set_lock_timeout(db, settings.task_partition_lock_timeout_ms)
+            moved = await TaskPartitionRepository.create_partition(db, name, month, add_months(month, 1))
+            await db.commit()
+            created.append(name)
+            logger.info(f"Created partition {name} ({moved} rows moved from default)")
+    return created
+
+
+async def export_partition(db, name: str, archive_dir: Path) -> tuple[Path, int]:
+    """Выгрузка партиции в archive_dir/<name>.ndjson.gz (запись во временный файл и rename)"""
+    archive_dir.mkdir(parents=True, exist_ok=True)
+    path = archive_dir / f"{name}.ndjson.gz"
+    tmp_path = path.with_name(path.name + ".tmp")
+
+    rows = 0
+    with gzip.open(tmp_path, "wb") as archive:
+        async for row in TaskPartitionRepository.iter_rows(db, name):
+            archive.write(orjson.dumps(row, option=orjson.OPT_UTC_Z | orjson.OPT_APPEND_NEWLINE))
+            rows += 1
+    os.replace(tmp_path, path)
+    return path, rows
+
+
+async def archive_partitions(
+        session_factory=AsyncSessionLocal,
+        retention_days: int = None,
+        archive_dir: Optional[str] = None,
+        now: datetime = None,
+) -> list[str]:
+    """Отключение партиций старше retention_days, в которых все задачи в финальных статусах
+
+    С archive_dir партиция выгружается в сжатый NDJSON и удаляется, без него —
+    только отключается (таблица остаётся в БД вне tasks).
+    """
+    retention_days = settings.task_archive_retention_days if retention_days is None else retention_days
+    archive_dir = settings.task_archive_dir if archive_dir is None else archive_dir
+    cutoff = (now or datetime.now(timezone.utc)) - timedelta(days=retention_days)
+
+    archived = []
+    async with session_factory() as db:
+        names = await TaskPartitionRepository.partition_names(db)
+        await db.rollback()
+
+    for name in names:
+        month = partition_month(name)
+        if month is None or add_months(month, 1) > cutoff:
+            continue
+
+        async with session_factory() as db:
+            if await TaskPartitionRepository.has_active_rows(db, name):
+                await db.rollback()
+                logger.warning(f"Partition {name} still has non-terminal tasks, skipping archival")
+                continue
+
+            await TaskPartitionRepository.set_lock_timeout(db, settings.task_partition_lock_timeout_ms)
+            if archive_dir:
+                path, rows = await export_partition(db, name, Path(archive_dir))
+                await TaskPartitionRepository.detach_partition(db, name)
+                await TaskPartitionRepository.drop_table(db, name)
+                logger.info(f"Archived partition {name}: {rows} rows exported to {path}")
+            else:
+                await TaskPartitionRepository.detach_partition(db, name)
+                logger.info(f"Detached partition {name}")
+            await db.commit()
+        archived.append(name)
+    return archived
+
+
+async def main(args: argparse.Namespace):
+    await ensure_partitions(months_ahead=args.months_ahead)
+    await archive_partitions(retention_days=args.retention_days, archive_dir=args.archive_dir)
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Maintain monthly partitions of the tasks table")
+    parser.add_argument(
+        "--months-ahead", type=int, default=settings.task_partitions_ahead,
+        help="Сколько месяцев вперёд держать созданные партиции",
+    )
+    parser.add_argument(
+        "--retention-days", type=int, default=settings.task_archive_retention_days,
+        help="Партиции, закончившиеся раньше, архивируются",
+    )
+    parser.add_argument(
+        "--archive-dir", default=settings.task_archive_dir,
+        help="Каталог для NDJSON.gz; пустая строка — только DETACH без выгрузки",
+    )
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    setup_logging(log_level=settings.log_level, log_file="partitions.log")
+    asyncio.run(main(args))
@@ -0,0 +1,87 @@
+import argparse
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+
+from app.core.config import settings
+from app.core.logging_config import setup_logging
+from app.core.metrics import task_counts_corrections_total
+from app.db.session import AsyncSessionLocal
+from app.repositories.idempotency_repository import IdempotencyKeyRepository
+from app.repositories.task_count_repository import TaskCountRepository
+from app.repositories.task_stats_repository import TaskStatsRepository
+
+logger = logging.getLogger(__name__)
+
+
+async def reconcile_once(session_factory=AsyncSessionLocal) -> dict[tuple[str, str], tuple[int, int]]:
+    """Один проход сверки task_counts с tasks; возвращает исправленные расхождения"""
+    async with session_factory() as db:
+        drift = await TaskCountRepository.drift(db)
+        await db.rollback()
+        if drift:
+            await TaskCountRepository.apply_drift(db, drift)
+            await db.commit()
+
+    if drift:
+        task_counts_corrections_total.inc(len(drift))
+        for (status, priority), (stored, actual) in sorted(drift.items()):
+            logger.warning(f"task_counts drift {status}/{priority}: {stored} -> {actual}")
+    else:
+        logger.info("task_counts are consistent with tasks")
+    return drift
+
+
+async def prune_stats(session_factory=AsyncSessionLocal, retention_hours: int = None) -> int:
+    """Удаление корзин task_stats_buckets старше срока хранения"""
+    retention_hours = retention_hours or settings.task_stats_retention_hours
+    before = datetime.now(timezone.utc) - timedelta(hours=retention_hours)
+    async with session_factory() as db:
+        deleted = await TaskStatsRepository.prune(db, before)
+        await db.commit()
+    if deleted:
+        logger.info(f"Pruned {deleted} task stats buckets older than {retention_hours}h")
+    return deleted
+
+
+async def prune_idempotency_keys(session_factory=AsyncSessionLocal, ttl_hours: int = None) -> int:
+    """Удаление Idempotency-Key старше срока хранения"""
+    ttl_hours = ttl_hours or settings.idempotency_key_ttl_hours
+    before = datetime.now(timezone.utc) - timedelta(hours=ttl_hours)
+    async with session_factory() as db:
+        deleted = await IdempotencyKeyRepository.prune(db, before)
+        await db.commit()
+    if deleted:
+        logger.info(f"Pruned {deleted} idempotency keys older than {ttl_hours}h")
+    return deleted
+
+
+async def main(interval: float):
+    """Сверка счётчиков, очистка старой статистики и ключей идемпотентности один раз или периодически (interval > 0)"""
+    while True:
+        try:
+            await reconcile_once()
+            await prune_stats()
+            await prune_idempotency_keys()
+        except Exception as e:
+            if interval <= 0:
+                raise
+            logger.error(f"task_counts reconciliation failed: {e}", exc_info=True)
+        if interval <= 0:
+            return
+        await asyncio.sleep(interval)
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Reconcile task_counts with tasks and prune old task stats and idempotency keys")
+    parser.add_argument(
+        "--interval", type=float, default=settings.task_counts_reconcile_interval,
+        help="Период сверки в секундах (0 — один проход, например из cron)",
+    )
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    setup_logging(log_level=settings.log_level, log_file="reconcile_counts.log")
+    asyncio.run(main(args.interval))
@@ -0,0 +1,35 @@
+import asyncio
+import logging
+import signal
+
+from app.core.config import settings
+from app.core.logging_config import setup_logging
+from app.services.queue_service import QueueService
+from app.services.task_scheduler import TaskScheduler, listen_dsn
+
+logger = logging.getLogger(__name__)
+
+
+async def main():
+    """Запуск планировщика отложенных задач отдельным процессом
+
+    Outbox relay здесь не будится: выпущенные задачи он подберёт за outbox_poll_interval.
+    """
+    # Брокер нужен только для рассылки событий PENDING выпущенных задач
+    queue_service = QueueService()
+    await queue_service.connect()
+    scheduler = TaskScheduler(queue_service=queue_service, dsn=listen_dsn())
+
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, lambda: asyncio.create_task(scheduler.stop()))
+
+    try:
+        await scheduler.run()
+    finally:
+        await queue_service.disconnect()
+
+
+if __name__ == "__main__":
+    setup_logging(log_level=settings.log_level, log_file="scheduler.log")
+    asyncio.run(main())
@@ -0,0 +1,95 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Optional
+
+from app.repositories.task_repository import TaskRepository
+
+logger = logging.getLogger(__name__)
+
+
+class StatusWriteBuffer:
+    """Write-behind буфер финальных статусов задач
+
+    Обновления копятся в памяти и сбрасываются одним
+    UPDATE ... FROM (VALUES ...) по размеру буфера или по таймеру.
+    Сообщения подтверждаются (ack) только после успешного commit.
+    """
+
+    def __init__(
+            self,
+            session_factory,
+            max_size: int,
+            flush_interval: float,
+            on_flushed: Optional[Callable[[list[dict]], Awaitable[None]]] = None,
+    ):
+        self.session_factory = session_factory
+        self.on_flushed = on_flushed
+        self.max_size = max_size
+        self.flush_interval = flush_interval
+        self.repository = TaskRepository()
+        self._entries: list[tuple[dict, Any]] = []
+        self._flush_now = asyncio.Event()
+        self._lock = asyncio.Lock()
+        self._stopping = False
+        self._runner: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def add(self, values: dict, message: Any = None):
+        """Добавление обновления (id, status, completed_at, result, error)"""
+        self._entries.append((values, message))
+        if len(self._entries) >= self.max_size:
+            self._flush_now.set()
+
+    async def flush(self) -> int:
+        """Сброс накопленных обновлений; возвращает число записанных строк"""
+        async with self._lock:
+            entries, self._entries = self._entries, []
+            if not entries:
+                return 0
+
+            try:
+                async with self.session_factory() as db:
+                    written = set(await self.repository.update_statuses(db, [values for values, _ in entries]))
+                    await db.commit()
+            except Exception as e:
+                # Сообщения остаются неподтверждёнными, повторим при следующем сбросе
+                logger.error(f"Failed to flush {len(entries)} status updates: {e}")
+                self._entries = entries + self._entries
+                return 0
+
+            for _, message in entries:
+                if message is not None:
+                    await message.ack()
+
+            # Не записаны: задачу отменили во время выполнения, сообщение всё равно подтверждено
+            skipped = len(entries) - len(written)
+            if skipped:
+                logger.info(f"Dropped {skipped} status updates of tasks that are no longer IN_PROGRESS")
+
+            if self.on_flushed and written:
+                await self.on_flushed([values for values, _ in entries if values["id"] in written])
+
+            logger.debug(f"Flushed {len(written)} status updates")
+            return len(written)
+
+    async def run(self):
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._flush_now.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_now.clear()
+            await self.flush()
+
+    def start(self):
+        self._runner = asyncio.create_task(self.run())
+
+    async def stop(self):
+        """Остановка фонового сброса с финальным flush"""
+        self._stopping = True
+        self._flush_now.set()
+        if self._runner:
+            await self._runner
+        await self.flush()
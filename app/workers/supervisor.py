@@ -0,0 +1,176 @@
+import logging
+import multiprocessing
+import os
+import signal
+import time
+from dataclasses import dataclass
+from multiprocessing.connection import wait
+from typing import Callable, Optional
+
+from app.core.config import settings
+from app.core.metrics import mark_process_dead, start_metrics_server
+
+logger = logging.getLogger(__name__)
+
+# Серия падений быстрее этого времени увеличивает задержку перезапуска
+MIN_HEALTHY_UPTIME = 10.0
+MAX_RESTART_DELAY = 30.0
+
+
+def run_worker_process(index: int, cpu: Optional[int]):
+    """Точка входа дочернего процесса: собственные event loop, подключение к брокеру и engine БД"""
+    import asyncio
+
+    from app.core.logging_config import setup_logging
+    from app.workers.task_worker import main
+
+    if cpu is not None:
+        os.sched_setaffinity(0, {cpu})
+    setup_logging(log_level=settings.log_level, log_file=f"worker-{index}.log")
+    asyncio.run(main())
+
+
+@dataclass
+class Child:
+    process: multiprocessing.Process
+    started_at: float
+    cpu: Optional[int]
+
+
+class WorkerSupervisor:
+    """Запуск N процессов TaskWorker, перезапуск упавших и согласованная остановка
+
+    Процессы стартуют через spawn: дочерние не наследуют сокеты брокера и
+    пул соединений БД родителя. Метрики дочерних процессов пишутся в общий
+    multiprocess-каталог, supervisor отдаёт их сумму на metrics_port.
+    """
+
+    def __init__(
+            self,
+            processes: int,
+            cpu_affinity: bool = False,
+            target: Callable[[int, Optional[int]], None] = run_worker_process,
+            restart_delay: float = None,
+            shutdown_timeout: float = None,
+            metrics_port: int = None,
+    ):
+        self.processes = processes
+        self.cpu_affinity = cpu_affinity
+        self.target = target
+        self.restart_delay = restart_delay if restart_delay is not None else settings.worker_restart_delay
+        self.shutdown_timeout = shutdown_timeout or settings.worker_shutdown_timeout
+        self.metrics_port = settings.worker_metrics_port if metrics_port is None else metrics_port
+        self.metrics_dir: Optional[str] = None
+        self.metrics_server = None
+        self.context = multiprocessing.get_context("spawn")
+        self.children: dict[int, Child] = {}
+        self.fast_crashes: dict[int, int] = {}
+        self.restart_at: dict[int, float] = {}
+        self.stopping = False
+
+    def cpu_for(self, index: int) -> Optional[int]:
+        if not self.cpu_affinity or not hasattr(os, "sched_getaffinity"):
+            return None
+        cpus = sorted(os.sched_getaffinity(0))
+        return cpus[index % len(cpus)]
+
+    def start_metrics(self):
+        """Каталог метрик задаётся до spawn: дочерние импортируют prometheus_client в multiprocess-режиме"""
+        from app.server import prepare_multiproc_dir
+
+        base = os.environ.get("PROMETHEUS_MULTIPROC_DIR", settings.prometheus_multiproc_dir)
+        # Свой подкаталог: запуск API на том же хосте не удаляет файлы worker
+        self.metrics_dir = prepare_multiproc_dir(os.path.join(base, "worker"))
+        os.environ["PROMETHEUS_MULTIPROC_DIR"] = self.metrics_dir
+        self.metrics_server = start_metrics_server(self.metrics_port, self.metrics_dir)
+        logger.info(f"Serving worker metrics on :{self.metrics_port}")
+
+    def forget(self, child: Child):
+        """Live-gauge завершившегося процесса (лимит concurrency, активные задачи) больше не суммируются"""
+        if self.metrics_dir:
+            mark_process_dead(child.process.pid, self.metrics_dir)
+
+    def spawn(self, index: int):
+        cpu = self.cpu_for(index)
+        process = self.context.Process(
+            target=self.target,
+            args=(index, cpu),
+            name=f"task-worker-{index}",
+        )
+        process.start()
+        self.children[index] = Child(process, time.monotonic(), cpu)
+        logger.info(f"Started worker {index} (pid={process.pid}, cpu={cpu})")
+
+    def start(self):
+        for index in range(self.processes):
+            self.spawn(index)
+
+    def reap(self):
+        """Обработка завершившихся процессов и отложенных перезапусков"""
+        now = time.monotonic()
+        for index, child in list(self.children.items()):
+            if child.process.is_alive():
+                continue
+            child.process.join()
+            self.forget(child)
+            del self.children[index]
+            if self.stopping:
+                continue
+
+            uptime = now - child.started_at
+            if uptime < MIN_HEALTHY_UPTIME:
+                self.fast_crashes[index] = self.fast_crashes.get(index, 0) + 1
+            else:
+                self.fast_crashes[index] = 0
+            fails = self.fast_crashes[index]
+            delay = min(MAX_RESTART_DELAY, self.restart_delay * 2 ** (fails - 1)) if fails else 0.0
+            logger.warning(
+                f"Worker {index} (pid={child.process.pid}) exited with code {child.process.exitcode} "
+                f"after {uptime:.1f}s, restarting in {delay:.1f}s"
+            )
+            self.restart_at[index] = now + delay
+
+        for index, at in list(self.restart_at.items()):
+            if not self.stopping and at <= now:
+                del self.restart_at[index]
+                self.spawn(index)
+
+    def request_shutdown(self, signum=None, frame=None):
+        if not self.stopping:
+            logger.info("Shutdown requested, stopping workers...")
+        self.stopping = True
+
+    def shutdown(self):
+        """SIGTERM всем процессам, ожидание graceful shutdown, затем SIGKILL"""
+        self.stopping = True
+        self.restart_at.clear()
+        for child in self.children.values():
+            if child.process.is_alive():
+                child.process.terminate()
+
+        deadline = time.monotonic() + self.shutdown_timeout
+        for index, child in self.children.items():
+            child.process.join(max(0.0, deadline - time.monotonic()))
+            if child.process.is_alive():
+                logger.warning(f"Worker {index} (pid={child.process.pid}) did not stop in time, killing")
+                child.process.kill()
+                child.process.join()
+            self.forget(child)
+        self.children.clear()
+        if self.metrics_server:
+            self.metrics_server.shutdown()
+            self.metrics_server = None
+        logger.info("All workers stopped")
+
+    def run(self):
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(sig, self.request_shutdown)
+
+        logger.info(f"Starting supervisor with {self.processes} worker processes")
+        if self.metrics_port:
+            self.start_metrics()
+        self.start()
+        while not self.stopping:
+            wait([child.process.sentinel for child in self.children.values()], timeout=0.5)
+            self.reap()
+        self.shutdown()
@@ -1,64 +1,298 @@
+import argparse
 import asyncio
+import json
 import logging
+import signal
+import time
 from datetime import datetime
-from typing import Set
+from typing import Awaitable, Optional, Set
 from sqlalchemy.ext.asyncio import AsyncSession
-import aio_pika
 
+from app.brokers import BrokerMessage
 from app.core.config import settings
 from app.core.logging_config import setup_logging
 from app.core.metrics import (
+    rabbitmq_messages_consumed,
+    start_metrics_server,
+    task_queue_wait_seconds,
     tasks_failed_total,
-    track_task_processing
+    track_task_processing,
+    worker_cancelled_tasks_total,
+    worker_concurrency_limit,
+    worker_task_retries_total,
 )
-from app.models.task import TaskStatusEnum
+from app.db.session import AsyncSessionLocal
+from app.models.task import Task, TaskStatusEnum
 from app.repositories.task_repository import TaskRepository
+from app.services.queue_service import QueueService, message_priority, queue_wait_seconds, retry_count
+from app.services.task_events import build_status_event
+from app.workers.cancellation import RecentlyCancelled, TaskCancelled
+from app.workers.concurrency import AIMDController, AdaptiveLimiter, db_pool_usage
+from app.workers.status_buffer import StatusWriteBuffer
+from app.workers.weighted_inbox import WeightedInbox
 
-# Настройка логирования для worker
-setup_logging(log_level=settings.log_level, log_file="worker.log")
 logger = logging.getLogger(__name__)
 
 
+class FailureNotRecorded(Exception):
+    """Статус упавшей задачи не записан до остановки worker: сообщение возвращается в очередь"""
+
+
 class TaskWorker:
-    def __init__(self, concurrency: int = None):
+    def __init__(
+            self,
+            concurrency: int = None,
+            batch_size: int = None,
+            batch_max_wait_ms: int = None,
+            session_factory=AsyncSessionLocal,
+            queue_service: Optional[QueueService] = None,
+            adaptive: bool = None,
+    ):
         self.concurrency = concurrency or settings.worker_concurrency
         self.max_retries = settings.worker_max_retries
         self.repository = TaskRepository()
+        self.session_factory = session_factory
+        # Потребление очереди и публикация событий смены статуса через бэкенд брокера;
+        # переданный снаружи queue_service (in-process режим API) worker не закрывает
+        self.owns_queue_service = queue_service is None
+        self.queue_service = queue_service or QueueService()
         self.shutdown_event = asyncio.Event()
         self.active_tasks: Set[asyncio.Task] = set()
-        self.connection = None
-        self.channel = None
+        self.consumers = None
+        # Отмена по событиям CANCELLED: сообщения отменённых задач отбрасываются без БД,
+        # выполняющиеся (task_id -> asyncio.Task выполнения) прерываются
+        self.cancelled = RecentlyCancelled(settings.worker_cancelled_cache_size)
+        self.running: dict[int, asyncio.Task] = {}
 
-    @track_task_processing()
-    async def process_task(self, task_id: int, db: AsyncSession):
-        """Обработка одной задачи"""
+        # Адаптивный режим: лимит и prefetch подстраиваются AIMD-регулятором
+        self.adaptive = settings.worker_adaptive_concurrency if adaptive is None else adaptive
+        self.controller: Optional[AIMDController] = None
+        if self.adaptive:
+            self.concurrency = min(
+                max(self.concurrency, settings.worker_min_concurrency), settings.worker_max_concurrency
+            )
+            self.semaphore = AdaptiveLimiter(self.concurrency)
+            self.controller = AIMDController(
+                self.semaphore,
+                on_change=self.on_concurrency_changed,
+                pool_usage=lambda: db_pool_usage(session_factory),
+            )
+        else:
+            self.semaphore = asyncio.Semaphore(self.concurrency)
+
+        # Пакетный режим: batch_size > 1
+        self.batch_size = batch_size or settings.worker_batch_size
+        self.batch_max_wait = (batch_max_wait_ms or settings.worker_batch_max_wait_ms) / 1000
+        # Режим weighted: сообщения всех очередей приоритетов копятся в inbox,
+        # следующее для свободного слота выбирается по весам
+        self.weighted = self.queue_service.weighted
+        self.inbox = WeightedInbox(settings.task_queue_weights) if self.weighted else asyncio.Queue()
+        self.status_buffer: Optional[StatusWriteBuffer] = None
+        if self.batched:
+            self.status_buffer = StatusWriteBuffer(
+                session_factory,
+                max_size=settings.worker_write_buffer_size,
+                flush_interval=settings.worker_write_flush_interval_ms / 1000,
+                on_flushed=self.publish_flushed_statuses,
+            )
+
+    @property
+    def batched(self) -> bool:
+        return self.batch_size > 1
+
+    @property
+    def prefetch_count(self) -> int:
+        if not self.batched:
+            prefetch = self.concurrency
+        else:
+            # Неподтверждённые сообщения ждут и слота, и сброса write-behind буфера
+            prefetch = self.concurrency + self.batch_size + settings.worker_write_buffer_size
+        if self.weighted:
+            # Выбирать по весам есть из чего, только если в inbox есть сообщения каждой очереди
+            prefetch *= len(self.queue_service.task_queues)
+        return prefetch
+
+    async def on_concurrency_changed(self, limit: int):
+        """Новый лимит от регулятора: prefetch брокера следует за ним"""
+        self.concurrency = limit
+        if self.consumers is not None:
+            await self.queue_service.set_prefetch(self.prefetch_count)
+
+    def observe_latency(self, started: float):
+        if self.controller:
+            self.controller.observe(time.perf_counter() - started)
+
+    async def publish_status_events(self, events: list[dict]):
+        """Рассылка событий смены статуса; ошибка рассылки не влияет на обработку"""
         try:
-            task = await self.repository.get_by_id(db, task_id)
-            if not task:
-                logger.error(f"Task {task_id} not found in database")
+            await self.queue_service.publish_status_events(events)
+        except Exception as e:
+            logger.warning(f"Failed to publish {len(events)} status events: {e}")
+
+    async def publish_task_status(self, task: Task):
+        await self.publish_status_events([
+            build_status_event(task.id, task.status, task.started_at, task.completed_at)
+        ])
+
+    async def publish_flushed_statuses(self, updates: list[dict]):
+        await self.publish_status_events([
+            build_status_event(u["id"], u["status"], completed_at=u.get("completed_at"))
+            for u in updates
+        ])
+
+    def on_status_event(self, event: dict):
+        """Событие смены статуса из fanout: запоминаем отменённые, прерываем выполняющиеся"""
+        if event.get("status") != TaskStatusEnum.CANCELLED.value:
+            return
+        task_id = event["task_id"]
+        self.cancelled.add(task_id)
+        runner = self.running.get(task_id)
+        if runner is not None and not runner.done():
+            logger.info(f"Task {task_id} was cancelled while running, interrupting")
+            runner.cancel()
+
+    async def drop_if_cancelled(self, task_id: int, message: BrokerMessage) -> bool:
+        """Подтверждение сообщения отменённой задачи без обращения к БД"""
+        if task_id not in self.cancelled:
+            return False
+        logger.info(f"Task {task_id} is cancelled, message dropped")
+        worker_cancelled_tasks_total.labels(stage="queued").inc()
+        await message.ack()
+        return True
+
+    async def run_cancellable(self, task_id: int, work: Awaitable[str]) -> str:
+        """Выполнение задачи отдельным asyncio.Task, который прерывает событие CANCELLED"""
+        runner = asyncio.ensure_future(work)
+        self.running[task_id] = runner
+        try:
+            return await runner
+        except asyncio.CancelledError:
+            if task_id in self.cancelled:
+                worker_cancelled_tasks_total.labels(stage="running").inc()
+                raise TaskCancelled(task_id) from None
+            raise
+        finally:
+            self.running.pop(task_id, None)
+
+    async def write_final_status(
+            self,
+            db: AsyncSession,
+            task: Task,
+            status: TaskStatusEnum,
+            result: Optional[str] = None,
+            error: Optional[str] = None,
+    ) -> bool:
+        """Финальный статус, если задача всё ещё IN_PROGRESS (не отменена во время выполнения)"""
+        completed_at = datetime.utcnow()
+        written = await self.repository.update_statuses(db, [
+            {"id": task.id, "status": status, "completed_at": completed_at, "result": result, "error": error}
+        ])
+        await db.commit()
+        if not written:
+            logger.warning(f"Task {task.id} is no longer IN_PROGRESS, {status.value} result discarded")
+            return False
+        await self.publish_status_events([build_status_event(task.id, status, task.started_at, completed_at)])
+        return True
+
+    async def release_for_retry(self, db: AsyncSession, task: Task, error: str) -> bool:
+        """Задача снова PENDING до повторной попытки (если её не отменили во время выполнения)"""
+        released = await self.repository.release_for_retry(db, task.id, error)
+        await db.commit()
+        if released:
+            await self.publish_status_events([build_status_event(task.id, TaskStatusEnum.PENDING, task.started_at)])
+        return released
+
+    async def record_failure(self, task: Task, attempt: int, error: str):
+        """PENDING до повтора (попытки остались) или FAILED
+
+        Повтор в брокере планируется только после записи статуса: сообщение повтора
+        не захватило бы задачу, оставшуюся IN_PROGRESS. Поэтому ошибка БД повторяется
+        с backoff, пока worker не останавливается, а затем — FailureNotRecorded.
+        """
+        delay = settings.worker_retry_base_delay_ms / 1000
+        while True:
+            try:
+                async with self.session_factory() as db:
+                    if attempt < self.max_retries:
+                        await self.release_for_retry(db, task, error)
+                    elif await self.write_final_status(db, task, TaskStatusEnum.FAILED, error=error):
+                        tasks_failed_total.inc()
                 return
+            except Exception as e:
+                if self.shutdown_event.is_set():
+                    raise FailureNotRecorded(f"Failure of task {task.id} was not recorded: {e}") from e
+                logger.error(f"Failed to record failure of task {task.id}, retrying in {delay:g}s: {e}")
+            try:
+                await asyncio.wait_for(self.shutdown_event.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
+            delay = min(delay * 2, settings.worker_retry_max_delay_ms / 1000)
+
+    async def schedule_retry(self, message: BrokerMessage, attempt: int) -> bool:
+        try:
+            await self.queue_service.publish_retry(message, attempt)
+        except Exception as e:
+            logger.error(f"Failed to schedule retry {attempt} of {message.body!r}: {e}")
+            return False
+        worker_task_retries_total.labels(outcome="retried").inc()
+        return True
 
-            if task.status != TaskStatusEnum.PENDING:
-                logger.warning(f"Task {task_id} is in '{task.status}' status, expected PENDING")
+    async def park(self, message: BrokerMessage, error: str) -> bool:
+        try:
+            await self.queue_service.publish_parked(message, error)
+        except Exception as e:
+            logger.error(f"Failed to park message {message.body!r}: {e}")
+            return False
+        logger.warning(f"Message {message.body!r} parked after {retry_count(message)} retries: {error}")
+        worker_task_retries_total.labels(outcome="parked").inc()
+        return True
+
+    async def settle_failed(self, message: BrokerMessage, attempt: int, error: str):
+        """Упавшее сообщение — в очередь задержки следующей попытки или в parking, затем ack
+
+        Ожидание повтора идёт в брокере (TTL + dead-letter) и не занимает ни слот
+        concurrency, ни prefetch. Если опубликовать не удалось — сообщение
+        возвращается в очередь задач.
+        """
+        if attempt < self.max_retries:
+            published = await self.schedule_retry(message, attempt + 1)
+        else:
+            published = await self.park(message, error)
+        if published:
+            await message.ack()
+        else:
+            await message.nack(requeue=True)
+
+    async def execute(self, task: Task) -> str:
+        """Бизнес-логика задачи, возвращает result"""
+        # Симуляция работы (Можно заменить на реальную бизнес-логику)
+        await asyncio.sleep(5)
+        return f"Task '{task.title}' completed successfully"
+
+    @track_task_processing()
+    async def process_task(self, task_id: int, db: AsyncSession, attempt: int = 0):
+        """Обработка одной задачи (attempt — номер повтора из заголовка сообщения)
+
+        Захват (PENDING -> IN_PROGRESS) и запись результата — условные UPDATE:
+        отменённая в любой момент задача не запускается и не перезаписывается.
+        """
+        task = None
+        try:
+            claimed = await self.repository.claim_pending(db, [task_id])
+            await db.commit()
+            if not claimed:
+                logger.warning(f"Task {task_id} is not PENDING (missing, cancelled or already processed), skipped")
                 return
+            task = claimed[0]
 
             logger.info(f"Processing task {task_id}: '{task.title}' (priority: {task.priority})")
+            await self.publish_task_status(task)
 
-            # Устанавливаем статус IN_PROGRESS
-            task.status = TaskStatusEnum.IN_PROGRESS
-            task.started_at = datetime.utcnow()
-            await self.repository.update(db, task)
-
-            # Симуляция работы (Можно заменить на реальную бизнес-логику)
-            await asyncio.sleep(5)
+            result = await self.run_cancellable(task_id, self.execute(task))
 
             # Успешное завершение
-            task.status = TaskStatusEnum.COMPLETED
-            task.completed_at = datetime.utcnow()
-            task.result = f"Task '{task.title}' completed successfully"
-            await self.repository.update(db, task)
-
-            logger.info(f"Task {task_id} completed successfully")
+            if await self.write_final_status(db, task, TaskStatusEnum.COMPLETED, result=result):
+                logger.info(f"Task {task_id} completed successfully")
 
         except asyncio.CancelledError:
             logger.warning(f"Task {task_id} processing was cancelled")
@@ -66,19 +300,385 @@ class TaskWorker:
         except Exception as e:
             logger.error(f"Error processing task {task_id}: {e}", exc_info=True)
 
-            # Обновляем статус на FAILED
+            # Попытки остались — задача ждёт повтора в PENDING, иначе FAILED
+            if task is not None:
+                await db.rollback()
+                await self.record_failure(task, attempt, str(e))
+            raise
+
+    @staticmethod
+    def parse_task_id(message: BrokerMessage) -> Optional[int]:
+        try:
+            return int(json.loads(message.body)["task_id"])
+        except (ValueError, KeyError, TypeError) as e:
+            logger.error(f"Malformed message {message.body!r}: {e}")
+            return None
+
+    @staticmethod
+    def observe_queue_wait(message: BrokerMessage):
+        wait = queue_wait_seconds(message)
+        if wait is not None:
+            task_queue_wait_seconds.labels(priority=message_priority(message)).observe(wait)
+
+    async def accept_message(self, message: BrokerMessage) -> Optional[int]:
+        """task_id сообщения; None — сообщение уже отклонено (битое) или подтверждено (задача отменена)"""
+        rabbitmq_messages_consumed.inc()
+        task_id = self.parse_task_id(message)
+        if task_id is None:
+            await message.reject(requeue=False)
+            return None
+        if await self.drop_if_cancelled(task_id, message):
+            return None
+        return task_id
+
+    async def process_message(self, task_id: int, message: BrokerMessage):
+        """Обработка сообщения на уже занятом слоте concurrency"""
+        self.observe_queue_wait(message)
+        attempt = retry_count(message)
+        started = time.perf_counter()
+        try:
+            async with self.session_factory() as db:
+                await self.process_task(task_id, db, attempt)
+            self.observe_latency(started)
+            await message.ack()
+        except TaskCancelled:
+            # Статус CANCELLED уже записан отменившим; слот освобождается сразу
+            await message.ack()
+        except asyncio.CancelledError:
+            await message.nack(requeue=True)
+            raise
+        except FailureNotRecorded as e:
+            logger.error(f"{e}, message returned to queue")
+            await message.nack(requeue=True)
+        except Exception as e:
+            # Статус (PENDING до повтора или FAILED) уже записан в process_task
+            await self.settle_failed(message, attempt, str(e))
+
+    async def handle_message(self, message: BrokerMessage):
+        """Обработка сообщения из очереди (режим по одному сообщению)"""
+        task_id = await self.accept_message(message)
+        if task_id is None:
+            return
+        async with self.semaphore:
+            await self.process_message(task_id, message)
+
+    async def run_selected(self, message: BrokerMessage):
+        """Сообщение, выбранное dispatch_loop под занятый им слот"""
+        try:
+            task_id = await self.accept_message(message)
+            if task_id is not None:
+                await self.process_message(task_id, message)
+        finally:
+            self.semaphore.release()
+
+    async def dispatch_loop(self):
+        """Режим weighted по одному сообщению: сначала слот, затем выбор из inbox
+
+        Выбор в момент освобождения слота учитывает всё, что уже получено из
+        очередей приоритетов, а не порядок доставки.
+        """
+        while True:
+            await self.semaphore.acquire()
             try:
-                task = await self.repository.get_by_id(db, task_id)
-                if task:
-                    task.status = TaskStatusEnum.FAILED
-                    task.completed_at = datetime.utcnow()
-                    task.error = str(e)
-                    await self.repository.update(db, task)
-                    tasks_failed_total.inc()
-            except Exception as update_error:
-                logger.error(f"Failed to update task {task_id} status to FAILED: {update_error}")
+                message = await self.inbox.get()
+            except asyncio.CancelledError:
+                self.semaphore.release()
+                raise
+            runner = asyncio.create_task(self.run_selected(message))
+            self.active_tasks.add(runner)
+            runner.add_done_callback(self.active_tasks.discard)
+
+    async def on_message(self, message: BrokerMessage):
+        if self.batched or self.weighted:
+            self.inbox.put_nowait(message)
+            return
+        task = asyncio.create_task(self.handle_message(message))
+        self.active_tasks.add(task)
+        task.add_done_callback(self.active_tasks.discard)
+
+    async def collect_batch(self) -> list:
+        """Сбор до batch_size сообщений или ожидание batch_max_wait
+
+        На каждое сообщение заранее занимается слот concurrency, поэтому
+        захваченные задачи сразу уходят в работу, а не ждут в IN_PROGRESS.
+        """
+        loop = asyncio.get_running_loop()
+        await self.semaphore.acquire()
+        try:
+            batch = [await self.inbox.get()]
+        except asyncio.CancelledError:
+            self.semaphore.release()
             raise
 
-    async def handle_message(self, message: aio_pika.IncomingMessage):
-        """Обработка сообщения из очереди с retry логикой"""
-        retry_count = message
+        deadline = loop.time() + self.batch_max_wait
+        while len(batch) < self.batch_size and not self.semaphore.locked():
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            acquired = False
+            try:
+                # Ожидание слота (AdaptiveLimiter с очередью) тоже может быть прервано остановкой
+                await self.semaphore.acquire()
+                acquired = True
+                batch.append(await asyncio.wait_for(self.inbox.get(), timeout=remaining))
+            except asyncio.TimeoutError:
+                self.semaphore.release()
+                break
+            except asyncio.CancelledError:
+                # Прерванный acquire слот не занял; собранные сообщения — обратно в inbox,
+                # stop() вернёт их в очередь брокера (nack с requeue)
+                if acquired:
+                    self.semaphore.release()
+                for message in batch:
+                    self.inbox.put_nowait(message)
+                    self.semaphore.release()
+                raise
+        return batch
+
+    async def dispatch_batch(self, messages: list):
+        """Захват пачки одним UPDATE и запуск обработки захваченных задач
+
+        Каждое сообщение пачки держит слот concurrency, пока его не подтвердят
+        или не передадут исполнителю. Если dispatch прерван, захваченные задачи
+        всё равно уходят исполнителям (иначе они остались бы в IN_PROGRESS без
+        исполнителя), остальные сообщения возвращаются в очередь.
+        """
+        rabbitmq_messages_consumed.inc(len(messages))
+        unsettled: dict[int, BrokerMessage] = {id(message): message for message in messages}
+        claimed: list[Task] = []
+        by_task_id: dict[int, BrokerMessage] = {}
+
+        async def settle(message: BrokerMessage, outcome: Awaitable):
+            await outcome
+            del unsettled[id(message)]
+            self.semaphore.release()
+
+        try:
+            for message in messages:
+                task_id = self.parse_task_id(message)
+                if task_id is None:
+                    await settle(message, message.reject(requeue=False))
+                elif task_id in by_task_id:
+                    # Дубликат в той же пачке
+                    await settle(message, message.ack())
+                elif task_id in self.cancelled:
+                    await settle(message, self.drop_if_cancelled(task_id, message))
+                else:
+                    self.observe_queue_wait(message)
+                    by_task_id[task_id] = message
+
+            if not by_task_id:
+                return
+
+            try:
+                async with self.session_factory() as db:
+                    claimed = await self.repository.claim_pending(db, list(by_task_id))
+                    # Прерванный commit мог и пройти: такие задачи тоже отдаём исполнителям,
+                    # сообщение без nack не будет доставлено повторно
+                    await db.commit()
+            except Exception as e:
+                logger.error(f"Failed to claim batch of {len(by_task_id)} tasks: {e}")
+                claimed = []
+                for message in by_task_id.values():
+                    await settle(message, message.nack(requeue=True))
+                return
+
+            if claimed:
+                await self.publish_status_events([
+                    build_status_event(task.id, task.status, task.started_at) for task in claimed
+                ])
+            self.start_claimed(claimed, by_task_id, unsettled)
+
+            # Не захвачены: отменены, уже обработаны или отсутствуют в БД
+            for task_id, message in by_task_id.items():
+                logger.warning(f"Task {task_id} is not PENDING, message dropped")
+                await settle(message, message.ack())
+        except asyncio.CancelledError:
+            self.start_claimed(claimed, by_task_id, unsettled)
+            for message in unsettled.values():
+                try:
+                    await message.nack(requeue=True)
+                except Exception as e:
+                    logger.error(f"Failed to return message to queue: {e}")
+                self.semaphore.release()
+            unsettled.clear()
+            raise
+
+    def start_claimed(self, claimed: list[Task], by_task_id: dict, unsettled: dict):
+        """Передача захваченных задач исполнителям; слот переходит к исполнителю"""
+        for task in claimed:
+            message = by_task_id.pop(task.id, None)
+            if message is None:
+                continue
+            del unsettled[id(message)]
+            runner = asyncio.create_task(self.run_claimed(task, message))
+            self.active_tasks.add(runner)
+            runner.add_done_callback(self.active_tasks.discard)
+
+    @track_task_processing()
+    async def execute_claimed(self, task: Task) -> str:
+        logger.info(f"Processing task {task.id}: '{task.title}' (priority: {task.priority})")
+        return await self.execute(task)
+
+    async def run_claimed(self, task: Task, message: BrokerMessage):
+        """Выполнение захваченной задачи; финальный статус уходит в write-behind буфер
+
+        Упавшая задача с оставшимися попытками буфер не ждёт: она сразу
+        возвращается в PENDING, а сообщение — в очередь задержки.
+        """
+        started = time.perf_counter()
+        try:
+            result = await self.run_cancellable(task.id, self.execute_claimed(task))
+            self.observe_latency(started)
+            self.status_buffer.add(
+                {
+                    "id": task.id,
+                    "status": TaskStatusEnum.COMPLETED,
+                    "completed_at": datetime.utcnow(),
+                    "result": result,
+                },
+                message,
+            )
+        except TaskCancelled:
+            await message.ack()
+        except asyncio.CancelledError:
+            await message.nack(requeue=True)
+            raise
+        except Exception as e:
+            logger.error(f"Error processing task {task.id}: {e}", exc_info=True)
+            attempt = retry_count(message)
+            if attempt < self.max_retries:
+                try:
+                    await self.record_failure(task, attempt, str(e))
+                except FailureNotRecorded as not_recorded:
+                    logger.error(f"{not_recorded}, message returned to queue")
+                    await message.nack(requeue=True)
+                    return
+                await self.settle_failed(message, attempt, str(e))
+                return
+            # Сообщение подтверждает буфер после записи FAILED — только если оно в parking
+            parked = await self.park(message, str(e))
+            self.status_buffer.add(
+                {
+                    "id": task.id,
+                    "status": TaskStatusEnum.FAILED,
+                    "completed_at": datetime.utcnow(),
+                    "error": str(e),
+                },
+                message if parked else None,
+            )
+            if not parked:
+                await message.nack(requeue=True)
+        finally:
+            self.semaphore.release()
+
+    async def batch_loop(self):
+        while True:
+            batch = await self.collect_batch()
+            # Остановка прерывает только сбор пачки: собранная доводится до конца
+            # отдельной задачей, которую stop() дожидается вместе с исполнителями
+            dispatch = asyncio.create_task(self.dispatch_batch(batch))
+            self.active_tasks.add(dispatch)
+            dispatch.add_done_callback(self.active_tasks.discard)
+            await asyncio.shield(dispatch)
+
+    async def start(self):
+        """Подключение к брокеру и потребление очереди до сигнала остановки"""
+        logger.info(
+            f"Starting worker (concurrency={self.concurrency}, adaptive={self.adaptive}, "
+            f"batch_size={self.batch_size}, prefetch={self.prefetch_count})"
+        )
+        if self.owns_queue_service:
+            await self.queue_service.connect()
+
+        await self.queue_service.subscribe_status_events(self.on_status_event)
+        worker_concurrency_limit.set(self.concurrency)
+        if self.controller:
+            self.controller.start()
+
+        dispatcher = None
+        if self.batched:
+            self.status_buffer.start()
+            dispatcher = asyncio.create_task(self.batch_loop())
+        elif self.weighted:
+            dispatcher = asyncio.create_task(self.dispatch_loop())
+
+        self.consumers = await self.queue_service.consume(self.on_message, self.prefetch_count)
+        logger.info(
+            f"Worker is consuming {', '.join(self.queue_service.task_queues)} "
+            f"({settings.broker_backend}, mode={settings.task_queue_mode})"
+        )
+
+        await self.shutdown_event.wait()
+        await self.stop(dispatcher)
+
+    async def stop(self, dispatcher: Optional[asyncio.Task] = None):
+        """Graceful shutdown: дожидаемся активных задач и сбрасываем буфер статусов"""
+        logger.info("Shutting down worker...")
+        if self.consumers is not None:
+            await self.queue_service.cancel(self.consumers)
+            self.consumers = None
+
+        if self.controller:
+            await self.controller.stop()
+
+        if dispatcher:
+            dispatcher.cancel()
+            try:
+                await dispatcher
+            except asyncio.CancelledError:
+                pass
+
+        # Дописываемая пачка может запустить новых исполнителей — ждём, пока набор не опустеет
+        while self.active_tasks:
+            logger.info(f"Waiting for {len(self.active_tasks)} active tasks...")
+            await asyncio.gather(*self.active_tasks, return_exceptions=True)
+
+        if self.status_buffer:
+            await self.status_buffer.stop()
+
+        # Полученные, но не захваченные сообщения возвращаем в очередь
+        while not self.inbox.empty():
+            await self.inbox.get_nowait().nack(requeue=True)
+
+        if self.owns_queue_service:
+            await self.queue_service.disconnect()
+        logger.info("Worker stopped")
+
+
+async def main():
+    worker = TaskWorker()
+
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, worker.shutdown_event.set)
+
+    await worker.start()
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Task worker")
+    parser.add_argument(
+        "--processes", type=int, default=settings.worker_processes,
+        help="Число процессов worker под supervisor (по умолчанию один процесс без supervisor)",
+    )
+    parser.add_argument(
+        "--cpu-affinity", action="store_true", default=settings.worker_cpu_affinity,
+        help="Закрепить каждый процесс за своим CPU",
+    )
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.processes > 1:
+        from app.workers.supervisor import WorkerSupervisor
+
+        setup_logging(log_level=settings.log_level, log_file="supervisor.log")
+        WorkerSupervisor(args.processes, cpu_affinity=args.cpu_affinity).run()
+    else:
+        # Настройка логирования для worker
+        setup_logging(log_level=settings.log_level, log_file="worker.log")
+        if settings.worker_metrics_port:
+            start_metrics_server(settings.worker_metrics_port)
+        asyncio.run(main())
@@ -0,0 +1,57 @@
+import asyncio
+from collections import deque
+
+from app.brokers import BrokerMessage
+from app.services.queue_service import PRIORITY_MAP, message_priority
+
+
+class WeightedInbox:
+    """Полученные из очередей приоритетов сообщения; выдача — smooth weighted round-robin
+
+    Выбор только среди непустых буферов (work-conserving): при весах 6:3:1 и работе
+    во всех очередях из каждых 10 выдач 6 HIGH, 3 MEDIUM и 1 LOW вперемешку, а если
+    работа есть только у LOW — все слоты достаются ей. LOW ждёт не дольше
+    ~sum(weights) выдач, поэтому хвост задержки ограничен для каждого приоритета.
+    Интерфейс — подмножество asyncio.Queue, которое использует TaskWorker.
+    """
+
+    def __init__(self, weights: dict[str, int]):
+        # Веса проверены в Settings: положительные, ровно для HIGH/MEDIUM/LOW
+        self.weights = {priority: weights[priority] for priority in PRIORITY_MAP}
+        self._buffers: dict[str, deque] = {priority: deque() for priority in self.weights}
+        self._current: dict[str, int] = {priority: 0 for priority in self.weights}
+        self._size = 0
+        self._not_empty = asyncio.Event()
+
+    def qsize(self) -> int:
+        return self._size
+
+    def empty(self) -> bool:
+        return self._size == 0
+
+    def put_nowait(self, message: BrokerMessage):
+        self._buffers[message_priority(message)].append(message)
+        self._size += 1
+        self._not_empty.set()
+
+    def next_priority(self) -> str:
+        # Каждый непустой буфер копит свой вес, выбранный отдаёт сумму весов кандидатов
+        candidates = [priority for priority, buffer in self._buffers.items() if buffer]
+        for priority in candidates:
+            self._current[priority] += self.weights[priority]
+        chosen = max(candidates, key=self._current.__getitem__)
+        self._current[chosen] -= sum(self.weights[priority] for priority in candidates)
+        return chosen
+
+    def get_nowait(self) -> BrokerMessage:
+        if not self._size:
+            raise asyncio.QueueEmpty
+        self._size -= 1
+        if not self._size:
+            self._not_empty.clear()
+        return self._buffers[self.next_priority()].popleft()
+
+    async def get(self) -> BrokerMessage:
+        while not self._size:
+            await self._not_empty.wait()
+        return self.get_nowait()
@@ -0,0 +1,82 @@
+"""Нагрузочный прогон API
+
+Примеры:
+    python -m benchmarks --mix create=1,get=4,list=1,status=4 --concurrency 20 --duration 30
+    python -m benchmarks --url http://localhost:8000 --output run.json
+    python -m benchmarks --baseline benchmarks/baseline.json --tolerance 0.15
+"""
+import argparse
+import asyncio
+import json
+import sys
+from pathlib import Path
+
+from benchmarks.runner import LoadRunner, http_client, inprocess_client, parse_mix
+from benchmarks.stats import compare_with_baseline
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="Load test for the task API")
+    parser.add_argument("--mix", default="create=1,get=4,list=1,status=4,cancel=0",
+                        help="Веса операций create/get/list/status/cancel")
+    parser.add_argument("--concurrency", type=int, default=20, help="Число одновременных клиентов")
+    parser.add_argument("--duration", type=float, default=30.0, help="Длительность прогона, секунды")
+    parser.add_argument("--requests", type=int, default=None, help="Ограничение числа запросов")
+    parser.add_argument("--seed-tasks", type=int, default=1000, help="Задач создать до прогона")
+    parser.add_argument("--random-seed", type=int, default=None)
+    parser.add_argument("--url", default=None, help="Запущенный сервер (uvicorn); по умолчанию ASGI в процессе")
+    parser.add_argument("--broker", choices=["mock", "memory", "rabbitmq"], default="mock",
+                        help="Брокер для режима в процессе (memory — с worker в том же процессе)")
+    parser.add_argument("--output", type=Path, default=None, help="Сохранить отчёт в JSON")
+    parser.add_argument("--baseline", type=Path, default=None, help="Baseline JSON для сравнения")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="Допустимое ухудшение p95/p99/rps относительно baseline (доля)")
+    parser.add_argument("--save-baseline", action="store_true",
+                        help="Записать отчёт в --baseline вместо сравнения")
+    return parser.parse_args(argv)
+
+
+def print_report(report: dict):
+    header = f"{'endpoint':<26}{'requests':>10}{'errors':>8}{'rps':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+    print(header)
+    print("-" * len(header))
+    rows = list(report["endpoints"].items()) + [("TOTAL", report["total"])]
+    for name, s in rows:
+        print(f"{name:<26}{s['requests']:>10}{s['errors']:>8}{s['rps']:>10}"
+              f"{s['p50_ms']:>10}{s['p95_ms']:>10}{s['p99_ms']:>10}")
+
+
+async def run(args: argparse.Namespace) -> dict:
+    client_context = http_client(args.url) if args.url else inprocess_client(args.broker)
+    async with client_context as client:
+        runner = LoadRunner(client, parse_mix(args.mix), args.concurrency, seed=args.random_seed)
+        if args.seed_tasks:
+            await runner.seed_tasks(args.seed_tasks)
+        return await runner.run(args.duration, args.requests)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    report = asyncio.run(run(args))
+    print_report(report)
+
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2))
+
+    if args.baseline:
+        if args.save_baseline:
+            args.baseline.write_text(json.dumps(report, indent=2))
+            print(f"Baseline saved to {args.baseline}")
+            return 0
+        regressions = compare_with_baseline(report, json.loads(args.baseline.read_text()), args.tolerance)
+        if regressions:
+            print("\nRegressions against baseline:")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+        print("\nNo regressions against baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
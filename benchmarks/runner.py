@@ -0,0 +1,188 @@
+import asyncio
+import random
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
+
+from httpx import ASGITransport, AsyncClient
+
+from app.brokers import create_broker_backend
+from app.core.config import settings
+from app.services.queue_service import QueueService
+from benchmarks.stats import EndpointStats
+
+API = settings.api_v1_prefix
+
+# Операция смеси -> имя endpoint в отчёте
+ENDPOINTS = {
+    "create": "POST /tasks",
+    "get": "GET /tasks/{id}",
+    "list": "GET /tasks",
+    "status": "GET /tasks/{id}/status",
+    "cancel": "DELETE /tasks/{id}",
+}
+
+
+def parse_mix(spec: str) -> dict[str, int]:
+    """'create=1,get=4,status=4' -> веса операций"""
+    mix = {}
+    for part in spec.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in ENDPOINTS:
+            raise ValueError(f"Unknown operation '{name}', expected one of {', '.join(ENDPOINTS)}")
+        mix[name] = int(weight or 1)
+    if not any(mix.values()):
+        raise ValueError("Mix must contain at least one operation with positive weight")
+    return mix
+
+
+class NullQueueService(QueueService):
+    """Брокер-заглушка (как MockQueueService в тестах): публикации только считаются"""
+
+    def __init__(self):
+        super().__init__()
+        self.published = 0
+
+    async def connect(self):
+        pass
+
+    async def disconnect(self):
+        pass
+
+    async def publish_task(self, task_id: int, priority: str):
+        self.published += 1
+
+    async def publish_tasks(self, tasks: list[tuple[int, str]]):
+        self.published += len(tasks)
+
+    async def publish_status_events(self, events: list[dict]):
+        pass
+
+
+@asynccontextmanager
+async def inprocess_client(broker: str = "mock") -> AsyncIterator[AsyncClient]:
+    """ASGI-приложение в том же процессе: без сети между нагрузкой и API"""
+    from app.main import app
+    from app.services.outbox_relay import OutboxRelay
+    from app.services.task_cache import TaskCache
+    from app.workers.task_worker import TaskWorker
+
+    if broker == "mock":
+        queue_service = NullQueueService()
+    else:
+        queue_service = QueueService(create_broker_backend(broker))
+    await queue_service.connect()
+    relay = OutboxRelay(queue_service)
+    relay.start()
+
+    worker = worker_runner = None
+    if broker == "memory":
+        worker = TaskWorker(queue_service=queue_service)
+        worker_runner = asyncio.create_task(worker.start())
+
+    app.state.queue_service = queue_service
+    app.state.outbox_relay = relay
+    app.state.task_cache = (
+        TaskCache(max_size=settings.task_cache_max_size, ttl=settings.task_cache_ttl)
+        if settings.task_cache_enabled else None
+    )
+    try:
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://bench") as client:
+            yield client
+    finally:
+        if worker:
+            worker.shutdown_event.set()
+            await worker_runner
+        await relay.stop()
+        await queue_service.disconnect()
+
+
+@asynccontextmanager
+async def http_client(url: str) -> AsyncIterator[AsyncClient]:
+    """Клиент к запущенному серверу (uvicorn)"""
+    async with AsyncClient(base_url=url, timeout=30) as client:
+        yield client
+
+
+class LoadRunner:
+    """Замкнутая нагрузка: concurrency клиентов, каждый сразу шлёт следующий запрос"""
+
+    def __init__(self, client: AsyncClient, mix: dict[str, int], concurrency: int, seed: Optional[int] = None):
+        self.client = client
+        self.concurrency = concurrency
+        self.operations = list(mix)
+        self.weights = [mix[name] for name in self.operations]
+        self.random = random.Random(seed)
+        self.task_ids: list[int] = []
+        self.stats = {ENDPOINTS[name]: EndpointStats() for name in self.operations}
+        self._issued = 0
+
+    async def seed_tasks(self, count: int, chunk_size: int = 500):
+        """Предварительное наполнение таблицы для get/status/cancel/list"""
+        while count > 0:
+            size = min(chunk_size, count, settings.task_batch_max_size)
+            payload = [
+                {"title": f"bench seed {i}", "priority": self.random.choice(["LOW", "MEDIUM", "HIGH"])}
+                for i in range(size)
+            ]
+            response = await self.client.post(f"{API}/tasks:batch", json=payload)
+            response.raise_for_status()
+            self.task_ids.extend(item["id"] for item in response.json())
+            count -= size
+
+    def _random_id(self) -> int:
+        return self.random.choice(self.task_ids) if self.task_ids else 1
+
+    async def _call(self, operation: str):
+        if operation == "create":
+            response = await self.client.post(
+                f"{API}/tasks",
+                json={"title": "bench", "priority": self.random.choice(["LOW", "MEDIUM", "HIGH"])},
+            )
+            if response.status_code == 201:
+                self.task_ids.append(response.json()["id"])
+        elif operation == "get":
+            response = await self.client.get(f"{API}/tasks/{self._random_id()}")
+        elif operation == "list":
+            response = await self.client.get(f"{API}/tasks", params={"page_size": 20})
+        elif operation == "status":
+            response = await self.client.get(f"{API}/tasks/{self._random_id()}/status")
+        else:
+            response = await self.client.delete(f"{API}/tasks/{self._random_id()}")
+        # 4xx (например, отмена уже завершённой задачи) — ожидаемый ответ, не ошибка сервиса
+        return response.status_code < 500
+
+    async def _client_loop(self, deadline: float, max_requests: Optional[int]):
+        while time.perf_counter() < deadline:
+            if max_requests is not None:
+                if self._issued >= max_requests:
+                    return
+                self._issued += 1
+            operation = self.random.choices(self.operations, self.weights)[0]
+            started = time.perf_counter()
+            try:
+                ok = await self._call(operation)
+            except Exception:
+                ok = False
+            self.stats[ENDPOINTS[operation]].record(time.perf_counter() - started, ok)
+
+    async def run(self, duration: float, max_requests: Optional[int] = None) -> dict:
+        started = time.perf_counter()
+        deadline = started + duration
+        await asyncio.gather(*(
+            self._client_loop(deadline, max_requests) for _ in range(self.concurrency)
+        ))
+        elapsed = time.perf_counter() - started
+
+        total = EndpointStats()
+        for endpoint_stats in self.stats.values():
+            total.latencies.extend(endpoint_stats.latencies)
+            total.errors += endpoint_stats.errors
+
+        return {
+            "concurrency": self.concurrency,
+            "elapsed_s": round(elapsed, 3),
+            "endpoints": {name: s.summary(elapsed) for name, s in self.stats.items()},
+            "total": total.summary(elapsed),
+        }
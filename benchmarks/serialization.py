@@ -0,0 +1,100 @@
+"""Микробенчмарк сериализации страницы задач
+
+Сравнивает прежний путь (TaskListResponse из ORM-объектов, повторная
+валидация response_model, стандартный json) с быстрым (dict строк БД ->
+orjson / MessagePack).
+
+    python -m benchmarks.serialization --rows 100 --iterations 2000
+"""
+import argparse
+import json
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Callable
+
+from pydantic import TypeAdapter
+
+from app.api.responses import FastJSONResponse, MsgPackResponse
+from app.models.task import Task, TaskPriorityEnum, TaskStatusEnum
+from app.schemas.task import TaskListResponse
+
+_list_adapter = TypeAdapter(TaskListResponse)
+
+
+def make_rows(count: int) -> list[dict]:
+    started = datetime(2025, 1, 1, 12, 0, 0, tzinfo=timezone.utc)
+    return [
+        {
+            "id": i,
+            "title": f"Task {i}",
+            "description": "Benchmark task description",
+            "priority": TaskPriorityEnum.HIGH,
+            "status": TaskStatusEnum.COMPLETED,
+            "created_at": started + timedelta(seconds=i),
+            "run_at": None,
+            "started_at": started + timedelta(seconds=i + 1),
+            "completed_at": started + timedelta(seconds=i + 6),
+            "result": f"Task 'Task {i}' completed successfully",
+            "error": None,
+        }
+        for i in range(count)
+    ]
+
+
+def pydantic_path(tasks: list[Task]) -> bytes:
+    """Как раньше в list_tasks: модель из ORM, валидация response_model, json.dumps"""
+    response = TaskListResponse(items=tasks, total=len(tasks), page=1, page_size=len(tasks))
+    validated = _list_adapter.validate_python(response, from_attributes=True)
+    content = validated.model_dump(mode="json")
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode()
+
+
+def page(rows: list[dict]) -> dict:
+    return {"items": rows, "total": len(rows), "page": 1, "page_size": len(rows), "next_cursor": None}
+
+
+def measure(func: Callable[[], bytes], iterations: int) -> tuple[float, int]:
+    """Среднее время вызова (мкс) и размер результата (байт)"""
+    size = len(func())
+    started = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    return (time.perf_counter() - started) / iterations * 1e6, size
+
+
+def run(rows: int, iterations: int) -> dict[str, dict]:
+    data = make_rows(rows)
+    tasks = [Task(**row) for row in data]
+    json_response = FastJSONResponse(None)
+    msgpack_response = MsgPackResponse(None)
+
+    paths = {
+        "pydantic+json": lambda: pydantic_path(tasks),
+        "rows+orjson": lambda: json_response.render(page(data)),
+        "rows+msgpack": lambda: msgpack_response.render(page(data)),
+    }
+    report = {}
+    for name, func in paths.items():
+        micros, size = measure(func, iterations)
+        report[name] = {"us_per_page": round(micros, 1), "bytes": size}
+
+    baseline = report["pydantic+json"]["us_per_page"]
+    for entry in report.values():
+        entry["speedup"] = round(baseline / entry["us_per_page"], 1)
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.serialization")
+    parser.add_argument("--rows", type=int, default=100, help="Задач на странице")
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args(argv)
+
+    report = run(args.rows, args.iterations)
+    print(f"{'path':<16}{'us/page':>12}{'bytes':>10}{'speedup':>10}")
+    for name, entry in report.items():
+        print(f"{name:<16}{entry['us_per_page']:>12}{entry['bytes']:>10}{entry['speedup']:>9}x")
+
+
+if __name__ == "__main__":
+    main()
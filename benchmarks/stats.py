@@ -0,0 +1,58 @@
+import math
+from dataclasses import dataclass, field
+
+
+def percentile(sorted_values: list[float], q: float) -> float:
+    """Перцентиль методом nearest-rank по отсортированному списку"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(q / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+@dataclass
+class EndpointStats:
+    """Накопленные замеры по одному endpoint"""
+
+    latencies: list[float] = field(default_factory=list)
+    errors: int = 0
+
+    def record(self, latency: float, ok: bool):
+        self.latencies.append(latency)
+        if not ok:
+            self.errors += 1
+
+    def summary(self, elapsed: float) -> dict:
+        values = sorted(self.latencies)
+        count = len(values)
+        return {
+            "requests": count,
+            "errors": self.errors,
+            "rps": round(count / elapsed, 2) if elapsed > 0 else 0.0,
+            "mean_ms": round(sum(values) / count * 1000, 3) if count else 0.0,
+            "p50_ms": round(percentile(values, 50) * 1000, 3),
+            "p95_ms": round(percentile(values, 95) * 1000, 3),
+            "p99_ms": round(percentile(values, 99) * 1000, 3),
+        }
+
+
+def compare_with_baseline(report: dict, baseline: dict, tolerance: float) -> list[str]:
+    """Список регрессий относительно baseline (пустой — регрессий нет)
+
+    Регрессия: p95/p99 выросли или rps упал больше, чем на tolerance (доля).
+    """
+    regressions = []
+    for endpoint, base in baseline.get("endpoints", {}).items():
+        current = report["endpoints"].get(endpoint)
+        if current is None or not current["requests"]:
+            continue
+        for metric in ("p95_ms", "p99_ms"):
+            limit = base[metric] * (1 + tolerance)
+            if base[metric] and current[metric] > limit:
+                regressions.append(
+                    f"{endpoint}: {metric} {current[metric]} > {limit:.3f} (baseline {base[metric]})"
+                )
+        limit = base["rps"] * (1 - tolerance)
+        if current["rps"] < limit:
+            regressions.append(f"{endpoint}: rps {current['rps']} < {limit:.2f} (baseline {base['rps']})")
+    return regressions
@@ -0,0 +1,107 @@
+import os
+import subprocess
+import sys
+
+import pytest
+from fastapi import FastAPI
+from httpx import ASGITransport, AsyncClient
+from prometheus_client import REGISTRY
+from sqlalchemy import text
+
+from app.core.instrumentation import RequestMetricsMiddleware, instrument_engine, record_publish
+from app.server import prepare_multiproc_dir
+
+RECORD = """
+import os
+from app.core.metrics import active_tasks_gauge, tasks_created_total
+tasks_created_total.labels(priority="HIGH").inc(2)
+active_tasks_gauge.inc()
+print(os.getpid())
+"""
+
+RENDER = """
+import sys
+from app.core.metrics import mark_process_dead, render_metrics
+mark_process_dead(int(sys.argv[1]))
+print(render_metrics().decode())
+"""
+
+
+def run_python(code: str, multiproc_dir, *args) -> str:
+    env = {**os.environ, "PROMETHEUS_MULTIPROC_DIR": str(multiproc_dir)}
+    return subprocess.run(
+        [sys.executable, "-c", code, *args], env=env, check=True, capture_output=True, text=True
+    ).stdout.strip()
+
+
+class TestMultiprocessMetrics:
+    """Тесты агрегации метрик нескольких процессов API"""
+
+    def test_metrics_aggregated_across_processes(self, tmp_path):
+        """Тест, что /metrics суммирует счётчики всех процессов и забывает gauge завершённых"""
+        first_pid = run_python(RECORD, tmp_path)
+        run_python(RECORD, tmp_path)
+
+        output = run_python(RENDER, tmp_path, first_pid)
+
+        assert 'tasks_created_total{priority="HIGH"} 4.0' in output
+        # livesum: завершившийся процесс больше не учитывается
+        assert "active_tasks 1.0" in output
+
+    def test_prepare_multiproc_dir_removes_stale_files(self, tmp_path):
+        """Тест очистки файлов метрик прошлого запуска"""
+        directory = tmp_path / "metrics"
+        directory.mkdir()
+        (directory / "counter_123.db").write_bytes(b"stale")
+
+        assert prepare_multiproc_dir(str(directory)) == str(directory)
+        assert list(directory.iterdir()) == []
+
+
+def sample(name: str, route: str, method: str = "GET") -> float:
+    return REGISTRY.get_sample_value(name, {"method": method, "route": route}) or 0.0
+
+
+@pytest.mark.asyncio
+class TestRequestMetrics:
+    """Тесты метрик HTTP-запросов по маршрутам"""
+
+    async def test_db_queries_and_server_timing(self, async_engine, async_session):
+        """Тест подсчёта SQL и публикаций запроса и заголовка Server-Timing"""
+        instrument_engine(async_engine)
+        app = FastAPI()
+        app.add_middleware(RequestMetricsMiddleware, server_timing=True)
+
+        @app.get("/items/{item_id}")
+        async def read_item(item_id: int):
+            for _ in range(3):
+                await async_session.execute(text("SELECT 1"))
+            record_publish(0.002)
+            return {"id": item_id}
+
+        before = sample("http_request_db_queries_sum", "/items/{item_id}")
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+            response = await client.get("/items/5")
+
+        assert response.status_code == 200
+        timing = response.headers["server-timing"]
+        assert 'desc="3 queries"' in timing
+        assert "publish;dur=2.0" in timing
+        # Метка — шаблон маршрута, а не конкретный путь
+        assert sample("http_request_db_queries_sum", "/items/{item_id}") == before + 3
+        assert sample("http_request_publish_seconds_count", "/items/{item_id}") == 1
+
+    async def test_api_routes_labelled_by_template(self, client, async_engine):
+        """Тест метрик реального API: латентность и SQL по шаблону маршрута"""
+        instrument_engine(async_engine)
+        route = "/api/v1/tasks/{task_id}"
+        before = sample("http_request_duration_seconds_count", route, "DELETE")
+        queries_before = sample("http_request_db_queries_sum", route, "DELETE")
+
+        created = await client.post("/api/v1/tasks", json={"title": "metrics"})
+        await client.delete(f"/api/v1/tasks/{created.json()['id']}")
+        await client.get("/api/v1/unknown")
+
+        assert sample("http_request_duration_seconds_count", route, "DELETE") == before + 1
+        assert sample("http_request_db_queries_sum", route, "DELETE") > queries_before
+        assert sample("http_request_duration_seconds_count", "<unmatched>") >= 1
@@ -1,5 +1,17 @@
+import asyncio
+import json
+from datetime import datetime, timedelta, timezone
+
+import msgpack
 import pytest
 from httpx import AsyncClient
+from sqlalchemy import event, update
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.core.deps import get_db, get_task_service
+from app.main import app
+from app.models.task import Task, TaskStatusEnum
+from app.services.task_events import build_status_event
 
 
 @pytest.mark.asyncio
@@ -57,6 +69,38 @@ class TestTasksAPI:
         )
         assert response.status_code == 422
 
+    async def test_create_task_idempotency_key(self, client: AsyncClient, sample_task_data, outbox_relay, mock_queue_service):
+        """Повтор с тем же Idempotency-Key возвращает исходную задачу и не публикует её снова"""
+        headers = {"Idempotency-Key": "order-42"}
+        first = await client.post("/api/v1/tasks", json=sample_task_data, headers=headers)
+        retry = await client.post("/api/v1/tasks", json=sample_task_data, headers=headers)
+        other = await client.post("/api/v1/tasks", json=sample_task_data, headers={"Idempotency-Key": "order-43"})
+
+        assert first.status_code == retry.status_code == 201
+        assert "Idempotent-Replayed" not in first.headers
+        assert retry.headers["Idempotent-Replayed"] == "true"
+        assert retry.json() == first.json()
+        assert other.json()["id"] != first.json()["id"]
+
+        await outbox_relay.relay_once()
+        assert sorted(t["task_id"] for t in mock_queue_service.published_tasks) == [
+            first.json()["id"], other.json()["id"],
+        ]
+
+        response = await client.post("/api/v1/tasks", json=sample_task_data, headers={"Idempotency-Key": "x" * 256})
+        assert response.status_code == 422
+
+    async def test_idempotency_key_reused_with_other_body(self, client: AsyncClient, sample_task_data):
+        """Тот же Idempotency-Key с другим телом — 422, а не исходная задача"""
+        headers = {"Idempotency-Key": "order-44"}
+        first = await client.post("/api/v1/tasks", json=sample_task_data, headers=headers)
+        assert first.status_code == 201
+
+        changed = {**sample_task_data, "title": "Another task"}
+        response = await client.post("/api/v1/tasks", json=changed, headers=headers)
+        assert response.status_code == 422
+        assert "different request body" in response.json()["detail"]
+
     async def test_get_task(self, client: AsyncClient, sample_task_data):
         """Тест получения задачи по ID"""
         # Создаем задачу
@@ -117,6 +161,57 @@ class TestTasksAPI:
         assert len(data["items"]) == 3
         assert data["total"] == 3
 
+    async def test_list_tasks_msgpack(self, client: AsyncClient):
+        """Тест MessagePack-ответа списка по заголовку Accept"""
+        await client.post("/api/v1/tasks", json={"title": "Packed", "priority": "HIGH"})
+        as_json = (await client.get("/api/v1/tasks")).json()
+
+        response = await client.get("/api/v1/tasks", headers={"Accept": "application/msgpack"})
+
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/msgpack"
+        assert msgpack.unpackb(response.content) == as_json
+        assert as_json["items"][0]["created_at"].endswith("Z")
+
+    async def test_list_tasks_sparse_fields(self, client: AsyncClient):
+        """Тест fields=: только запрошенные поля и рабочий курсор"""
+        for i in range(3):
+            await client.post("/api/v1/tasks", json={"title": f"Task {i}", "description": "x" * 1000})
+
+        response = await client.get("/api/v1/tasks?fields=status,priority&page_size=2")
+
+        assert response.status_code == 200
+        data = response.json()
+        assert [set(item) for item in data["items"]] == [{"id", "status", "priority"}] * 2
+        assert data["next_cursor"]
+
+        next_page = await client.get(f"/api/v1/tasks?fields=status&page_size=2&cursor={data['next_cursor']}")
+        assert [set(item) for item in next_page.json()["items"]] == [{"id", "status"}]
+
+        response = await client.get("/api/v1/tasks?fields=status,secret")
+        assert response.status_code == 400
+
+    async def test_get_task_sparse_fields(self, client: AsyncClient, async_session):
+        """Тест fields= для одной задачи: проекция колонок в SELECT"""
+        created = await client.post("/api/v1/tasks", json={"title": "Sparse", "description": "long"})
+        task_id = created.json()["id"]
+
+        statements = []
+        engine = async_session.bind.sync_engine
+        listener = lambda conn, cursor, statement, *args: statements.append(statement)
+        event.listen(engine, "before_cursor_execute", listener)
+        try:
+            response = await client.get(f"/api/v1/tasks/{task_id}?fields=status,title")
+        finally:
+            event.remove(engine, "before_cursor_execute", listener)
+
+        assert response.status_code == 200
+        assert response.json() == {"id": task_id, "status": "PENDING", "title": "Sparse"}
+        assert statements and all("description" not in statement for statement in statements)
+
+        response = await client.get("/api/v1/tasks/999999?fields=status")
+        assert response.status_code == 404
+
     async def test_list_tasks_with_pagination(self, client: AsyncClient):
         """Тест пагинации списка задач"""
         # Создание 5 задач
@@ -180,19 +275,280 @@ class TestTasksAPI:
         get_response = await client.get(f"/api/v1/tasks/{task_id}")
         assert get_response.json()["status"] == "CANCELLED"
 
+    async def test_create_scheduled_task(self, client: AsyncClient, sample_task_data):
+        """Задача с run_at в будущем ждёт в статусе SCHEDULED и может быть отменена"""
+        run_at = (datetime.now(timezone.utc) + timedelta(hours=1)).isoformat()
+        response = await client.post("/api/v1/tasks", json={**sample_task_data, "run_at": run_at})
+        assert response.status_code == 201
+        data = response.json()
+        assert data["status"] == "SCHEDULED"
+        assert datetime.fromisoformat(data["run_at"]) == datetime.fromisoformat(run_at)
+
+        response = await client.delete(f"/api/v1/tasks/{data['id']}")
+        assert response.status_code == 204
+
     async def test_cancel_task_not_found(self, client: AsyncClient):
         """Тест отмены несуществующей задачи"""
         response = await client.delete("/api/v1/tasks/99999")
         assert response.status_code == 404
 
-    async def test_task_published_to_queue(self, client: AsyncClient, mock_queue_service, sample_task_data):
-        """Тест, что задача публикуется в очередь"""
+    async def test_task_published_to_queue(
+            self, client: AsyncClient, mock_queue_service, outbox_relay, sample_task_data
+    ):
+        """Тест, что задача публикуется в очередь через outbox"""
         # Создаем задачу
         response = await client.post("/api/v1/tasks", json=sample_task_data)
         task_id = response.json()["id"]
 
+        # POST не ходит в брокер — сообщение ждёт в outbox
+        assert mock_queue_service.published_tasks == []
+        assert await outbox_relay.relay_once() == 1
+        assert await outbox_relay.relay_once() == 0
+
         # Проверяем что задача была опубликована
         assert len(mock_queue_service.published_tasks) == 1
         published = mock_queue_service.published_tasks[0]
         assert published["task_id"] == task_id
         assert published["priority"] == "HIGH"
+
+    async def test_list_tasks_cursor_pagination(self, client: AsyncClient):
+        """Тест keyset пагинации через next_cursor"""
+        for i in range(5):
+            await client.post("/api/v1/tasks", json={"title": f"Task {i}", "priority": "MEDIUM"})
+
+        response = await client.get("/api/v1/tasks?page_size=2")
+        data = response.json()
+        assert data["next_cursor"] is not None
+
+        seen = [item["id"] for item in data["items"]]
+        cursor = data["next_cursor"]
+        while cursor:
+            response = await client.get(
+                "/api/v1/tasks",
+                params={"page_size": 2, "cursor": cursor, "include_total": "false"},
+            )
+            assert response.status_code == 200
+            data = response.json()
+            assert data["total"] is None
+            seen.extend(item["id"] for item in data["items"])
+            cursor = data["next_cursor"]
+
+        # Все задачи получены ровно один раз, от новых к старым
+        assert len(seen) == 5
+        assert seen == sorted(seen, reverse=True)
+
+    async def test_list_tasks_invalid_cursor(self, client: AsyncClient):
+        """Тест некорректного курсора"""
+        response = await client.get("/api/v1/tasks?cursor=not-a-cursor")
+        assert response.status_code == 400
+
+    async def test_create_tasks_batch(self, client: AsyncClient, mock_queue_service, outbox_relay):
+        """Тест пакетного создания задач"""
+        payload = [
+            {"title": "Batch 1", "priority": "HIGH"},
+            {"title": "Batch 2", "description": "second", "priority": "LOW"},
+            {"title": "Batch 3"},
+        ]
+        response = await client.post("/api/v1/tasks:batch", json=payload)
+
+        assert response.status_code == 201
+        data = response.json()
+        assert [item["title"] for item in data] == ["Batch 1", "Batch 2", "Batch 3"]
+        assert all(item["status"] == "PENDING" for item in data)
+        assert data[2]["priority"] == "MEDIUM"
+
+        # Все задачи опубликованы в порядке вставки
+        assert await outbox_relay.relay_once() == 3
+        published = [(p["task_id"], p["priority"]) for p in mock_queue_service.published_tasks]
+        assert published == [(item["id"], item["priority"]) for item in data]
+
+    async def test_create_tasks_batch_validation_error(self, client: AsyncClient):
+        """Тест валидации пакетного создания"""
+        response = await client.post("/api/v1/tasks:batch", json=[])
+        assert response.status_code == 422
+
+        response = await client.post("/api/v1/tasks:batch", json=[{"title": ""}])
+        assert response.status_code == 422
+
+    async def test_get_task_status_long_poll(self, client: AsyncClient, event_hub, sample_task_data):
+        """Тест long-poll ожидания смены статуса"""
+        create_response = await client.post("/api/v1/tasks", json=sample_task_data)
+        task_id = create_response.json()["id"]
+
+        async def complete_when_subscribed():
+            while not event_hub.subscriber_count(task_id):
+                await asyncio.sleep(0.005)
+            event_hub.publish(build_status_event(task_id, "COMPLETED", completed_at=datetime.utcnow()))
+
+        notifier = asyncio.create_task(complete_when_subscribed())
+        response = await client.get(f"/api/v1/tasks/{task_id}/status?wait=5s")
+        await notifier
+
+        assert response.status_code == 200
+        data = response.json()
+        assert data["status"] == "COMPLETED"
+        assert data["completed_at"] is not None
+        assert event_hub.subscriber_count(task_id) == 0
+
+    async def test_get_task_status_long_poll_timeout(self, client: AsyncClient, sample_task_data):
+        """Тест long-poll без смены статуса"""
+        create_response = await client.post("/api/v1/tasks", json=sample_task_data)
+        task_id = create_response.json()["id"]
+
+        response = await client.get(f"/api/v1/tasks/{task_id}/status?wait=50ms")
+        assert response.status_code == 200
+        assert response.json()["status"] == "PENDING"
+
+        response = await client.get(f"/api/v1/tasks/{task_id}/status?wait=soon")
+        assert response.status_code == 400
+
+    async def test_task_events_stream(self, client: AsyncClient, event_hub, sample_task_data):
+        """Тест SSE потока переходов статуса"""
+        create_response = await client.post("/api/v1/tasks", json=sample_task_data)
+        task_id = create_response.json()["id"]
+
+        async def run_task_when_subscribed():
+            while not event_hub.subscriber_count(task_id):
+                await asyncio.sleep(0.005)
+            event_hub.publish(build_status_event(task_id, "IN_PROGRESS", started_at=datetime.utcnow()))
+            event_hub.publish(build_status_event(task_id, "COMPLETED", completed_at=datetime.utcnow()))
+
+        notifier = asyncio.create_task(run_task_when_subscribed())
+        response = await client.get(f"/api/v1/tasks/{task_id}/events")
+        await notifier
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/event-stream")
+        statuses = [
+            json.loads(line[len("data: "):])["status"]
+            for line in response.text.splitlines()
+            if line.startswith("data: ")
+        ]
+        assert statuses == ["PENDING", "IN_PROGRESS", "COMPLETED"]
+
+    @pytest.mark.parametrize("path", ["status?wait=5s", "events"])
+    async def test_waiting_request_releases_db_connection(
+            self, client: AsyncClient, async_engine, event_hub, sample_task_data, path,
+    ):
+        """Тест, что long-poll и SSE ждут событий без соединения из пула"""
+        create_response = await client.post("/api/v1/tasks", json=sample_task_data)
+        task_id = create_response.json()["id"]
+
+        pooled_engine = create_async_engine(async_engine.url, pool_size=1, max_overflow=0)
+        pooled_sessions = async_sessionmaker(pooled_engine, expire_on_commit=False)
+
+        async def pooled_db():
+            async with pooled_sessions() as session:
+                yield session
+
+        app.dependency_overrides[get_db] = pooled_db
+        request = asyncio.create_task(client.get(f"/api/v1/tasks/{task_id}/{path}"))
+        try:
+            deadline = asyncio.get_running_loop().time() + 2
+            while not event_hub.subscriber_count(task_id) or pooled_engine.pool.checkedout():
+                assert asyncio.get_running_loop().time() < deadline, "connection held while waiting"
+                await asyncio.sleep(0.01)
+            assert not request.done()
+
+            event_hub.publish(build_status_event(task_id, "COMPLETED", completed_at=datetime.utcnow()))
+            response = await request
+            assert response.status_code == 200
+            assert event_hub.subscriber_count(task_id) == 0
+        finally:
+            request.cancel()
+            await pooled_engine.dispose()
+
+    async def test_task_events_read_error_unsubscribes(self, client: AsyncClient, event_hub):
+        """Тест, что ошибка чтения задачи не оставляет подписку SSE"""
+
+        class FailingService:
+            async def get_task(self, db, task_id):
+                raise RuntimeError("db is down")
+
+        app.dependency_overrides[get_task_service] = lambda: FailingService()
+        with pytest.raises(RuntimeError):
+            await client.get("/api/v1/tasks/1/events")
+        assert event_hub.subscriber_count(1) == 0
+
+    async def test_task_events_not_found(self, client: AsyncClient):
+        """Тест SSE для несуществующей задачи"""
+        response = await client.get("/api/v1/tasks/99999/events")
+        assert response.status_code == 404
+
+    async def test_task_stats(self, client: AsyncClient, async_session, sample_task_data):
+        """Статистика из счётчиков и поминутных гистограмм"""
+        ids = []
+        for _ in range(3):
+            response = await client.post("/api/v1/tasks", json=sample_task_data)
+            ids.append(response.json()["id"])
+
+        now = datetime.now(timezone.utc)
+        done, failed = ids[0], ids[1]
+        await async_session.execute(
+            update(Task).where(Task.id.in_([done, failed])).values(created_at=now - timedelta(seconds=3))
+        )
+        await async_session.execute(
+            update(Task).where(Task.id.in_([done, failed]))
+            .values(status=TaskStatusEnum.IN_PROGRESS, started_at=now - timedelta(seconds=1))
+        )
+        await async_session.execute(
+            update(Task).where(Task.id == done).values(status=TaskStatusEnum.COMPLETED, completed_at=now)
+        )
+        await async_session.execute(
+            update(Task).where(Task.id == failed)
+            .values(status=TaskStatusEnum.FAILED, completed_at=now + timedelta(milliseconds=200))
+        )
+        await async_session.commit()
+
+        response = await client.get("/api/v1/tasks/stats", params={"window_minutes": 5})
+        assert response.status_code == 200
+        data = response.json()
+
+        assert data["by_status"]["PENDING"] == 1
+        assert data["by_status"]["COMPLETED"] == 1
+        assert data["by_status"]["FAILED"] == 1
+        assert data["by_status"]["NEW"] == 0
+        assert data["by_priority"][sample_task_data["priority"]] == 3
+        assert data["completions_per_minute"] == 0.2
+        assert sum(point["completed"] for point in data["throughput"]) == 1
+        assert sum(point["failed"] for point in data["throughput"]) == 1
+
+        assert data["queue_wait"]["count"] == 2
+        assert data["queue_wait"]["p50_ms"] == pytest.approx(2000, rel=0.05)
+        assert data["processing"]["count"] == 2
+        assert data["processing"]["p50_ms"] == pytest.approx(1000, rel=0.05)
+        assert data["processing"]["p99_ms"] == pytest.approx(1200, rel=0.05)
+
+    async def test_task_stats_past_run_at_not_counted_as_wait(self, client: AsyncClient, async_session):
+        """run_at в прошлом (задача сразу PENDING) не удлиняет ожидание в очереди"""
+        now = datetime.now(timezone.utc)
+        response = await client.post(
+            "/api/v1/tasks", json={"title": "Late", "run_at": (now - timedelta(days=1)).isoformat()}
+        )
+        assert response.json()["status"] == "PENDING"
+        task_id = response.json()["id"]
+
+        await async_session.execute(
+            update(Task).where(Task.id == task_id).values(created_at=now - timedelta(seconds=2))
+        )
+        await async_session.execute(
+            update(Task).where(Task.id == task_id)
+            .values(status=TaskStatusEnum.IN_PROGRESS, started_at=now - timedelta(seconds=1))
+        )
+        await async_session.commit()
+
+        data = (await client.get("/api/v1/tasks/stats", params={"window_minutes": 5})).json()
+        assert data["queue_wait"]["count"] == 1
+        assert data["queue_wait"]["p50_ms"] == pytest.approx(1000, rel=0.05)
+
+    async def test_task_stats_empty_and_validation(self, client: AsyncClient):
+        """Пустая статистика и ограничение окна"""
+        response = await client.get("/api/v1/tasks/stats")
+        assert response.status_code == 200
+        data = response.json()
+        assert data["window_minutes"] == 60
+        assert data["queue_wait"] == {"count": 0, "p50_ms": None, "p95_ms": None, "p99_ms": None}
+        assert data["throughput"] == []
+
+        response = await client.get("/api/v1/tasks/stats", params={"window_minutes": 0})
+        assert response.status_code == 422
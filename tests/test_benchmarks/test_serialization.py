@@ -0,0 +1,26 @@
+import json
+
+import msgpack
+
+from app.api.responses import FastJSONResponse, MsgPackResponse
+from app.models.task import Task
+from benchmarks.serialization import make_rows, page, pydantic_path, run
+
+
+class TestSerializationBenchmark:
+    """Тесты микробенчмарка сериализации"""
+
+    def test_fast_path_matches_pydantic_output(self):
+        """Тест, что быстрый путь выдаёт тот же JSON, что и TaskListResponse"""
+        rows = make_rows(5)
+        expected = json.loads(pydantic_path([Task(**row) for row in rows]))
+        expected["next_cursor"] = None
+
+        assert json.loads(FastJSONResponse(None).render(page(rows))) == expected
+        assert msgpack.unpackb(MsgPackResponse(None).render(page(rows))) == expected
+
+    def test_run_report(self):
+        """Тест структуры отчёта"""
+        report = run(rows=3, iterations=2)
+        assert set(report) == {"pydantic+json", "rows+orjson", "rows+msgpack"}
+        assert report["pydantic+json"]["speedup"] == 1.0
@@ -0,0 +1,48 @@
+import pytest
+
+from benchmarks.runner import parse_mix
+from benchmarks.stats import EndpointStats, compare_with_baseline, percentile
+
+
+class TestBenchmarkStats:
+    """Тесты расчёта статистики нагрузочного прогона"""
+
+    def test_percentile_nearest_rank(self):
+        """Тест перцентилей nearest-rank"""
+        values = [float(i) for i in range(1, 101)]
+        assert percentile(values, 50) == 50.0
+        assert percentile(values, 95) == 95.0
+        assert percentile(values, 99) == 99.0
+        assert percentile([], 99) == 0.0
+
+    def test_summary(self):
+        """Тест сводки по endpoint"""
+        stats = EndpointStats()
+        for latency in (0.010, 0.020, 0.030, 0.040):
+            stats.record(latency, ok=True)
+        stats.record(0.5, ok=False)
+
+        summary = stats.summary(elapsed=1.0)
+
+        assert summary["requests"] == 5
+        assert summary["errors"] == 1
+        assert summary["rps"] == 5.0
+        assert summary["p50_ms"] == 30.0
+        assert summary["p99_ms"] == 500.0
+
+    def test_compare_with_baseline(self):
+        """Тест обнаружения регрессий относительно baseline"""
+        baseline = {"endpoints": {"GET /tasks": {"p95_ms": 10.0, "p99_ms": 20.0, "rps": 100.0}}}
+        ok = {"endpoints": {"GET /tasks": {"requests": 10, "p95_ms": 11.0, "p99_ms": 21.0, "rps": 95.0}}}
+        slow = {"endpoints": {"GET /tasks": {"requests": 10, "p95_ms": 15.0, "p99_ms": 20.0, "rps": 70.0}}}
+
+        assert compare_with_baseline(ok, baseline, tolerance=0.2) == []
+        regressions = compare_with_baseline(slow, baseline, tolerance=0.2)
+        assert len(regressions) == 2
+        assert regressions[0].startswith("GET /tasks: p95_ms")
+
+    def test_parse_mix(self):
+        """Тест разбора смеси операций"""
+        assert parse_mix("create=1,get=4,status") == {"create": 1, "get": 4, "status": 1}
+        with pytest.raises(ValueError):
+            parse_mix("create=1,upload=2")
@@ -0,0 +1,110 @@
+import asyncio
+
+import pytest
+
+from app.brokers import InMemoryBroker, OutgoingMessage
+
+
+async def wait_for(predicate, timeout: float = 1.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not predicate():
+        assert asyncio.get_running_loop().time() < deadline, "timeout"
+        await asyncio.sleep(0.001)
+
+
+@pytest.mark.asyncio
+class TestInMemoryBroker:
+    """Тесты для in-process брокера"""
+
+    async def test_priority_order(self):
+        """Тест, что HIGH уходит раньше LOW, а внутри приоритета сохраняется FIFO"""
+        broker = InMemoryBroker()
+        await broker.declare_queue("tasks")
+        await broker.publish("tasks", [
+            OutgoingMessage(body=b"low", priority=1),
+            OutgoingMessage(body=b"high-1", priority=10),
+            OutgoingMessage(body=b"medium", priority=5),
+            OutgoingMessage(body=b"high-2", priority=10),
+        ])
+
+        received = []
+
+        async def handler(message):
+            received.append(message.body)
+            await message.ack()
+
+        consumer = await broker.consume("tasks", handler, prefetch=1)
+        await wait_for(lambda: len(received) == 4)
+        await broker.cancel(consumer)
+
+        assert received == [b"high-1", b"high-2", b"medium", b"low"]
+
+    async def test_prefetch_limits_unacked(self):
+        """Тест, что потребитель не получает больше prefetch неподтверждённых сообщений"""
+        broker = InMemoryBroker()
+        await broker.publish("tasks", [OutgoingMessage(body=b"%d" % i) for i in range(5)])
+
+        pending = []
+
+        async def handler(message):
+            pending.append(message)
+
+        consumer = await broker.consume("tasks", handler, prefetch=2)
+        await wait_for(lambda: len(pending) == 2)
+        await asyncio.sleep(0.01)
+        assert len(pending) == 2
+
+        await pending[0].ack()
+        await wait_for(lambda: len(pending) == 3)
+
+        # Увеличение prefetch сразу выдаёт ещё сообщения
+        await broker.set_prefetch(4)
+        await wait_for(lambda: len(pending) == 5)
+        await broker.cancel(consumer)
+
+    async def test_nack_requeues(self):
+        """Тест повторной доставки после nack(requeue=True) и отбрасывания после reject"""
+        broker = InMemoryBroker()
+        await broker.publish("tasks", [OutgoingMessage(body=b"a"), OutgoingMessage(body=b"b")])
+
+        deliveries = []
+
+        async def handler(message):
+            deliveries.append(message.body)
+            if message.body == b"a" and deliveries.count(b"a") == 1:
+                await message.nack(requeue=True)
+            else:
+                await message.reject(requeue=False)
+
+        consumer = await broker.consume("tasks", handler, prefetch=1)
+        await wait_for(lambda: len(deliveries) == 3)
+        await broker.cancel(consumer)
+
+        assert deliveries == [b"a", b"b", b"a"]
+        assert broker.queues["tasks"].qsize() == 0
+
+    async def test_events_fanout(self):
+        """Тест рассылки событий всем подписчикам процесса"""
+        broker = InMemoryBroker()
+        first, second = [], []
+        await broker.subscribe_events(first.append)
+        await broker.subscribe_events(second.append)
+
+        await broker.publish_events([b'{"task_id": 1, "status": "COMPLETED"}'])
+        await wait_for(lambda: first and second)
+
+        assert first == second == [{"task_id": 1, "status": "COMPLETED"}]
+
+    async def test_delay_queue_dead_letters_to_target(self):
+        """Тест, что сообщение очереди задержки через TTL попадает в целевую очередь с заголовками"""
+        broker = InMemoryBroker()
+        await broker.declare_queue("tasks")
+        await broker.declare_delay_queue("tasks.retry.20", ttl_ms=20, target="tasks")
+        await broker.publish("tasks.retry.20", [OutgoingMessage(body=b"a", priority=5, headers={"x-retry-count": 1})])
+        assert broker.queues["tasks.retry.20"].qsize() == 1
+        assert broker.queues["tasks"].qsize() == 0
+
+        await wait_for(lambda: broker.queues["tasks"].qsize() == 1)
+        assert broker.queues["tasks.retry.20"].qsize() == 0
+        message = await broker.queues["tasks"].get()
+        assert (message.body, message.priority, message.headers) == (b"a", 5, {"x-retry-count": 1})
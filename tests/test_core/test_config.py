@@ -0,0 +1,38 @@
+import pytest
+from pydantic import ValidationError
+
+from app.core.config import Settings
+
+
+class TestSettings:
+    """Тесты проверки настроек"""
+
+    def test_task_queue_mode_validated(self, monkeypatch):
+        """Опечатка в TASK_QUEUE_MODE — ошибка запуска, а не молчаливый режим priority"""
+        monkeypatch.setenv("TASK_QUEUE_MODE", "weigthed")
+        with pytest.raises(ValidationError):
+            Settings()
+
+        monkeypatch.setenv("TASK_QUEUE_MODE", "weighted")
+        assert Settings().task_queue_mode == "weighted"
+
+    def test_broker_backend_validated(self, monkeypatch):
+        """Неизвестный BROKER_BACKEND — ошибка загрузки настроек, а не подключения"""
+        monkeypatch.setenv("BROKER_BACKEND", "rabbit")
+        with pytest.raises(ValidationError):
+            Settings()
+
+        monkeypatch.setenv("BROKER_BACKEND", "memory")
+        assert Settings().broker_backend == "memory"
+
+    @pytest.mark.parametrize("weights", [
+        '{"HIGH": 6, "MEDIUM": 3}',
+        '{"HIGH": 6, "MEDIUM": 3, "LOW": 1, "URGENT": 9}',
+        '{"HIGH": 6, "MEDIUM": 3, "LOW": 0}',
+        '{"high": 6, "medium": 3, "low": 1}',
+    ])
+    def test_task_queue_weights_validated(self, monkeypatch, weights):
+        """Веса очередей — положительные и ровно для HIGH, MEDIUM и LOW"""
+        monkeypatch.setenv("TASK_QUEUE_WEIGHTS", weights)
+        with pytest.raises(ValidationError):
+            Settings()
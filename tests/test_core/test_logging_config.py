@@ -0,0 +1,109 @@
+import json
+import logging
+import logging.handlers
+import queue
+import time
+
+from app.core import logging_config
+from app.core.config import settings
+from app.core.logging_config import (
+    NonBlockingQueueHandler, SamplingFilter, process_log_name, setup_logging, shutdown_logging,
+)
+
+
+class SlowHandler(logging.Handler):
+    """Обработчик с медленным «диском»"""
+
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        time.sleep(0.05)
+        self.records.append(record)
+
+
+def make_record(level=logging.INFO, msg="Published task %s", lineno=10):
+    return logging.makeLogRecord(
+        {"name": "app.test", "levelno": level, "levelname": logging.getLevelName(level),
+         "msg": msg, "args": (1,), "lineno": lineno}
+    )
+
+
+class TestLoggingConfig:
+    """Тесты конвейера логирования"""
+
+    def test_emit_does_not_block_on_slow_handler(self):
+        """Тест, что запись лога не ждёт медленный обработчик"""
+        slow = SlowHandler()
+        log_queue = queue.SimpleQueue()
+        listener = logging.handlers.QueueListener(log_queue, slow)
+        listener.start()
+        logger = logging.getLogger("app.test.nonblocking")
+        logger.propagate = False
+        logger.addHandler(NonBlockingQueueHandler(log_queue))
+
+        started = time.perf_counter()
+        for i in range(10):
+            logger.warning("message %s", i)
+        elapsed = time.perf_counter() - started
+        listener.stop()
+
+        assert elapsed < 0.05
+        assert [record.getMessage() for record in slow.records] == [f"message {i}" for i in range(10)]
+
+    def test_sampling_filter(self, monkeypatch):
+        """Тест ограничения частоты INFO с одного места вызова"""
+        now = [100.0]
+        monkeypatch.setattr(logging_config.time, "monotonic", lambda: now[0])
+        sampler = SamplingFilter(rate=3)
+
+        assert [sampler.filter(make_record()) for _ in range(5)] == [True, True, True, False, False]
+        # Другое место вызова и WARNING не ограничиваются
+        assert sampler.filter(make_record(lineno=11))
+        assert sampler.filter(make_record(level=logging.WARNING))
+
+        now[0] = 101.0
+        record = make_record()
+        assert sampler.filter(record)
+        assert record.getMessage() == "Published task 1 (2 similar messages suppressed)"
+
+    def test_json_rotating_files(self, tmp_path, monkeypatch):
+        """Тест JSON-формата, ротации по размеру и отдельного файла ошибок"""
+        monkeypatch.chdir(tmp_path)
+        setup_logging(log_file="test.log", json_format=True, max_bytes=2000, backup_count=2, sample_rate=0)
+        logger = logging.getLogger("app.test.json")
+        try:
+            for i in range(50):
+                logger.info("line %s", i)
+            try:
+                raise ValueError("boom")
+            except ValueError:
+                logger.exception("failed")
+        finally:
+            shutdown_logging()
+            setup_logging(log_level=settings.log_level)
+
+        log_dir = tmp_path / "logs"
+        main_log = log_dir / process_log_name("test.log")
+        assert main_log.with_name(f"{main_log.name}.1").exists()
+        assert main_log.with_name(f"{main_log.name}.2").exists()
+        assert not main_log.with_name(f"{main_log.name}.3").exists()
+
+        error_log = log_dir / process_log_name("errors.log")
+        errors = [json.loads(line) for line in error_log.read_text().splitlines()]
+        assert len(errors) == 1
+        assert errors[0]["message"] == "failed"
+        assert errors[0]["level"] == "ERROR"
+        assert "ValueError: boom" in errors[0]["exception"]
+
+    def test_log_files_unique_per_process(self, monkeypatch):
+        """Процессы и контейнеры с общим каталогом logs не делят файлы и их ротацию"""
+        monkeypatch.setattr(logging_config.socket, "gethostname", lambda: "api")
+        monkeypatch.setattr(logging_config.os, "getpid", lambda: 7)
+        assert process_log_name("errors.log") == "errors-api-7.log"
+
+        monkeypatch.setattr(logging_config.os, "getpid", lambda: 8)
+        assert process_log_name("errors.log") == "errors-api-8.log"
+        monkeypatch.setattr(logging_config.socket, "gethostname", lambda: "worker")
+        assert process_log_name("worker-1.log") == "worker-1-worker-8.log"
@@ -0,0 +1,129 @@
+import json
+import re
+from datetime import datetime, timezone
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import event, text
+
+from app.models.task import TaskPriorityEnum, TaskStatusEnum
+from app.repositories.task_repository import TaskRepository
+
+SEED_ROWS = 20_000
+
+_TASKS_TABLE = re.compile(r"\btasks\b")
+
+
+def plan_problems(plan: dict) -> list[str]:
+    """Seq Scan по tasks (и её партициям) и явные сортировки в дереве плана"""
+    problems = []
+    node = plan["Node Type"]
+    relation = plan.get("Relation Name", "")
+    if node == "Seq Scan" and relation.startswith("tasks"):
+        problems.append(f"Seq Scan on {relation}")
+    if node in ("Sort", "Incremental Sort"):
+        problems.append(f"{node} by {plan.get('Sort Key')}")
+    for child in plan.get("Plans", []):
+        problems.extend(plan_problems(child))
+    return problems
+
+
+@pytest_asyncio.fixture
+async def seeded_session(async_session):
+    """~20k задач: 99% в финальных статусах, как в рабочей БД; статистика собрана"""
+    await async_session.execute(text(f"""
+        INSERT INTO tasks (title, priority, status, created_at, run_at, started_at, completed_at)
+        SELECT 'seed ' || i,
+               (ARRAY['LOW', 'MEDIUM', 'HIGH'])[1 + i % 3]::task_priority,
+               (CASE WHEN i % 100 = 0 THEN 'PENDING'
+                     WHEN i % 100 = 1 THEN 'IN_PROGRESS'
+                     WHEN i % 100 = 2 THEN 'SCHEDULED'
+                     ELSE (ARRAY['COMPLETED', 'FAILED', 'CANCELLED'])[1 + i % 3] END)::task_status,
+               now() - i * interval '1 second',
+               CASE WHEN i % 100 = 2 THEN now() + i * interval '1 second' END, NULL, NULL
+        FROM generate_series(1, {SEED_ROWS}) AS i
+    """))
+    await async_session.commit()
+    await async_session.execute(text("ANALYZE tasks"))
+    await async_session.commit()
+    return async_session
+
+
+async def captured_statements(session, call) -> list[tuple[str, tuple]]:
+    """SQL запросов к tasks, выполненных call(session); изменения откатываются"""
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if _TASKS_TABLE.search(statement) and not executemany:
+            statements.append((statement, parameters))
+
+    sync_engine = session.bind.sync_engine
+    event.listen(sync_engine, "before_cursor_execute", capture)
+    try:
+        await call(session)
+    finally:
+        event.remove(sync_engine, "before_cursor_execute", capture)
+        await session.rollback()
+    return statements
+
+
+QUERIES = {
+    "get_by_id": lambda db: TaskRepository.get_by_id(db, 100),
+    "get_fields": lambda db: TaskRepository.get_fields(db, 100, ["id", "status"]),
+    "claim_pending": lambda db: TaskRepository.claim_pending(db, [100, 200, 300]),
+    "cancel": lambda db: TaskRepository.cancel(db, 100),
+    "update_statuses": lambda db: TaskRepository.update_statuses(db, [
+        {"id": 101, "status": "COMPLETED", "completed_at": datetime.now(timezone.utc), "result": "ok"},
+        {"id": 201, "status": "FAILED", "completed_at": datetime.now(timezone.utc), "error": "boom"},
+    ]),
+    "next_scheduled": lambda db: TaskRepository.next_scheduled(db, 100),
+    "release_scheduled": lambda db: TaskRepository.release_scheduled(db, [102, 202, 302], datetime.now(timezone.utc)),
+    "list": lambda db: TaskRepository.list_with_filters(db, 1, 20),
+    "list_deep_page": lambda db: TaskRepository.list_with_filters(db, 50, 20),
+    "list_status_active": lambda db: TaskRepository.list_with_filters(db, 1, 20, status=TaskStatusEnum.PENDING),
+    "list_status_terminal": lambda db: TaskRepository.list_with_filters(db, 1, 20, status=TaskStatusEnum.COMPLETED),
+    "list_priority": lambda db: TaskRepository.list_with_filters(db, 1, 20, priority=TaskPriorityEnum.HIGH),
+    "list_status_priority": lambda db: TaskRepository.list_with_filters(
+        db, 1, 20, status=TaskStatusEnum.IN_PROGRESS, priority=TaskPriorityEnum.LOW,
+    ),
+    "list_cursor": lambda db: TaskRepository.list_with_filters(
+        db, 1, 20, status=TaskStatusEnum.FAILED, cursor=(datetime.now(timezone.utc), 10_000), with_total=False,
+    ),
+    "list_rows_fields": lambda db: TaskRepository.list_with_filters(
+        db, 1, 20, priority=TaskPriorityEnum.MEDIUM, as_rows=True, fields=["status"],
+    ),
+}
+
+
+class TestPlanProblems:
+    """Тесты детектора проблем в плане"""
+
+    def test_plan_problems_detects_seq_scan_and_sort(self):
+        """Sort и Seq Scan по партиции tasks находятся на любой глубине"""
+        plan = {
+            "Node Type": "Limit",
+            "Plans": [{
+                "Node Type": "Sort", "Sort Key": ["created_at DESC"],
+                "Plans": [{"Node Type": "Seq Scan", "Relation Name": "tasks_default"}],
+            }],
+        }
+        assert plan_problems(plan) == ["Sort by ['created_at DESC']", "Seq Scan on tasks_default"]
+
+
+@pytest.mark.asyncio
+class TestQueryPlans:
+    """EXPLAIN запросов TaskRepository: без Seq Scan по tasks и без явной сортировки"""
+
+    @pytest.mark.parametrize("name", list(QUERIES))
+    async def test_plan_uses_indexes(self, seeded_session, name):
+        statements = await captured_statements(seeded_session, QUERIES[name])
+        assert statements, f"{name}: no queries against tasks captured"
+
+        connection = await seeded_session.connection()
+        for statement, parameters in statements:
+            result = await connection.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {statement}", parameters)
+            plan = result.scalar()
+            plan = json.loads(plan) if isinstance(plan, str) else plan
+            problems = plan_problems(plan[0]["Plan"])
+            assert not problems, f"{name}: {problems}\n{statement}"
+        await seeded_session.rollback()
@@ -0,0 +1,107 @@
+import asyncio
+import json
+
+import pytest
+from aio_pika.pool import Pool
+
+from app.brokers import RabbitMQBackend
+from app.core.config import settings
+from app.core.metrics import rabbitmq_publish_errors_total
+from app.services.queue_service import ENQUEUED_AT_HEADER, QueueService
+
+
+class FakeExchange:
+    def __init__(self, channel):
+        self.channel = channel
+
+    async def publish(self, message, routing_key, timeout=None):
+        self.channel.in_flight += 1
+        self.channel.max_in_flight = max(self.channel.max_in_flight, self.channel.in_flight)
+        # Имитация ожидания publisher confirm
+        await asyncio.sleep(0.001)
+        self.channel.in_flight -= 1
+        if self.channel.fail:
+            raise RuntimeError("nack")
+        self.channel.published.append((routing_key, message))
+
+
+class FakeChannel:
+    def __init__(self, fail=False):
+        self.published = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.fail = fail
+        self.default_exchange = FakeExchange(self)
+
+    async def get_exchange(self, name, ensure=True):
+        return self.default_exchange
+
+
+def make_service(pool_size: int, fail: bool = False) -> tuple[QueueService, list[FakeChannel]]:
+    channels = []
+
+    async def open_channel():
+        channel = FakeChannel(fail=fail)
+        channels.append(channel)
+        return channel
+
+    backend = RabbitMQBackend(pool_size=pool_size)
+    backend.channel_pool = Pool(open_channel, max_size=pool_size)
+    service = QueueService(backend)
+    service.connected = True
+    return service, channels
+
+
+@pytest.mark.asyncio
+class TestQueueService:
+    """Тесты для QueueService без подключения к RabbitMQ"""
+
+    async def test_publish_tasks_pipelined_over_pool(self):
+        """Тест, что пачка делится между каналами и публикуется конвейером"""
+        service, channels = make_service(pool_size=4)
+
+        await service.publish_tasks([(i, "HIGH" if i % 2 else "LOW") for i in range(20)])
+
+        assert len(channels) == 4
+        published = [message for channel in channels for _, message in channel.published]
+        assert len(published) == 20
+        assert sorted(json.loads(m.body)["task_id"] for m in published) == list(range(20))
+        assert {m.priority for m in published} == {1, 10}
+        # Подтверждения ожидаются параллельно, а не по одному
+        assert all(channel.max_in_flight == 5 for channel in channels)
+
+    async def test_concurrent_publish_task_uses_separate_channels(self):
+        """Тест, что параллельные публикации не делят один канал"""
+        service, channels = make_service(pool_size=3)
+
+        await asyncio.gather(*(service.publish_task(i, "MEDIUM") for i in range(3)))
+
+        assert len(channels) == 3
+        assert all(len(channel.published) == 1 for channel in channels)
+
+    async def test_publish_error_counted(self):
+        """Тест учёта ошибок публикации"""
+        service, _ = make_service(pool_size=1, fail=True)
+        before = rabbitmq_publish_errors_total._value.get()
+
+        with pytest.raises(RuntimeError):
+            await service.publish_task(1, "LOW")
+
+        assert rabbitmq_publish_errors_total._value.get() == before + 1
+
+    async def test_weighted_mode_routes_by_priority(self, monkeypatch):
+        """Режим weighted: задача и её повтор уходят в очередь своего приоритета"""
+        monkeypatch.setattr(settings, "task_queue_mode", "weighted")
+        service, channels = make_service(pool_size=1)
+
+        await service.publish_tasks([(1, "HIGH"), (2, "LOW"), (3, "HIGH")])
+
+        routed = {}
+        for routing_key, message in channels[0].published:
+            routed.setdefault(routing_key, []).append(json.loads(message.body)["task_id"])
+            assert ENQUEUED_AT_HEADER in message.headers
+        assert routed == {"tasks.high": [1, 3], "tasks.low": [2]}
+
+        low = next(m for key, m in channels[0].published if key == "tasks.low")
+        await service.publish_retry(low, 1)
+        assert channels[0].published[-1][0] == f"tasks.low.retry.{settings.worker_retry_base_delay_ms}"
@@ -0,0 +1,74 @@
+import asyncio
+
+import pytest
+
+from app.services.task_cache import TaskCache
+
+
+@pytest.mark.asyncio
+class TestTaskCache:
+    """Тесты для TaskCache"""
+
+    async def test_lru_eviction(self):
+        """Тест вытеснения самой давно использованной записи"""
+        cache = TaskCache(max_size=2, ttl=60)
+        cache.set(1, "one")
+        cache.set(2, "two")
+        assert cache.get(1) == "one"
+
+        cache.set(3, "three")
+
+        assert cache.get(2) is None
+        assert cache.get(1) == "one"
+        assert cache.get(3) == "three"
+
+    async def test_ttl_expiry(self):
+        """Тест истечения TTL"""
+        cache = TaskCache(max_size=10, ttl=0.01)
+        cache.set(1, "one")
+        await asyncio.sleep(0.02)
+        assert cache.get(1) is None
+
+    async def test_concurrent_misses_coalesced(self):
+        """Тест объединения одновременных промахов в одну загрузку"""
+        cache = TaskCache(max_size=10, ttl=60)
+        calls = 0
+
+        async def loader():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return "task"
+
+        results = await asyncio.gather(*(cache.get_or_load(1, loader) for _ in range(10)))
+
+        assert results == ["task"] * 10
+        assert calls == 1
+        assert cache.get(1) == "task"
+
+    async def test_invalidate_during_load(self):
+        """Тест, что результат загрузки, начатой до инвалидации, не кэшируется"""
+        cache = TaskCache(max_size=10, ttl=60)
+        started = asyncio.Event()
+
+        async def loader():
+            started.set()
+            await asyncio.sleep(0.01)
+            return "stale"
+
+        load = asyncio.create_task(cache.get_or_load(1, loader))
+        await started.wait()
+        cache.invalidate(1)
+
+        assert await load == "stale"
+        assert cache.get(1) is None
+
+    async def test_missing_task_not_cached(self):
+        """Тест, что отсутствие задачи не кэшируется"""
+        cache = TaskCache(max_size=10, ttl=60)
+
+        async def loader():
+            return None
+
+        assert await cache.get_or_load(1, loader) is None
+        assert len(cache) == 0
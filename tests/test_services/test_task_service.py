@@ -1,14 +1,19 @@
+import asyncio
+
 import pytest
-from app.models.task import TaskStatusEnum, TaskPriorityEnum
+from sqlalchemy import event, func, select
+
+from app.models.task import Task, TaskStatusEnum, TaskPriorityEnum
 from app.schemas.task import TaskCreate
-from app.services.task_service import TaskService
+from app.services.task_cache import TaskCache
+from app.services.task_service import IdempotencyKeyReused, TaskService
 
 
 @pytest.mark.asyncio
 class TestTaskService:
     """Тесты для TaskService"""
 
-    async def test_create_task(self, async_session, mock_queue_service):
+    async def test_create_task(self, async_session, mock_queue_service, outbox_relay):
         """Тест создания задачи через сервис"""
         service = TaskService(queue_service=mock_queue_service)
 
@@ -23,7 +28,29 @@ class TestTaskService:
         assert task.id is not None
         assert task.title == "Service Test Task"
         assert task.status == TaskStatusEnum.PENDING
-        assert len(mock_queue_service.published_tasks) == 1
+        assert task.created_at is not None
+
+        # Публикация выполняется relay из outbox
+        assert mock_queue_service.published_tasks == []
+        await outbox_relay.relay_once()
+        assert mock_queue_service.published_tasks == [{"task_id": task.id, "priority": "MEDIUM"}]
+
+    async def test_create_tasks_batch(self, async_session, mock_queue_service, outbox_relay):
+        """Тест пакетного создания задач через сервис"""
+        service = TaskService(queue_service=mock_queue_service)
+
+        tasks = await service.create_tasks(async_session, [
+            TaskCreate(title="Batch 1", priority="HIGH"),
+            TaskCreate(title="Batch 2", priority="LOW"),
+        ])
+
+        assert [task.title for task in tasks] == ["Batch 1", "Batch 2"]
+        assert all(task.id is not None for task in tasks)
+        assert all(task.status == TaskStatusEnum.PENDING for task in tasks)
+        assert all(task.created_at is not None for task in tasks)
+
+        await outbox_relay.relay_once()
+        assert len(mock_queue_service.published_tasks) == 2
 
     async def test_get_task(self, async_session, mock_queue_service):
         """Тест получения задачи"""
@@ -85,3 +112,74 @@ class TestTaskService:
         assert total == 2
         assert len(tasks) == 2
         assert all(task.priority == TaskPriorityEnum.HIGH for task in tasks)
+
+    async def test_get_task_cached_and_invalidated_on_cancel(self, async_session, mock_queue_service):
+        """Тест чтения через кэш и инвалидации при отмене"""
+        cache = TaskCache(max_size=10, ttl=60)
+        service = TaskService(queue_service=mock_queue_service, task_cache=cache)
+        created_task = await service.create_task(async_session, TaskCreate(title="Cached", priority="LOW"))
+
+        first = await service.get_task(async_session, created_task.id)
+        second = await service.get_task(async_session, created_task.id)
+        assert first is second
+        assert len(cache) == 1
+
+        await service.cancel_task(async_session, created_task.id)
+        assert len(cache) == 0
+        assert mock_queue_service.published_events[-1]["task_id"] == created_task.id
+        assert mock_queue_service.published_events[-1]["status"] == "CANCELLED"
+
+        cancelled_task = await service.get_task(async_session, created_task.id)
+        assert cancelled_task.status == TaskStatusEnum.CANCELLED
+
+    async def test_idempotent_replay_from_cache_skips_database(self, async_session, mock_queue_service):
+        """Повтор ключа из LRU отвечает исходной задачей без SQL-запросов"""
+        cache = TaskCache(max_size=10, ttl=60)
+        service = TaskService(queue_service=mock_queue_service, idempotency_cache=cache)
+        task_in = TaskCreate(title="Once", priority="LOW")
+        created, replayed = await service.create_task_idempotent(async_session, task_in, "key-1")
+        assert not replayed
+
+        statements = []
+        engine = async_session.bind.sync_engine
+        listener = lambda conn, cursor, statement, *args: statements.append(statement)
+        event.listen(engine, "before_cursor_execute", listener)
+        try:
+            again, replayed = await service.create_task_idempotent(async_session, task_in, "key-1")
+        finally:
+            event.remove(engine, "before_cursor_execute", listener)
+
+        assert replayed
+        assert again == created
+        assert statements == []
+
+    async def test_idempotency_key_reused_with_other_body(self, async_session, mock_queue_service):
+        """Ключ с другим телом отклоняется и из LRU, и по записи в БД"""
+        cache = TaskCache(max_size=10, ttl=60)
+        service = TaskService(queue_service=mock_queue_service, idempotency_cache=cache)
+        await service.create_task_idempotent(async_session, TaskCreate(title="Once", priority="LOW"), "key-2")
+
+        other = TaskCreate(title="Once", priority="HIGH")
+        with pytest.raises(IdempotencyKeyReused):
+            await service.create_task_idempotent(async_session, other, "key-2")
+
+        uncached = TaskService(queue_service=mock_queue_service)
+        with pytest.raises(IdempotencyKeyReused):
+            await uncached.create_task_idempotent(async_session, other, "key-2")
+        count = await async_session.execute(select(func.count()).select_from(Task))
+        assert count.scalar() == 1
+
+    async def test_idempotent_concurrent_requests_create_one_task(self, async_session, session_factory, mock_queue_service):
+        """Одновременные запросы с одним ключом создают одну задачу"""
+        service = TaskService(queue_service=mock_queue_service)
+        task_in = TaskCreate(title="Race", priority="HIGH")
+
+        async def create():
+            async with session_factory() as db:
+                return await service.create_task_idempotent(db, task_in, "race-key")
+
+        (first, first_replayed), (second, second_replayed) = await asyncio.gather(create(), create())
+        assert first.id == second.id
+        assert sorted([first_replayed, second_replayed]) == [False, True]
+        count = await async_session.execute(select(func.count()).select_from(Task))
+        assert count.scalar() == 1
@@ -0,0 +1,28 @@
+import math
+
+import pytest
+
+from app.models.task_stats import STATS_BIN_BASE
+from app.services.task_stats import bin_value_ms, latency_summary
+
+
+class TestLatencySummary:
+    """Тесты перцентилей по логарифмической гистограмме"""
+
+    def test_empty(self):
+        assert latency_summary({}) == {"count": 0, "p50_ms": None, "p95_ms": None, "p99_ms": None}
+
+    def test_percentiles_pick_bins_by_rank(self):
+        """p50 — корзина медианы, p95/p99 — хвост"""
+        histogram = {10: 90, 20: 9, 30: 1}
+        summary = latency_summary(histogram)
+        assert summary["count"] == 100
+        assert summary["p50_ms"] == round(bin_value_ms(10), 1)
+        assert summary["p95_ms"] == round(bin_value_ms(20), 1)
+        assert summary["p99_ms"] == round(bin_value_ms(20), 1)
+
+    @pytest.mark.parametrize("ms", [0.5, 7, 130, 2500, 86_400_000])
+    def test_bin_value_relative_error(self, ms):
+        """Значение корзины отличается от исходного не больше чем на ~5%"""
+        bin_ = math.floor(math.log(ms + 1) / math.log(STATS_BIN_BASE))
+        assert bin_value_ms(bin_) + 1 == pytest.approx(ms + 1, rel=0.05)
@@ -0,0 +1,94 @@
+import asyncio
+
+import pytest
+
+from app.core.metrics import worker_concurrency_limit
+from app.workers.concurrency import AIMDController, AdaptiveLimiter
+from app.workers.task_worker import TaskWorker
+
+
+def make_controller(limit: int, pool_usage: float = 0.0, **kwargs) -> AIMDController:
+    return AIMDController(
+        AdaptiveLimiter(limit),
+        min_limit=2,
+        max_limit=10,
+        interval=0.01,
+        pool_usage=lambda: pool_usage,
+        max_loop_lag=0.1,
+        pool_high_watermark=0.9,
+        latency_tolerance=2.0,
+        backoff_ratio=0.5,
+        **kwargs,
+    )
+
+
+@pytest.mark.asyncio
+class TestAdaptiveConcurrency:
+    """Тесты адаптивного лимита concurrency"""
+
+    async def test_limiter_resize(self):
+        """Тест, что увеличение лимита сразу будит ожидающих, а уменьшение не трогает работающих"""
+        limiter = AdaptiveLimiter(1)
+        await limiter.acquire()
+        waiter = asyncio.create_task(limiter.acquire())
+        await asyncio.sleep(0)
+        assert not waiter.done() and limiter.waiting == 1
+
+        limiter.set_limit(2)
+        await waiter
+        assert limiter.in_flight == 2
+
+        limiter.set_limit(1)
+        assert limiter.locked()
+        limiter.release()
+        assert limiter.locked()
+        limiter.release()
+        assert not limiter.locked()
+
+    async def test_additive_increase_when_saturated(self):
+        """Тест роста на 1 только при упоре в лимит и не выше max"""
+        controller = make_controller(4)
+        assert controller.adjust(loop_lag=0.0) == 4
+
+        for _ in range(4):
+            await controller.limiter.acquire()
+        assert controller.adjust(loop_lag=0.0) == 5
+
+        controller.limiter.set_limit(10)
+        for _ in range(6):
+            await controller.limiter.acquire()
+        assert controller.adjust(loop_lag=0.0) == 10
+
+    async def test_multiplicative_decrease(self):
+        """Тест снижения при лаге event loop, заполненном пуле БД и росте задержки"""
+        assert make_controller(8).adjust(loop_lag=0.5) == 4
+        assert make_controller(8, pool_usage=0.95).adjust(loop_lag=0.0) == 4
+        # Не ниже min
+        assert make_controller(3, pool_usage=1.0).adjust(loop_lag=0.0) == 2
+
+        controller = make_controller(8)
+        controller.observe(0.1)
+        assert controller.adjust(loop_lag=0.0) == 8
+        controller.observe(0.5)
+        assert controller.adjust(loop_lag=0.0) == 4
+
+    async def test_worker_prefetch_follows_limit(self, mock_queue_service, session_factory):
+        """Тест, что новый лимит меняет concurrency, prefetch брокера и gauge"""
+        prefetches = []
+
+        async def set_prefetch(prefetch):
+            prefetches.append(prefetch)
+
+        mock_queue_service.set_prefetch = set_prefetch
+        worker = TaskWorker(
+            concurrency=3, batch_size=1, session_factory=session_factory,
+            queue_service=mock_queue_service, adaptive=True,
+        )
+        worker.consumers = [object()]
+
+        await worker.controller.apply(6)
+
+        assert worker.concurrency == 6
+        assert worker.semaphore.limit == 6
+        assert prefetches == [6]
+        assert worker_concurrency_limit._value.get() == 6
@@ -0,0 +1,97 @@
+import gzip
+import json
+from datetime import datetime, timezone
+
+import pytest
+from sqlalchemy import insert, text
+
+from app.models.task import Task, TaskPriorityEnum, TaskStatusEnum
+from app.repositories.task_count_repository import TaskCountRepository
+from app.workers.partitions import add_months, archive_partitions, ensure_partitions, partition_month
+
+NOW = datetime(2026, 6, 15, 12, 0, tzinfo=timezone.utc)
+
+
+async def partition_of(db, task_id: int) -> str:
+    result = await db.execute(text("SELECT tableoid::regclass::text FROM tasks WHERE id = :id"), {"id": task_id})
+    name = result.scalar()
+    # Открытая транзакция держала бы блокировку и не дала выполнить DETACH
+    await db.commit()
+    return name
+
+
+async def insert_task(db, created_at: datetime, status=TaskStatusEnum.COMPLETED) -> int:
+    result = await db.execute(
+        insert(Task).returning(Task.id),
+        [{"title": "t", "priority": TaskPriorityEnum.LOW, "status": status, "created_at": created_at}],
+    )
+    task_id = result.scalar()
+    await db.commit()
+    return task_id
+
+
+class TestPartitionNames:
+    """Тесты расчёта месяцев и имён партиций"""
+
+    def test_add_months_crosses_year(self):
+        assert add_months(datetime(2026, 11, 1, tzinfo=timezone.utc), 3) == datetime(2027, 2, 1, tzinfo=timezone.utc)
+        assert add_months(datetime(2026, 1, 1, tzinfo=timezone.utc), -1) == datetime(2025, 12, 1, tzinfo=timezone.utc)
+
+    def test_partition_month(self):
+        assert partition_month("tasks_p202602") == datetime(2026, 2, 1, tzinfo=timezone.utc)
+        assert partition_month("tasks_default") is None
+
+
+@pytest.mark.asyncio
+class TestPartitionMaintenance:
+    """Тесты создания и архивации партиций tasks"""
+
+    async def test_ensure_partitions_moves_rows_from_default(self, async_session, session_factory):
+        """Строки, попавшие в tasks_default, переносятся в созданную партицию без изменения счётчиков"""
+        task_id = await insert_task(async_session, NOW)
+        assert await partition_of(async_session, task_id) == "tasks_default"
+
+        created = await ensure_partitions(session_factory, months_ahead=2, now=NOW)
+        assert created == ["tasks_p202606", "tasks_p202607", "tasks_p202608"]
+        assert await partition_of(async_session, task_id) == "tasks_p202606"
+        assert await TaskCountRepository.total(async_session, TaskStatusEnum.COMPLETED) == 1
+
+        # Повторный запуск ничего не создаёт, новые строки сразу идут в свою партицию
+        assert await ensure_partitions(session_factory, months_ahead=2, now=NOW) == []
+        later = await insert_task(async_session, datetime(2026, 8, 2, tzinfo=timezone.utc))
+        assert await partition_of(async_session, later) == "tasks_p202608"
+
+    async def test_archive_exports_and_drops_terminal_partitions(self, async_session, session_factory, tmp_path):
+        """Старая партиция с финальными задачами выгружается в NDJSON.gz и удаляется"""
+        old = datetime(2026, 1, 10, tzinfo=timezone.utc)
+        await ensure_partitions(session_factory, months_ahead=0, now=old)
+        ids = [await insert_task(async_session, old), await insert_task(async_session, old, TaskStatusEnum.FAILED)]
+        recent = await insert_task(async_session, NOW)
+
+        archived = await archive_partitions(session_factory, retention_days=30, archive_dir=str(tmp_path), now=NOW)
+        assert archived == ["tasks_p202601"]
+
+        with gzip.open(tmp_path / "tasks_p202601.ndjson.gz", "rt") as archive:
+            rows = [json.loads(line) for line in archive]
+        assert [row["id"] for row in rows] == ids
+        assert rows[0]["status"] == "COMPLETED"
+        assert rows[0]["created_at"] == "2026-01-10T00:00:00Z"
+
+        result = await async_session.execute(text("SELECT to_regclass('tasks_p202601')"))
+        assert result.scalar() is None
+        await async_session.commit()
+        assert await partition_of(async_session, recent) == "tasks_default"
+        # Удалённые вместе с партицией задачи вычтены из task_counts
+        assert await TaskCountRepository.total(async_session) == 1
+
+    async def test_archive_skips_partitions_with_active_tasks(self, async_session, session_factory, tmp_path):
+        """Партиция с незавершёнными задачами не архивируется"""
+        old = datetime(2026, 1, 10, tzinfo=timezone.utc)
+        await ensure_partitions(session_factory, months_ahead=0, now=old)
+        await insert_task(async_session, old)
+        await insert_task(async_session, old, TaskStatusEnum.PENDING)
+
+        archived = await archive_partitions(session_factory, retention_days=30, archive_dir=str(tmp_path), now=NOW)
+        assert archived == []
+        assert not list(tmp_path.iterdir())
+        assert await TaskCountRepository.total(async_session) == 2
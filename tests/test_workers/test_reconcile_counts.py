@@ -0,0 +1,129 @@
+import asyncio
+from datetime import datetime, timezone
+
+import pytest
+from sqlalchemy import delete, func, select, text, update
+
+from app.models.task import Task, TaskPriorityEnum, TaskStatusEnum
+from app.repositories.task_count_repository import TaskCountRepository
+from app.repositories.task_repository import TaskRepository
+from app.schemas.task import TaskCreate
+from app.services.task_service import TaskService
+from app.workers.reconcile_counts import prune_idempotency_keys, prune_stats, reconcile_once
+
+
+async def actual_count(db, status=None, priority=None) -> int:
+    query = select(func.count()).select_from(Task)
+    if status:
+        query = query.where(Task.status == status)
+    if priority:
+        query = query.where(Task.priority == priority)
+    return (await db.execute(query)).scalar()
+
+
+@pytest.mark.asyncio
+class TestTaskCounts:
+    """Тесты счётчиков task_counts и их сверки"""
+
+    async def test_triggers_track_inserts_transitions_and_deletes(self, async_session, mock_queue_service):
+        """Триггеры поддерживают счётчики при создании, смене статуса и удалении"""
+        service = TaskService(queue_service=mock_queue_service)
+        tasks = await service.create_tasks(async_session, [
+            TaskCreate(title="a", priority="HIGH"),
+            TaskCreate(title="b", priority="HIGH"),
+            TaskCreate(title="c", priority="LOW"),
+        ])
+        assert await TaskCountRepository.total(async_session, TaskStatusEnum.PENDING) == 3
+        assert await TaskCountRepository.total(async_session, priority=TaskPriorityEnum.HIGH) == 2
+
+        await service.cancel_task(async_session, tasks[0].id)
+        claimed = await TaskRepository.claim_pending(async_session, [tasks[1].id])
+        await TaskRepository.update_statuses(async_session, [
+            {"id": claimed[0].id, "status": "COMPLETED", "completed_at": datetime.now(timezone.utc), "result": "ok"},
+        ])
+        await async_session.execute(delete(Task).where(Task.id == tasks[2].id))
+        await async_session.commit()
+
+        for status in TaskStatusEnum:
+            for priority in TaskPriorityEnum:
+                assert await TaskCountRepository.total(async_session, status, priority) == \
+                    await actual_count(async_session, status, priority)
+        assert await TaskCountRepository.total(async_session) == 2
+
+    async def test_update_without_transition_keeps_counts(self, async_session, mock_queue_service):
+        """UPDATE без смены status/priority не меняет счётчики"""
+        service = TaskService(queue_service=mock_queue_service)
+        task = await service.create_task(async_session, TaskCreate(title="keep"))
+
+        await async_session.execute(update(Task).where(Task.id == task.id).values(result="x"))
+        await async_session.commit()
+
+        assert await TaskCountRepository.total(async_session) == 1
+        assert await TaskCountRepository.total(async_session, TaskStatusEnum.PENDING, TaskPriorityEnum.MEDIUM) == 1
+
+    async def test_reconcile_fixes_drift(self, async_session, mock_queue_service, session_factory):
+        """Сверка исправляет расхождения и возвращает их; повторный проход ничего не меняет"""
+        service = TaskService(queue_service=mock_queue_service)
+        await service.create_tasks(async_session, [TaskCreate(title="a"), TaskCreate(title="b")])
+
+        # Дрейф: ручная правка счётчика и лишняя пара без задач
+        await async_session.execute(text("UPDATE task_counts SET n = n + 5"))
+        await async_session.execute(text(
+            "INSERT INTO task_counts (status, priority, slot, n) VALUES ('FAILED', 'LOW', 3, 7)"
+        ))
+        await async_session.commit()
+
+        # total списка берётся из task_counts, поэтому дрейф виден в API
+        _, total = await TaskRepository.list_with_filters(async_session, 1, 10)
+        assert total == 14
+
+        drift = await reconcile_once(session_factory)
+        assert drift == {("PENDING", "MEDIUM"): (7, 2), ("FAILED", "LOW"): (7, 0)}
+
+        _, total = await TaskRepository.list_with_filters(async_session, 1, 10, status=TaskStatusEnum.PENDING)
+        assert total == 2
+        assert await TaskCountRepository.total(async_session, TaskStatusEnum.FAILED) == 0
+        assert await reconcile_once(session_factory) == {}
+
+    async def test_reconcile_does_not_block_writes(self, async_session, mock_queue_service, session_factory):
+        """Снимок сверки не блокирует создание задач, созданные после снимка не теряются"""
+        service = TaskService(queue_service=mock_queue_service)
+        await service.create_tasks(async_session, [TaskCreate(title="a")])
+        await async_session.execute(text("UPDATE task_counts SET n = n + 5"))
+        await async_session.commit()
+
+        async with session_factory() as db:
+            drift = await TaskCountRepository.drift(db)
+            await asyncio.wait_for(service.create_tasks(async_session, [TaskCreate(title="b")]), timeout=2)
+            await db.rollback()
+            await TaskCountRepository.apply_drift(db, drift)
+            await db.commit()
+
+        assert drift == {("PENDING", "MEDIUM"): (6, 1)}
+        assert await TaskCountRepository.total(async_session, TaskStatusEnum.PENDING) == 2
+        assert await actual_count(async_session, TaskStatusEnum.PENDING) == 2
+
+    async def test_prune_stats_drops_old_buckets(self, async_session, session_factory):
+        """Корзины статистики старше срока хранения удаляются"""
+        await async_session.execute(text(
+            "INSERT INTO task_stats_buckets (minute, kind, bin, slot, n) VALUES "
+            "(date_trunc('minute', now()) - interval '2 hours', 'wait', 10, 0, 1), "
+            "(date_trunc('minute', now()), 'wait', 10, 0, 1)"
+        ))
+        await async_session.commit()
+
+        assert await prune_stats(session_factory, retention_hours=1) == 1
+        remaining = await async_session.execute(text("SELECT count(*) FROM task_stats_buckets"))
+        assert remaining.scalar() == 1
+
+    async def test_prune_idempotency_keys(self, async_session, session_factory):
+        """Ключи идемпотентности старше срока хранения удаляются"""
+        await async_session.execute(text(
+            "INSERT INTO task_idempotency_keys (key, task_id, request_hash, created_at) VALUES "
+            "('old', 1, '', now() - interval '2 hours'), ('fresh', 2, '', now())"
+        ))
+        await async_session.commit()
+
+        assert await prune_idempotency_keys(session_factory, ttl_hours=1) == 1
+        remaining = await async_session.execute(text("SELECT key FROM task_idempotency_keys"))
+        assert remaining.scalars().all() == ["fresh"]
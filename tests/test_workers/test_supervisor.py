@@ -0,0 +1,104 @@
+import os
+import signal
+import socket
+import sys
+import time
+import urllib.request
+
+from app.workers.supervisor import WorkerSupervisor
+
+
+def graceful_target(index, cpu):
+    """Дочерний процесс, завершающийся с кодом 0 по SIGTERM"""
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    time.sleep(60)
+
+
+def crash_target(index, cpu):
+    sys.exit(3)
+
+
+def metrics_target(index, cpu):
+    """Дочерний процесс, записывающий метрики worker"""
+    from app.core.metrics import task_queue_wait_seconds, worker_concurrency_limit
+
+    worker_concurrency_limit.set(3)
+    task_queue_wait_seconds.labels(priority="LOW").observe(0.2)
+    graceful_target(index, cpu)
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_until(predicate, timeout: float = 10.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "timeout"
+        time.sleep(0.05)
+
+
+class TestWorkerSupervisor:
+    """Тесты для supervisor процессов worker"""
+
+    def test_sigterm_fanout(self):
+        """Тест запуска N процессов и их согласованной остановки по SIGTERM"""
+        supervisor = WorkerSupervisor(2, target=graceful_target, shutdown_timeout=10)
+        supervisor.start()
+        processes = [child.process for child in supervisor.children.values()]
+        assert len({process.pid for process in processes}) == 2
+        time.sleep(1)
+
+        supervisor.shutdown()
+
+        assert [process.exitcode for process in processes] == [0, 0]
+        assert supervisor.children == {}
+
+    def test_crashed_child_restarted(self):
+        """Тест перезапуска упавшего процесса с учётом серии быстрых падений"""
+        supervisor = WorkerSupervisor(1, target=crash_target, restart_delay=0, shutdown_timeout=5)
+        supervisor.start()
+        first = supervisor.children[0].process
+        wait_until(lambda: not first.is_alive())
+
+        supervisor.reap()
+
+        assert first.exitcode == 3
+        assert supervisor.fast_crashes[0] == 1
+        assert supervisor.children[0].process.pid != first.pid
+        supervisor.shutdown()
+
+    def test_cpu_affinity(self):
+        """Тест распределения процессов по доступным CPU"""
+        cpus = sorted(os.sched_getaffinity(0))
+        supervisor = WorkerSupervisor(len(cpus) + 1, cpu_affinity=True)
+
+        assert [supervisor.cpu_for(i) for i in range(len(cpus) + 1)] == cpus + cpus[:1]
+        assert WorkerSupervisor(2).cpu_for(0) is None
+
+    def test_children_metrics_served(self, tmp_path, monkeypatch):
+        """Метрики worker под supervisor доступны на его /metrics суммой по процессам"""
+        monkeypatch.setenv("PROMETHEUS_MULTIPROC_DIR", str(tmp_path))
+        port = free_port()
+        supervisor = WorkerSupervisor(2, target=metrics_target, shutdown_timeout=10, metrics_port=port)
+        supervisor.start_metrics()
+        supervisor.start()
+
+        def scrape() -> str:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics") as response:
+                return response.read().decode()
+
+        try:
+            wait_until(lambda: 'task_queue_wait_seconds_count{priority="LOW"} 2.0' in scrape())
+            assert "worker_concurrency_limit 6.0" in scrape()
+
+            # Перезапущенный процесс: лимит упавшего больше не учитывается
+            supervisor.children[0].process.kill()
+            wait_until(lambda: not supervisor.children[0].process.is_alive())
+            supervisor.restart_delay = 60
+            supervisor.reap()
+            assert "worker_concurrency_limit 3.0" in scrape()
+        finally:
+            supervisor.shutdown()
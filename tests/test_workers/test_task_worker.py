@@ -0,0 +1,509 @@
+import asyncio
+import json
+
+import pytest
+
+from app.brokers import InMemoryBroker
+from app.core.config import settings
+from app.core.metrics import task_queue_wait_seconds
+from app.models.task import Task, TaskStatusEnum
+from app.schemas.task import TaskCreate
+from app.services.outbox_relay import OutboxRelay
+from app.services.queue_service import RETRY_COUNT_HEADER, QueueService
+from app.services.task_events import build_status_event
+from app.services.task_service import TaskService
+from app.workers.task_worker import TaskWorker
+
+
+class FakeMessage:
+    """Минимальная замена aio_pika.IncomingMessage"""
+
+    def __init__(self, task_id, headers: dict = None):
+        self.body = json.dumps({"task_id": task_id}).encode()
+        self.headers = headers or {}
+        self.priority = 1
+        self.acked = False
+        self.nacked = False
+        self.rejected = False
+
+    async def ack(self):
+        self.acked = True
+
+    async def nack(self, requeue: bool = True):
+        self.nacked = True
+
+    async def reject(self, requeue: bool = False):
+        self.rejected = True
+
+
+class FastWorker(TaskWorker):
+    """Worker без 5-секундной симуляции; задачи с 'fail' в названии падают"""
+
+    async def execute(self, task: Task) -> str:
+        if "fail" in task.title:
+            raise RuntimeError("boom")
+        return f"done {task.id}"
+
+
+class BlockingWorker(TaskWorker):
+    """Worker, задачи которого выполняются до отмены"""
+
+    async def execute(self, task: Task) -> str:
+        await asyncio.Event().wait()
+
+
+async def wait_running(worker: TaskWorker, task_id: int):
+    deadline = asyncio.get_running_loop().time() + 5
+    while task_id not in worker.running:
+        assert asyncio.get_running_loop().time() < deadline
+        await asyncio.sleep(0.01)
+
+
+async def create_tasks(async_session, mock_queue_service, *titles):
+    service = TaskService(queue_service=mock_queue_service)
+    return [
+        await service.create_task(async_session, TaskCreate(title=title))
+        for title in titles
+    ]
+
+
+@pytest.mark.asyncio
+class TestTaskWorker:
+    """Тесты для TaskWorker"""
+
+    async def test_handle_message(self, async_session, mock_queue_service, session_factory):
+        """Тест обработки одного сообщения"""
+        task, = await create_tasks(async_session, mock_queue_service, "single")
+        worker = FastWorker(
+            concurrency=1, batch_size=1, session_factory=session_factory, queue_service=mock_queue_service
+        )
+        message = FakeMessage(task.id)
+
+        await worker.handle_message(message)
+
+        assert message.acked
+        async with session_factory() as db:
+            stored = await worker.repository.get_by_id(db, task.id)
+        assert stored.status == TaskStatusEnum.COMPLETED
+        assert stored.result == f"done {task.id}"
+
+        # Каждый переход статуса разослан остальным процессам
+        events = [(e["task_id"], e["status"]) for e in mock_queue_service.published_events]
+        assert events == [(task.id, "IN_PROGRESS"), (task.id, "COMPLETED")]
+
+    async def test_claim_pending_skips_non_pending(self, async_session, mock_queue_service, session_factory):
+        """Тест, что claim захватывает только PENDING задачи"""
+        first, second = await create_tasks(async_session, mock_queue_service, "a", "b")
+        service = TaskService(queue_service=mock_queue_service)
+        await service.cancel_task(async_session, second.id)
+
+        worker = FastWorker(session_factory=session_factory, queue_service=mock_queue_service)
+        async with session_factory() as db:
+            claimed = await worker.repository.claim_pending(db, [first.id, second.id, 99999])
+            await db.commit()
+
+        assert [task.id for task in claimed] == [first.id]
+        assert claimed[0].status == TaskStatusEnum.IN_PROGRESS
+        assert claimed[0].started_at is not None
+
+    async def test_batched_processing(self, async_session, mock_queue_service, session_factory):
+        """Тест пакетного захвата и write-behind записи статусов"""
+        ok, failing, cancelled = await create_tasks(
+            async_session, mock_queue_service, "ok", "fail", "cancelled"
+        )
+        service = TaskService(queue_service=mock_queue_service)
+        await service.cancel_task(async_session, cancelled.id)
+
+        worker = FastWorker(
+            concurrency=4,
+            batch_size=4,
+            batch_max_wait_ms=10,
+            session_factory=session_factory,
+            queue_service=mock_queue_service,
+        )
+        # Без повторов: упавшая задача сразу FAILED
+        worker.max_retries = 0
+        messages = [FakeMessage(task.id) for task in (ok, failing, cancelled)]
+        for message in messages:
+            worker.inbox.put_nowait(message)
+
+        batch = await worker.collect_batch()
+        assert len(batch) == 3
+        await worker.dispatch_batch(batch)
+        await asyncio.gather(*worker.active_tasks)
+
+        # Отменённая задача подтверждена сразу, остальные — только после flush
+        assert messages[2].acked
+        assert not messages[0].acked and not messages[1].acked
+        assert len(worker.status_buffer) == 2
+
+        assert await worker.status_buffer.flush() == 2
+        assert all(message.acked for message in messages)
+
+        async with session_factory() as db:
+            stored = {task_id: await worker.repository.get_by_id(db, task_id) for task_id in (ok.id, failing.id, cancelled.id)}
+        assert stored[ok.id].status == TaskStatusEnum.COMPLETED
+        assert stored[ok.id].result == f"done {ok.id}"
+        assert stored[ok.id].completed_at is not None
+        assert stored[failing.id].status == TaskStatusEnum.FAILED
+        assert stored[failing.id].error == "boom"
+        assert stored[cancelled.id].status == TaskStatusEnum.CANCELLED
+
+        statuses = {(e["task_id"], e["status"]) for e in mock_queue_service.published_events}
+        assert {(ok.id, "COMPLETED"), (failing.id, "FAILED"), (ok.id, "IN_PROGRESS")} <= statuses
+
+        # Все слоты concurrency освобождены
+        assert worker.semaphore._value == 4
+
+    async def test_collect_batch_cancelled_while_waiting_for_slot(self, mock_queue_service, session_factory):
+        """Отмена сбора пачки в ожидании слота возвращает собранные сообщения и слоты"""
+        worker = FastWorker(
+            concurrency=3, batch_size=4, batch_max_wait_ms=5000,
+            session_factory=session_factory, queue_service=mock_queue_service, adaptive=True,
+        )
+        collector = asyncio.create_task(worker.collect_batch())
+        await asyncio.sleep(0.01)
+        # Чужой ожидающий в очереди лимитера: слот для второго сообщения встаёт за ним
+        other = asyncio.get_running_loop().create_future()
+        worker.semaphore._waiters.append(other)
+        message = FakeMessage(1)
+        worker.inbox.put_nowait(message)
+        await asyncio.sleep(0.05)
+        assert worker.semaphore.in_flight == 1 and worker.inbox.empty()
+        collector.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await collector
+
+        # Слот первого сообщения освобождён и сразу выдан ожидающему
+        assert other.done() and worker.semaphore.in_flight == 1
+        assert worker.inbox.get_nowait() is message
+
+    async def test_stop_during_dispatch_runs_claimed_tasks(
+            self, async_session, mock_queue_service, session_factory, monkeypatch
+    ):
+        """Остановка после commit захвата не бросает задачи в IN_PROGRESS без исполнителя"""
+        first, second = await create_tasks(async_session, mock_queue_service, "a", "b")
+        worker = FastWorker(
+            concurrency=4, batch_size=4, batch_max_wait_ms=10,
+            session_factory=session_factory, queue_service=mock_queue_service,
+        )
+        claim_committed = asyncio.Event()
+        release = asyncio.Event()
+
+        async def slow_publish(events):
+            # Рассылка IN_PROGRESS идёт уже после commit захвата
+            claim_committed.set()
+            await release.wait()
+
+        monkeypatch.setattr(worker, "publish_status_events", slow_publish)
+        messages = [FakeMessage(task.id) for task in (first, second)]
+        for message in messages:
+            worker.inbox.put_nowait(message)
+        dispatcher = asyncio.create_task(worker.batch_loop())
+        await asyncio.wait_for(claim_committed.wait(), timeout=5)
+
+        stopping = asyncio.create_task(worker.stop(dispatcher))
+        await asyncio.sleep(0.05)
+        assert not stopping.done()
+        release.set()
+        await asyncio.wait_for(stopping, timeout=5)
+
+        # Задачи выполнены, сообщения подтверждены после записи статусов, слоты свободны
+        assert all(message.acked and not message.nacked for message in messages)
+        async with session_factory() as db:
+            for task in (first, second):
+                stored = await worker.repository.get_by_id(db, task.id)
+                assert stored.status == TaskStatusEnum.COMPLETED
+        assert worker.semaphore._value == 4
+
+    async def test_cancelled_dispatch_returns_unclaimed_messages(self, mock_queue_service, session_factory):
+        """Прерванный до захвата dispatch возвращает сообщения в очередь и освобождает слоты"""
+        worker = FastWorker(
+            concurrency=2, batch_size=2, session_factory=session_factory, queue_service=mock_queue_service,
+        )
+        started = asyncio.Event()
+
+        def blocking_session():
+            started.set()
+            return BlockingSession()
+
+        class BlockingSession:
+            async def __aenter__(self):
+                await asyncio.Event().wait()
+
+            async def __aexit__(self, *exc):
+                return False
+
+        worker.session_factory = blocking_session
+        messages = [FakeMessage(1), FakeMessage(2)]
+        for _ in messages:
+            await worker.semaphore.acquire()
+        dispatch = asyncio.create_task(worker.dispatch_batch(messages))
+        await asyncio.wait_for(started.wait(), timeout=5)
+        dispatch.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await dispatch
+
+        assert all(message.nacked for message in messages)
+        assert worker.semaphore._value == 2
+
+    async def test_inprocess_broker_end_to_end(self, async_session, session_factory):
+        """Тест API-сервиса и worker в одном процессе через in-memory брокер"""
+        queue_service = QueueService(InMemoryBroker())
+        await queue_service.connect()
+        events = []
+        await queue_service.subscribe_status_events(events.append)
+
+        service = TaskService(queue_service=queue_service)
+        task, = await create_tasks(async_session, queue_service, "edge")
+        relay = OutboxRelay(queue_service, session_factory=session_factory)
+        assert await relay.relay_once() == 1
+
+        worker = FastWorker(concurrency=2, batch_size=1, session_factory=session_factory, queue_service=queue_service)
+        runner = asyncio.create_task(worker.start())
+        deadline = asyncio.get_running_loop().time() + 5
+        while (task.id, "COMPLETED") not in {(e["task_id"], e["status"]) for e in events}:
+            assert asyncio.get_running_loop().time() < deadline
+            await asyncio.sleep(0.01)
+
+        worker.shutdown_event.set()
+        await runner
+
+        async with session_factory() as db:
+            stored = await service.get_task(db, task.id)
+        assert stored.status == TaskStatusEnum.COMPLETED
+        assert stored.result == f"done {task.id}"
+
+    async def test_cancelled_message_dropped_without_db(self, mock_queue_service):
+        """Сообщение задачи из события CANCELLED подтверждается без обращения к БД"""
+        # session_factory=None: любое обращение к БД завершилось бы ошибкой и reject
+        worker = FastWorker(concurrency=1, batch_size=1, session_factory=None, queue_service=mock_queue_service)
+        worker.on_status_event(build_status_event(4242, TaskStatusEnum.CANCELLED))
+        worker.on_status_event(build_status_event(4343, TaskStatusEnum.COMPLETED))
+
+        message = FakeMessage(4242)
+        await worker.handle_message(message)
+        assert message.acked and not message.rejected
+        assert 4242 in worker.cancelled and 4343 not in worker.cancelled
+
+    async def test_cancel_interrupts_running_task(self, async_session, mock_queue_service, session_factory):
+        """Отмена IN_PROGRESS задачи прерывает выполнение и сразу освобождает слот"""
+        task, = await create_tasks(async_session, mock_queue_service, "long")
+        worker = BlockingWorker(
+            concurrency=1, batch_size=1, session_factory=session_factory, queue_service=mock_queue_service
+        )
+        message = FakeMessage(task.id)
+        handler = asyncio.create_task(worker.handle_message(message))
+        await wait_running(worker, task.id)
+
+        service = TaskService(queue_service=mock_queue_service)
+        assert await service.cancel_task(async_session, task.id)
+        # mock очереди не доставляет fanout — передаём событие worker'у вручную
+        worker.on_status_event(mock_queue_service.published_events[-1])
+        await asyncio.wait_for(handler, timeout=5)
+
+        assert message.acked and not message.nacked
+        assert not worker.semaphore.locked()
+        async with session_factory() as db:
+            stored = await worker.repository.get_by_id(db, task.id)
+        assert stored.status == TaskStatusEnum.CANCELLED
+        assert stored.completed_at is None
+
+    async def test_result_not_written_over_cancellation(self, async_session, mock_queue_service, session_factory):
+        """Задача, отменённая во время выполнения без доставки события, остаётся CANCELLED"""
+        task, = await create_tasks(async_session, mock_queue_service, "race")
+        service = TaskService(queue_service=mock_queue_service)
+
+        class CancelledMidway(FastWorker):
+            async def execute(self, task: Task) -> str:
+                async with session_factory() as db:
+                    assert await service.cancel_task(db, task.id)
+                return "late result"
+
+        worker = CancelledMidway(
+            concurrency=1, batch_size=1, session_factory=session_factory, queue_service=mock_queue_service
+        )
+        message = FakeMessage(task.id)
+        await worker.handle_message(message)
+
+        assert message.acked
+        async with session_factory() as db:
+            stored = await worker.repository.get_by_id(db, task.id)
+        assert stored.status == TaskStatusEnum.CANCELLED
+        assert stored.result is None
+        assert (task.id, "COMPLETED") not in {(e["task_id"], e["status"]) for e in mock_queue_service.published_events}
+
+    async def test_failure_scheduled_for_retry(self, async_session, mock_queue_service, session_factory):
+        """Упавшая задача с оставшимися попытками снова PENDING, сообщение — в очередь задержки"""
+        task, = await create_tasks(async_session, mock_queue_service, "fail once")
+        worker = FastWorker(
+            concurrency=1, batch_size=1, session_factory=session_factory, queue_service=mock_queue_service
+        )
+        message = FakeMessage(task.id, headers={RETRY_COUNT_HEADER: 1})
+        await worker.handle_message(message)
+
+        assert message.acked and not message.rejected
+        assert mock_queue_service.retried == [(message.body, 2)]
+        assert not worker.semaphore.locked()
+        async with session_factory() as db:
+            stored = await worker.repository.get_by_id(db, task.id)
+        assert stored.status == TaskStatusEnum.PENDING
+        assert stored.error == "boom"
+
+    async def test_retry_scheduled_after_release_is_committed(
+            self, async_session, mock_queue_service, session_factory, monkeypatch,
+    ):
+        """Ошибка БД при возврате в PENDING повторяется; повтор в брокере — только после записи"""
+        monkeypatch.setattr(settings, "worker_retry_base_delay_ms", 10)
+        task, = await create_tasks(async_session, mock_queue_service, "fail once")
+        worker = FastWorker(
+            concurrency=1, batch_size=1, session_factory=session_factory, queue_service=mock_queue_service
+        )
+        release = worker.repository.release_for_retry
+        calls = []
+
+        async def flaky_release(db, task_id, error):
+            calls.append(task_id)
+            assert mock_queue_service.retried == []
+            if len(calls) == 1:
+                raise ConnectionError("db is down")
+            return await release(db, task_id, error)
+
+        worker.repository.release_for_retry = flaky_release
+        message = FakeMessage(task.id)
+        await worker.handle_message(message)
+
+        assert calls == [task.id, task.id]
+        assert message.acked
+        assert mock_queue_service.retried == [(message.body, 1)]
+        async with session_factory() as db:
+            assert (await worker.repository.get_by_id(db, task.id)).status == TaskStatusEnum.PENDING
+
+    async def test_unrecorded_failure_requeued_on_shutdown(self, async_session, mock_queue_service, session_factory):
+        """Статус упавшей задачи не записан до остановки: без повтора, сообщение — обратно в очередь"""
+        task, = await create_tasks(async_session, mock_queue_service, "fail")
+        worker = FastWorker(
+            concurrency=1, batch_size=1, session_factory=session_factory, queue_service=mock_queue_service
+        )
+
+        async def broken_release(db, task_id, error):
+            raise ConnectionError("db is down")
+
+        worker.repository.release_for_retry = broken_release
+        worker.shutdown_event.set()
+        message = FakeMessage(task.id)
+        await worker.handle_message(message)
+
+        assert message.nacked and not message.acked
+        assert mock_queue_service.retried == []
+        assert not worker.semaphore.locked()
+
+    async def test_batched_park_failure_nacks(self, async_session, mock_queue_service, session_factory):
+        """Пакетный режим: если parking не удался, сообщение не подтверждается, а возвращается в очередь"""
+        task, = await create_tasks(async_session, mock_queue_service, "fail")
+
+        async def broken_park(message, error):
+            raise ConnectionError("broker is down")
+
+        mock_queue_service.publish_parked = broken_park
+        worker = FastWorker(
+            concurrency=2, batch_size=2, batch_max_wait_ms=10,
+            session_factory=session_factory, queue_service=mock_queue_service,
+        )
+        worker.max_retries = 0
+        message = FakeMessage(task.id)
+        await worker.semaphore.acquire()
+        await worker.dispatch_batch([message])
+        await asyncio.gather(*worker.active_tasks)
+        await worker.status_buffer.flush()
+
+        assert message.nacked and not message.acked
+        async with session_factory() as db:
+            assert (await worker.repository.get_by_id(db, task.id)).status == TaskStatusEnum.FAILED
+
+    async def test_exhausted_retries_parked(self, async_session, mock_queue_service, session_factory):
+        """После worker_max_retries повторов задача FAILED, сообщение — в parking"""
+        task, = await create_tasks(async_session, mock_queue_service, "fail always")
+        worker = FastWorker(
+            concurrency=1, batch_size=1, session_factory=session_factory, queue_service=mock_queue_service
+        )
+        message = FakeMessage(task.id, headers={RETRY_COUNT_HEADER: worker.max_retries})
+        await worker.handle_message(message)
+
+        assert message.acked
+        assert mock_queue_service.retried == []
+        assert mock_queue_service.parked == [(message.body, "boom")]
+        async with session_factory() as db:
+            stored = await worker.repository.get_by_id(db, task.id)
+        assert stored.status == TaskStatusEnum.FAILED
+
+    async def test_retries_through_inprocess_broker(self, async_session, session_factory, monkeypatch):
+        """Тест повторов через очереди задержки in-memory брокера до успеха и до parking"""
+        monkeypatch.setattr(settings, "worker_max_retries", 2)
+        monkeypatch.setattr(settings, "worker_retry_base_delay_ms", 10)
+        queue_service = QueueService(InMemoryBroker())
+        await queue_service.connect()
+        assert {"tasks.retry.10", "tasks.retry.20", "tasks.parking"} <= set(queue_service.backend.queues)
+
+        attempts = {}
+
+        class FlakyWorker(FastWorker):
+            async def execute(self, task: Task) -> str:
+                attempts[task.id] = attempts.get(task.id, 0) + 1
+                if task.title == "flaky" and attempts[task.id] < 3:
+                    raise RuntimeError("flaky")
+                return await super().execute(task)
+
+        flaky, failing = await create_tasks(async_session, queue_service, "flaky", "fail")
+        await queue_service.publish_tasks([(flaky.id, "MEDIUM"), (failing.id, "MEDIUM")])
+        worker = FlakyWorker(concurrency=2, batch_size=1, session_factory=session_factory, queue_service=queue_service)
+        runner = asyncio.create_task(worker.start())
+
+        parking = queue_service.backend.queues["tasks.parking"]
+        deadline = asyncio.get_running_loop().time() + 5
+        while parking.qsize() < 1 or attempts.get(flaky.id, 0) < 3:
+            assert asyncio.get_running_loop().time() < deadline
+            await asyncio.sleep(0.01)
+        worker.shutdown_event.set()
+        await runner
+
+        assert attempts == {flaky.id: 3, failing.id: 3}
+        parked = await parking.get()
+        assert json.loads(parked.body) == {"task_id": failing.id}
+        assert parked.headers[RETRY_COUNT_HEADER] == 2
+        async with session_factory() as db:
+            assert (await worker.repository.get_by_id(db, flaky.id)).status == TaskStatusEnum.COMPLETED
+            assert (await worker.repository.get_by_id(db, failing.id)).status == TaskStatusEnum.FAILED
+
+    async def test_weighted_mode_serves_low_under_high_load(self, async_session, session_factory, monkeypatch):
+        """Режим weighted: LOW обрабатывается, не дожидаясь конца потока HIGH"""
+        monkeypatch.setattr(settings, "task_queue_mode", "weighted")
+        queue_service = QueueService(InMemoryBroker())
+        await queue_service.connect()
+        assert {"tasks.high", "tasks.medium", "tasks.low"} <= set(queue_service.backend.queues)
+
+        service = TaskService(queue_service=queue_service)
+        high = await service.create_tasks(async_session, [TaskCreate(title="h", priority="HIGH") for _ in range(20)])
+        low = await service.create_tasks(async_session, [TaskCreate(title="l", priority="LOW") for _ in range(2)])
+        await queue_service.publish_tasks([(task.id, "HIGH") for task in high] + [(task.id, "LOW") for task in low])
+        low_waits = task_queue_wait_seconds.labels(priority="LOW")._sum.get()
+
+        order = []
+
+        class RecordingWorker(FastWorker):
+            async def execute(self, task: Task) -> str:
+                order.append(task.priority)
+                return await super().execute(task)
+
+        worker = RecordingWorker(concurrency=1, batch_size=1, session_factory=session_factory, queue_service=queue_service)
+        runner = asyncio.create_task(worker.start())
+        deadline = asyncio.get_running_loop().time() + 5
+        while len(order) < 22:
+            assert asyncio.get_running_loop().time() < deadline
+            await asyncio.sleep(0.01)
+        worker.shutdown_event.set()
+        await runner
+
+        # Строгий приоритет поставил бы оба LOW в конец
+        assert [i for i, priority in enumerate(order) if priority == "LOW"][-1] < 15
+        assert task_queue_wait_seconds.labels(priority="LOW")._sum.get() > low_waits
@@ -0,0 +1,73 @@
+import asyncio
+
+import pytest
+
+from app.services.queue_service import PRIORITY_MAP
+from app.workers.weighted_inbox import WeightedInbox
+
+
+class Message:
+    def __init__(self, priority: str, n: int = 0):
+        self.priority = PRIORITY_MAP[priority]
+        self.name = priority
+        self.n = n
+
+
+def fill(inbox: WeightedInbox, priority: str, count: int):
+    for n in range(count):
+        inbox.put_nowait(Message(priority, n))
+
+
+@pytest.mark.asyncio
+class TestWeightedInbox:
+    """Тесты выбора сообщений по весам приоритетов"""
+
+    async def test_weights_split_and_interleave(self):
+        """При работе во всех очередях 6:3:1 на каждые 10 выдач, LOW не ждёт хвоста HIGH"""
+        inbox = WeightedInbox({"HIGH": 6, "MEDIUM": 3, "LOW": 1})
+        for priority in PRIORITY_MAP:
+            fill(inbox, priority, 100)
+
+        picked = [inbox.get_nowait().name for _ in range(30)]
+
+        for window in (picked[:10], picked[10:20], picked[20:]):
+            assert window.count("HIGH") == 6
+            assert window.count("MEDIUM") == 3
+            assert window.count("LOW") == 1
+        # Smooth WRR: HIGH не выдаётся шестью подряд
+        longest_run = run = 0
+        for priority in picked:
+            run = run + 1 if priority == "HIGH" else 0
+            longest_run = max(longest_run, run)
+        assert longest_run <= 2
+
+    async def test_work_conserving(self):
+        """Пустые очереди пропускаются: слоты достаются тем, у кого есть работа"""
+        inbox = WeightedInbox({"HIGH": 6, "MEDIUM": 3, "LOW": 1})
+        fill(inbox, "LOW", 5)
+        assert [inbox.get_nowait().name for _ in range(5)] == ["LOW"] * 5
+
+        fill(inbox, "HIGH", 10)
+        fill(inbox, "LOW", 2)
+        picked = [inbox.get_nowait().name for _ in range(12)]
+        assert picked.index("LOW") < 7
+        assert picked.count("LOW") == 2
+        assert inbox.empty()
+
+    async def test_fifo_within_priority(self):
+        """Внутри приоритета порядок получения сохраняется"""
+        inbox = WeightedInbox({"HIGH": 6, "MEDIUM": 3, "LOW": 1})
+        fill(inbox, "MEDIUM", 3)
+        assert [inbox.get_nowait().n for _ in range(3)] == [0, 1, 2]
+        with pytest.raises(asyncio.QueueEmpty):
+            inbox.get_nowait()
+
+    async def test_get_waits_for_message(self):
+        """get ждёт первого сообщения"""
+        inbox = WeightedInbox({"HIGH": 6, "MEDIUM": 3, "LOW": 1})
+        getter = asyncio.create_task(inbox.get())
+        await asyncio.sleep(0.01)
+        assert not getter.done()
+
+        inbox.put_nowait(Message("LOW"))
+        assert (await asyncio.wait_for(getter, timeout=1)).name == "LOW"